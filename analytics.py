@@ -0,0 +1,542 @@
+#!/usr/bin/env python
+"""
+analytics.py  –  vectorised analysis of online_sim / batch.py logs
+------------------------------------------------------------------
+A log is read ONCE into column arrays; every statistic after that is a
+NumPy reduction over those columns – no loops over rows.
+
+    log = load_run("data/linucb_online_ep50.csv")      # online_sim log (full or compact)
+    cumulative_reward(log)                              # (T,)   reward summed over updates
+    arm_share(log, window=50)                           # (T, K) share of each arm over time
+    delta_by_persona_arm(log)                           # mean Δ-score per persona × arm + 95% CI
+    transfer_gain(log)                                  # transfer-step gain per persona × credited arm
+    compare_runs([load_run(a), load_run(b)])            # side by side, e.g. an alpha sweep
+
+    blog = load_batch("data/batch.csv")                 # batch.py log
+    batch_gains(blog)                                   # revision / transfer gain per persona × arm
+
+    python -m src.analytics data/alpha1.csv data/alpha3.csv --names a=1 a=3 --boot 5000
+
+Loading keeps only the label / score columns (csv.reader + itemgetter), so
+essays and feedback are never held in memory and a compact log
+(text_store.py) is never expanded.  The columns are cached next to the log
+as <stem>.cols.npz (rebuilt whenever the CSV's size or mtime changes), so
+only the first load pays for CSV parsing; later ones take milliseconds even
+for millions of rows.
+
+Confidence intervals are percentile bootstraps that resample every group
+at once.  Rewards and score gains are small integers, so each group is
+resampled from its value histogram: one multinomial draw of n_g rows per
+group and resample (rng.multinomial over all groups together), which costs
+O(n_boot × groups × distinct values) – independent of the row count.
+Columns with more than HIST_MAX_DISTINCT distinct values fall back to
+resampling row indices: one (n_boot, N) index matrix summed per group with
+np.add.reduceat, O(n_boot × N), in chunks of BOOT_CHUNK elements.
+"""
+
+from __future__ import annotations
+import argparse
+import csv
+import gc
+import json
+from contextlib import contextmanager
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .online_sim import ARMS
+from .text_store import REF_SUFFIX, text_hash
+
+ARM_NAMES = tuple(arm.value for arm in ARMS)
+ROUNDS = ("1", "2", "3", "transfer")
+TRANSFER = 4                    # round code of the transfer row (rounds 1-3 keep their number)
+BATCH_SCORES = (
+    "prompt_1_draft_1_score",
+    "prompt_1_revised_draft_2_score",
+    "prompt_1_revised_draft_3_score",
+    "prompt_2_draft_1_score",
+)
+BOOT_CHUNK = 20_000_000         # bootstrap elements drawn per chunk (~160 MB of float64)
+HIST_MAX_DISTINCT = 64          # up to this many distinct values: histogram bootstrap
+CACHE_VERSION = 1
+
+
+# ---------------------------------------------------------------------------
+#  columnar loading
+# ---------------------------------------------------------------------------
+@contextmanager
+def _no_gc():
+    """Millions of small tuples would trigger GC passes that find nothing to free."""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def _read_columns(csv_path: Path, wanted: Sequence[str]) -> Dict[str, Tuple[str, ...]]:
+    """{column: all its values} for *wanted* columns; other columns are parsed but not kept."""
+    with _no_gc(), Path(csv_path).open(newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"{csv_path} is empty.")
+        missing = [c for c in wanted if c not in header]
+        if missing:
+            raise ValueError(f"{csv_path} has no column(s) {missing}.")
+        get = itemgetter(*(header.index(c) for c in wanted))
+        width = len(header)
+        # rows cut short by a crash mid-write are skipped
+        picked = [get(r) for r in reader if len(r) == width]
+    if not picked:
+        raise ValueError(f"No usable rows in {csv_path}.")
+    if len(wanted) == 1:
+        return {wanted[0]: tuple(picked)}
+    return dict(zip(wanted, zip(*picked)))
+
+
+def _codes(values: Sequence[str], vocab: Sequence[str] = ()) -> Tuple[np.ndarray, List[str]]:
+    """Integer-code a label column; codes follow *vocab* first, then first appearance."""
+    index = {v: i for i, v in enumerate(vocab)}
+    codes = np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+def _floats(values: Sequence[str]) -> np.ndarray:
+    return np.array(values, dtype=float)
+
+
+def cache_path(csv_path: Path) -> Path:
+    """data/run.csv → data/run.cols.npz"""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + ".cols.npz")
+
+
+def _source_stamp(csv_path: Path) -> np.ndarray:
+    st = Path(csv_path).stat()
+    return np.array([CACHE_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def _load_cached(csv_path: Path, kind: str) -> Optional[Dict[str, np.ndarray]]:
+    path = cache_path(csv_path)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["kind"]) != kind or not np.array_equal(data["stamp"], _source_stamp(csv_path)):
+                return None
+            return {k: data[k] for k in data.files}
+    except (OSError, ValueError, KeyError):
+        return None      # unreadable / foreign cache → rebuild
+
+
+def _save_cached(csv_path: Path, kind: str, arrays: Dict[str, np.ndarray]) -> None:
+    path = cache_path(csv_path)
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with tmp.open("wb") as f:
+            np.savez(f, kind=np.array(kind), stamp=_source_stamp(csv_path), **arrays)
+        tmp.replace(path)
+    except OSError:
+        pass             # read-only location – the cache is only an optimisation
+
+
+def _persona_names(labels: List[str]) -> List[str]:
+    """Persona texts (or their text_store hashes) → simulate.py variable names, where known."""
+    from . import simulate
+    keys = ("beg_imp", "beg_notimp", "int_imp", "int_notimp", "adv_imp", "adv_notimp")
+    known = {}
+    for key in keys:
+        text = getattr(simulate, key)
+        known[text] = known[text_hash(text)] = key
+    return [known.get(label, label[:40]) for label in labels]
+
+
+class RunLog:
+    """Column arrays of one online_sim log, in playlist order (episode, round)."""
+
+    def __init__(self, name, episode_id, round_, arm, persona, persona_names,
+                 score_before, score_after, reward):
+        self.name = name
+        self.episode_id = episode_id          # (N,)
+        self.round = round_                   # (N,)  1, 2, 3 or TRANSFER
+        self.arm = arm                        # (N,)  index into arm_names (credited arm on transfer rows)
+        self.persona = persona                # (N,)  index into persona_names
+        self.persona_names = persona_names
+        self.arm_names = list(ARM_NAMES)
+        self.score_before = score_before      # (N,)
+        self.score_after = score_after        # (N,)
+        self.reward = reward                  # (N,)  Δ-score (transfer: vs. the episode's first score)
+
+    def __len__(self) -> int:
+        return len(self.reward)
+
+    @property
+    def decisions(self) -> np.ndarray:
+        """Mask of the rows where the bandit chose an arm (rounds 1-3)."""
+        return self.round != TRANSFER
+
+    @property
+    def n_episodes(self) -> int:
+        return len(np.unique(self.episode_id))
+
+
+def load_run(csv_path: Path, name: Optional[str] = None, *, cache: bool = True) -> RunLog:
+    """Load an online_sim CSV (sync or async runner, full or compact)."""
+    arrays = _load_cached(csv_path, "run") if cache else None
+    if arrays is None:
+        arrays = _parse_run(csv_path)
+        if cache:
+            _save_cached(csv_path, "run", arrays)
+    return RunLog(
+        name          = name or Path(csv_path).stem,
+        episode_id    = arrays["episode_id"],
+        round_        = arrays["round"],
+        arm           = arrays["arm"],
+        persona       = arrays["persona"],
+        persona_names = arrays["persona_names"].tolist(),
+        score_before  = arrays["score_before"],
+        score_after   = arrays["score_after"],
+        reward        = arrays["reward"],
+    )
+
+
+def _parse_run(csv_path: Path) -> Dict[str, np.ndarray]:
+    cols = _read_columns(csv_path, ("episode_id", "round", "persona_key", "arm",
+                                    "score_before", "score_after", "reward"))
+    round_, rounds = _codes(cols["round"], ROUNDS)
+    if len(rounds) > len(ROUNDS):
+        raise ValueError(f"{csv_path} has unknown round(s) {rounds[len(ROUNDS):]}.")
+    round_ += 1
+    arm, arm_names = _codes(cols["arm"], ARM_NAMES)
+    if len(arm_names) > len(ARM_NAMES):
+        raise ValueError(f"{csv_path} has unknown arm(s) {arm_names[len(ARM_NAMES):]}.")
+    persona, persona_names = _codes(cols["persona_key"])
+    episode_id = np.array(cols["episode_id"], dtype=np.int64)
+
+    # the async runner writes episodes in completion order
+    order = np.lexsort((round_, episode_id))
+    return {
+        "episode_id":    episode_id[order],
+        "round":         round_[order],
+        "arm":           arm[order],
+        "persona":       persona[order],
+        "persona_names": np.array(persona_names, dtype=str),
+        "score_before":  _floats(cols["score_before"])[order],
+        "score_after":   _floats(cols["score_after"])[order],
+        "reward":        _floats(cols["reward"])[order],
+    }
+
+
+class BatchLog:
+    """Column arrays of one batch.py log: one row per (persona, arm, run) cell."""
+
+    def __init__(self, name, persona, persona_names, arm, arm_names, run, scores):
+        self.name = name
+        self.persona = persona                # (N,)
+        self.persona_names = persona_names
+        self.arm = arm                        # (N,)
+        self.arm_names = arm_names
+        self.run = run                        # (N,)
+        self.scores = scores                  # (N, 4) draft 1, 2, 3 of prompt 1; draft 1 of prompt 2
+
+    def __len__(self) -> int:
+        return len(self.run)
+
+
+def load_batch(csv_path: Path, name: Optional[str] = None, *, cache: bool = True) -> BatchLog:
+    """Load a batch.py CSV (full or compact)."""
+    arrays = _load_cached(csv_path, "batch") if cache else None
+    if arrays is None:
+        arrays = _parse_batch(csv_path)
+        if cache:
+            _save_cached(csv_path, "batch", arrays)
+    return BatchLog(
+        name          = name or Path(csv_path).stem,
+        persona       = arrays["persona"],
+        persona_names = arrays["persona_names"].tolist(),
+        arm           = arrays["arm"],
+        arm_names     = arrays["arm_names"].tolist(),
+        run           = arrays["run"],
+        scores        = arrays["scores"],
+    )
+
+
+def _parse_batch(csv_path: Path) -> Dict[str, np.ndarray]:
+    with Path(csv_path).open(newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+    persona_col = "persona" + REF_SUFFIX if "persona" + REF_SUFFIX in header else "persona"
+    cols = _read_columns(csv_path, (persona_col, "arm", "run") + BATCH_SCORES)
+    persona, persona_labels = _codes(cols[persona_col])
+    arm, arm_names = _codes(cols["arm"], ARM_NAMES)
+    return {
+        "persona":       persona,
+        "persona_names": np.array(_persona_names(persona_labels), dtype=str),
+        "arm":           arm,
+        "arm_names":     np.array(arm_names, dtype=str),
+        "run":           np.array(cols["run"], dtype=np.int64),
+        "scores":        np.column_stack([_floats(cols[c]) for c in BATCH_SCORES]),
+    }
+
+
+# ---------------------------------------------------------------------------
+#  bootstrap
+# ---------------------------------------------------------------------------
+def bootstrap_means(
+    values: np.ndarray,
+    groups: np.ndarray,
+    n_groups: int,
+    *,
+    n_boot: int = 2000,
+    level: float = 0.95,
+    seed: int = 0,
+    return_samples: bool = False,
+) -> Dict[str, np.ndarray]:
+    """
+    Mean of *values* per group (codes 0..n_groups-1) with a percentile
+    bootstrap CI, resampling rows within each group (from the group's value
+    histogram when there are at most HIST_MAX_DISTINCT distinct values).
+
+    Returns {"n", "mean", "lo", "hi"}, each (n_groups,); empty groups get NaN.
+    With return_samples=True also "samples": the (n_boot, n_groups) bootstrap
+    means – two groups' columns can be subtracted for a CI of their difference.
+    """
+    values = np.asarray(values, dtype=float)
+    groups = np.asarray(groups, dtype=np.int64)
+    order = np.argsort(groups, kind="stable")
+    v, g = values[order], groups[order]
+
+    n = np.bincount(g, minlength=n_groups)
+    start = np.concatenate([[0], np.cumsum(n)[:-1]])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(g, weights=v, minlength=n_groups) / n
+    present = np.flatnonzero(n)
+
+    samples = np.full((n_boot, n_groups), np.nan)
+    rng = np.random.default_rng(seed)
+    distinct, inverse = np.unique(v, return_inverse=True)
+    if len(v) and len(distinct) <= HIST_MAX_DISTINCT:
+        # resampling n_g rows of a group = one multinomial draw over its value histogram
+        U = len(distinct)
+        hist = np.bincount(g * U + inverse, minlength=n_groups * U).reshape(n_groups, U)[present]
+        counts = rng.multinomial(n[present], hist / n[present, None], size=(n_boot, len(present)))
+        samples[:, present] = (counts @ distinct) / n[present]
+    elif len(v):
+        first, size = start[g], n[g]                  # each row's group: where it starts, how big
+        per_chunk = max(1, BOOT_CHUNK // len(v))
+        for b0 in range(0, n_boot, per_chunk):
+            b1 = min(n_boot, b0 + per_chunk)
+            # every row is replaced by a uniform draw from its own group
+            idx = first + (rng.random((b1 - b0, len(v))) * size).astype(np.int64)
+            samples[b0:b1, present] = np.add.reduceat(v[idx], start[present], axis=1) / n[present]
+
+    alpha = (1.0 - level) / 2
+    lo, hi = np.quantile(samples, [alpha, 1.0 - alpha], axis=0)
+    out = {"n": n, "mean": mean, "lo": lo, "hi": hi}
+    if return_samples:
+        out["samples"] = samples
+    return out
+
+
+def _by_persona_arm(values, persona, arm, n_personas, n_arms, **boot) -> Dict[str, np.ndarray]:
+    """bootstrap_means over persona × arm cells, reshaped to (P, K)."""
+    stats = bootstrap_means(values, persona * n_arms + arm, n_personas * n_arms, **boot)
+    return {k: v.reshape(n_personas, n_arms) for k, v in stats.items()}
+
+
+# ---------------------------------------------------------------------------
+#  online_sim statistics
+# ---------------------------------------------------------------------------
+def cumulative_reward(log: RunLog, include_transfer: bool = True) -> np.ndarray:
+    """Running sum of the rewards fed to the bandit, in update order."""
+    mask = slice(None) if include_transfer else log.decisions
+    return np.cumsum(log.reward[mask])
+
+
+def arm_share(log: RunLog, window: Optional[int] = None) -> np.ndarray:
+    """
+    (T, K) share of each arm among the first t decisions (window=None) or
+    among the last *window* decisions, for every decision t.
+    """
+    arms = log.arm[log.decisions]
+    T, K = len(arms), len(log.arm_names)
+    counts = np.zeros((T + 1, K))
+    counts[np.arange(1, T + 1), arms] = 1.0
+    np.cumsum(counts, axis=0, out=counts)
+    t = np.arange(1, T + 1)
+    lo = np.zeros(T, dtype=np.int64) if window is None else np.maximum(0, t - window)
+    return (counts[t] - counts[lo]) / (t - lo)[:, None]
+
+
+def delta_by_persona_arm(log: RunLog, **boot) -> Dict:
+    """Mean Δ-score of the feedback rounds per persona × arm, with bootstrap CIs."""
+    m = log.decisions
+    stats = _by_persona_arm(log.reward[m], log.persona[m], log.arm[m],
+                            len(log.persona_names), len(log.arm_names), **boot)
+    return {"personas": log.persona_names, "arms": log.arm_names, **stats}
+
+
+def transfer_gain(log: RunLog, **boot) -> Dict:
+    """Transfer score minus the episode's first score, per persona × the arm it was credited to."""
+    m = ~log.decisions
+    stats = _by_persona_arm(log.reward[m], log.persona[m], log.arm[m],
+                            len(log.persona_names), len(log.arm_names), **boot)
+    return {"personas": log.persona_names, "arms": log.arm_names, **stats}
+
+
+def compare_runs(logs: Sequence[RunLog], *, window: Optional[int] = None, **boot) -> Dict:
+    """
+    Several runs side by side (e.g. one log per alpha).  Returns
+      names, episodes             : per run
+      curves                      : (R, T_max) cumulative reward, NaN-padded
+      mean_reward, transfer_gain  : {"n", "mean", "lo", "hi"} per run (rounds 1-3 / transfer rows)
+      reward_diff                 : mean reward minus run 0's, same keys, with a bootstrap CI
+      final_arm_share             : (R, K) share over the last *window* decisions (default: all)
+    """
+    R = len(logs)
+    curves = [cumulative_reward(log) for log in logs]
+    padded = np.full((R, max(len(c) for c in curves)), np.nan)
+    for r, c in enumerate(curves):
+        padded[r, :len(c)] = c
+
+    def pooled(mask_of):
+        """All runs' rewards under *mask_of* in one array, grouped by run index."""
+        masks = [mask_of(log) for log in logs]
+        values = np.concatenate([log.reward[m] for log, m in zip(logs, masks)])
+        runs = np.repeat(np.arange(R), [int(m.sum()) for m in masks])
+        return values, runs
+
+    reward = bootstrap_means(*pooled(lambda log: log.decisions), R, return_samples=True, **boot)
+    transfer = bootstrap_means(*pooled(lambda log: ~log.decisions), R, **boot)
+
+    # runs are resampled independently, so column differences follow the difference's distribution
+    samples = reward.pop("samples")
+    diff = samples - samples[:, :1]
+    alpha = (1.0 - boot.get("level", 0.95)) / 2
+    lo, hi = np.quantile(diff, [alpha, 1.0 - alpha], axis=0)
+
+    return {
+        "names": [log.name for log in logs],
+        "episodes": [log.n_episodes for log in logs],
+        "curves": padded,
+        "mean_reward": reward,
+        "transfer_gain": transfer,
+        "reward_diff": {"mean": reward["mean"] - reward["mean"][0], "lo": lo, "hi": hi},
+        "final_arm_share": np.vstack([arm_share(log, window)[-1] for log in logs]),
+    }
+
+
+# ---------------------------------------------------------------------------
+#  batch.py statistics
+# ---------------------------------------------------------------------------
+def batch_gains(blog: BatchLog, **boot) -> Dict:
+    """
+    Per persona × arm, with bootstrap CIs:
+      revision : draft 3 − draft 1 of prompt 1 (effect of two feedback rounds)
+      transfer : draft 1 of prompt 2 − draft 1 of prompt 1
+    """
+    P, K = len(blog.persona_names), len(blog.arm_names)
+    first = blog.scores[:, 0]
+    return {
+        "personas": blog.persona_names,
+        "arms": blog.arm_names,
+        "revision": _by_persona_arm(blog.scores[:, 2] - first, blog.persona, blog.arm, P, K, **boot),
+        "transfer": _by_persona_arm(blog.scores[:, 3] - first, blog.persona, blog.arm, P, K, **boot),
+    }
+
+
+# ---------------------------------------------------------------------------
+#  CLI
+# ---------------------------------------------------------------------------
+def _ci(stats: Dict, *idx) -> str:
+    n = stats["n"][idx] if "n" in stats else 1
+    if not n:
+        return f"{'-':>20}"
+    return f"{stats['mean'][idx]:>+6.2f} [{stats['lo'][idx]:+.2f},{stats['hi'][idx]:+.2f}]"
+
+
+def _print_table(title: str, stats: Dict, personas: List[str], arms: List[str]) -> None:
+    print(f"\n{title}")
+    print(f"{'persona':<12}" + "".join(f"{a:>22}" for a in arms))
+    for p, persona in enumerate(personas):
+        print(f"{persona:<12}" + "".join(f"{_ci(stats, p, k):>22}" for k in range(len(arms))))
+
+
+def _jsonable(obj):
+    if isinstance(obj, dict):
+        return {k: _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, np.ndarray):
+        return np.where(np.isnan(obj), None, obj).tolist() if obj.dtype.kind == "f" else obj.tolist()
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser("Run-log analytics (online_sim and batch.py CSVs)")
+    p.add_argument("logs", type=Path, nargs="+", help="One or more log CSVs (all online_sim or all batch.py)")
+    p.add_argument("--names", nargs="+", default=None, help="Label per log (default: file stem)")
+    p.add_argument("--boot", type=int, default=2000, help="Bootstrap resamples (default 2000)")
+    p.add_argument("--level", type=float, default=0.95, help="CI level (default 0.95)")
+    p.add_argument("--seed", type=int, default=0, help="Bootstrap seed (default 0)")
+    p.add_argument("--window", type=int, default=None,
+                   help="Arm shares over the last N decisions (default: whole run)")
+    p.add_argument("--out", type=Path, default=None, help="Also write all results as JSON here")
+    p.add_argument("--no-cache", action="store_true", help="Neither read nor write <stem>.cols.npz")
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    names = args.names or [None] * len(args.logs)
+    if len(names) != len(args.logs):
+        raise SystemExit("--names needs one label per log.")
+    boot = dict(n_boot=args.boot, level=args.level, seed=args.seed)
+
+    with args.logs[0].open(newline="", encoding="utf-8") as f:
+        is_online = "episode_id" in next(csv.reader(f), [])
+
+    results: Dict = {}
+    if is_online:
+        logs = [load_run(path, name, cache=not args.no_cache) for path, name in zip(args.logs, names)]
+        if len(logs) > 1:
+            cmp = compare_runs(logs, window=args.window, **boot)
+            results["compare"] = cmp
+            print(f"\n{'run':<16} {'episodes':>8} {'mean Δ (rounds 1-3)':>22} {'vs first':>22} "
+                  f"{'transfer gain':>22}   final arm share")
+            for r, name in enumerate(cmp["names"]):
+                share = " ".join(f"{x:.2f}" for x in cmp["final_arm_share"][r])
+                print(f"{name:<16} {cmp['episodes'][r]:>8} {_ci(cmp['mean_reward'], r):>22} "
+                      f"{_ci(cmp['reward_diff'], r):>22} {_ci(cmp['transfer_gain'], r):>22}   {share}")
+        for log in logs:
+            delta, transfer = delta_by_persona_arm(log, **boot), transfer_gain(log, **boot)
+            results[log.name] = {"delta": delta, "transfer": transfer,
+                                 "cumulative_reward": cumulative_reward(log),
+                                 "arm_share": arm_share(log, args.window)}
+            _print_table(f"{log.name}: mean Δ-score per round by persona × arm", delta,
+                         log.persona_names, log.arm_names)
+            _print_table(f"{log.name}: transfer gain by persona × credited arm", transfer,
+                         log.persona_names, log.arm_names)
+    else:
+        for path, name in zip(args.logs, names):
+            blog = load_batch(path, name, cache=not args.no_cache)
+            gains = results[blog.name] = batch_gains(blog, **boot)
+            _print_table(f"{blog.name}: revision gain (draft 3 − draft 1)", gains["revision"],
+                         gains["personas"], gains["arms"])
+            _print_table(f"{blog.name}: transfer gain (prompt 2 − draft 1)", gains["transfer"],
+                         gains["personas"], gains["arms"])
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(_jsonable(results)))
+        print(f"\nSaved results to {args.out.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,7 @@ class UCBPolicyAdapter:
 
     def __init__(self, n_arms: int, seed: int):
         self.ucb = NonContextualUCB(n_arms=n_arms, seed=seed)
+        self.n_arms = n_arms
         self.time = 1  # will increment on each call to select_arm
 
     def select_arm(self, ctx: Any = None):
@@ -32,8 +33,25 @@ class UCBPolicyAdapter:
         self.time += 1
         return arm
 
+    def select_arms(self, ctxs: Any) -> np.ndarray:
+        """
+        Batched select_arm: one arm per row of *ctxs* (only its length is used),
+        at time steps self.time, self.time+1, …
+        """
+        n = len(ctxs)
+        arms = self.ucb.select_arms(np.arange(self.time, self.time + n))
+        self.time += n
+        return arms
+
     def update(self, arm_idx: int, reward: float, ctx: Any = None) -> None:
         """
         The simulation will call update(arm_idx, reward, ctx). We ignore ctx for UCB.
         """
         self.ucb.update(arm_idx, reward)
+
+    def get_state(self) -> dict:
+        return {**self.ucb.get_state(), "time": self.time}
+
+    def set_state(self, state: dict) -> None:
+        self.ucb.set_state(state)
+        self.time = int(state["time"])
@@ -1,8 +1,9 @@
 #bandit.py
 from __future__ import annotations
+import os
 import numpy as np
-import textstat
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence
 
 
 persona2vec = {
@@ -21,14 +22,86 @@ PERSONA_DIM = 4
 LIVE_DIM = 3
 CTX_DIM = PERSONA_DIM + LIVE_DIM
 
+# below this many essays build_X featurizes in-process (pool start-up costs more)
+_POOL_MIN_ESSAYS = 500
+
+
+class EssayFeatures(NamedTuple):
+    n_tokens: int              # whitespace token count
+    flesch: float              # textstat.flesch_reading_ease
+    lexical_diversity: float   # unique lower-cased tokens / tokens
+
+
+@lru_cache(maxsize=4096)
+def essay_features(essay: str) -> EssayFeatures:
+    """
+    Tokenize *essay* once and return all text features together.
+    Memoized (bounded LRU), so the same draft – featurized as the "new draft"
+    of one round and again as the input of the next – is only processed once.
+    """
+    import textstat   # slow to import; only needed once an essay is featurized
+
+    words = essay.split()
+    n = len(words)
+    diversity = len({w.lower() for w in words}) / n if n else 0.0
+    return EssayFeatures(n, textstat.flesch_reading_ease(essay), diversity)
+
+
 def build_x(essay:str, persona_key: str, base_score:float) -> np.ndarray:
     """""Return a numeric context vector """""""""
     persona_vec = np.array(persona2vec[persona_key], dtype = float)
+    feats = essay_features(essay)
     live_vec = np.array([
-        len(essay.split()), #token count
-        textstat.flesch_reading_ease(essay), #flesch reading score for readability
+        feats.n_tokens, #token count
+        feats.flesch, #flesch reading score for readability
         base_score # holistic score before any feedback (first draft score)
     ], dtype = float)
     return np.concatenate([persona_vec, live_vec])
 
 
+def _features_chunk(essays: List[str]) -> List[EssayFeatures]:
+    return [essay_features(e) for e in essays]
+
+
+def build_X(
+    essays: Sequence[str],
+    persona_keys: Sequence[str],
+    scores: Sequence[float],
+    *,
+    workers: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Batch build_x: return the (N, CTX_DIM) matrix whose i-th row equals
+    build_x(essays[i], persona_keys[i], scores[i]).
+
+    Large batches (offline analysis of thousands of logged essays) are
+    featurized in a process pool; *workers*=1 forces in-process work.
+    """
+    if not (len(essays) == len(persona_keys) == len(scores)):
+        raise ValueError("`essays`, `persona_keys` and `scores` must have the same length.")
+    n = len(essays)
+    X = np.empty((n, CTX_DIM))
+    if n == 0:
+        return X
+
+    persona_table = {k: np.array(v, dtype=float) for k, v in persona2vec.items()}
+    X[:, :PERSONA_DIM] = [persona_table[k] for k in persona_keys]
+
+    # featurize each distinct text once
+    unique = list(dict.fromkeys(essays))
+    if workers == 1 or len(unique) < _POOL_MIN_ESSAYS:
+        feats = _features_chunk(unique)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        n_workers = workers or os.cpu_count() or 1
+        size = max(1, len(unique) // (n_workers * 4))
+        chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            feats = [f for part in pool.map(_features_chunk, chunks) for f in part]
+    by_text: Dict[str, EssayFeatures] = dict(zip(unique, feats))
+
+    X[:, PERSONA_DIM]     = [by_text[e].n_tokens for e in essays]
+    X[:, PERSONA_DIM + 1] = [by_text[e].flesch for e in essays]
+    X[:, PERSONA_DIM + 2] = np.asarray(scores, dtype=float)
+    return X
@@ -0,0 +1,462 @@
+#!/usr/bin/env python
+"""
+bandit_service.py
+-----------------
+One learning policy (LinUCB / LinTS / UCB1) served to many processes over a
+local socket, so several experiment runners – or a classroom front end –
+share, and keep training, the same bandit.
+
+    python -m src.bandit_service --socket /tmp/mab.sock --policy linucb \
+        --snapshot data/service.ckpt.npz --snapshot-every 30 [--resume]
+    python -m src.bandit_service --port 8765              # TCP on 127.0.0.1
+
+    bandit = BanditClient("/tmp/mab.sock")                # or "127.0.0.1:8765"
+    arm = bandit.select_arm(ctx)
+    bandit.update(arm, reward, ctx)
+
+BanditClient has the policy interface, so it can be passed as `bandit=` to
+simulate_online_bandit (cli_online --service does exactly that).
+
+Protocol – one JSON object per line, one reply line per request, replies in
+request order (requests may be pipelined on a connection):
+
+    {"op": "select", "ctx": [...]}                            → {"arm": 2}
+    {"op": "update", "arm": 2, "reward": 1.0, "ctx": [...]}   → {"ok": true}
+    {"op": "snapshot"}                                        → {"ok": true, "path": "..."}
+    {"op": "metrics"}                                         → {...}
+    anything that fails                                       → {"error": "..."}
+
+Micro-batching: every select / update / snapshot goes through ONE queue and
+is applied by ONE worker in arrival order.  The worker takes whatever has
+queued up (up to --max-batch) and splits it into runs of consecutive
+requests of the same kind; a run of selects is scored in one vectorised
+select_arms() call, updates are applied one by one.  So a select always
+sees every update that arrived before it – the same sequence of calls a
+single-process run would make – while a burst of N selects costs one
+einsum instead of N.
+
+Snapshots use checkpoint.py's .npz format (episode = updates applied so far)
+and are written between batches, so they are always consistent: every
+--snapshot-every seconds if anything changed, on {"op": "snapshot"}, and on
+shutdown (Ctrl-C / SIGTERM).
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import signal
+import socket
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .checkpoint import load_checkpoint, save_checkpoint
+
+LATENCY_WINDOW = 10_000       # most recent requests per op kept for the percentiles
+OPS = ("select", "update", "snapshot", "metrics")
+
+
+class BanditServiceError(RuntimeError):
+    """The service answered a request with an error."""
+
+
+def parse_address(address: Union[str, Path]) -> Tuple[str, Any]:
+    """"host:port" → ("tcp", (host, port)); anything else is a Unix socket path."""
+    host, sep, port = str(address).rpartition(":")
+    if sep and host and port.isdigit():
+        return "tcp", (host, int(port))
+    return "unix", str(address)
+
+
+# ---------------------------------------------------------------------------
+#  server
+# ---------------------------------------------------------------------------
+class BanditServer:
+    def __init__(
+        self,
+        policy,
+        *,
+        snapshot_path: Optional[Path] = None,
+        snapshot_every: float = 30.0,
+        max_batch: int = 256,
+        batch_wait: float = 0.0,
+        resume: bool = False,
+    ):
+        """
+        policy          : anything with n_arms, select_arm/update (+ select_arms, get_state/set_state)
+        snapshot_every  : seconds between periodic snapshots (0 = only on request / shutdown)
+        max_batch       : most queued requests applied in one worker step
+        batch_wait      : seconds the worker waits after the first request for more to
+                          arrive (0 = batch only what is already queued; adds no latency)
+        resume          : restore the policy from *snapshot_path* if it exists
+        """
+        self.policy = policy
+        self.dim = getattr(policy, "dim", None)
+        self.n_arms = policy.n_arms
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.snapshot_every = snapshot_every
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+
+        self.n_updates = 0
+        if resume and self.snapshot_path is not None and self.snapshot_path.exists():
+            self.n_updates, _, _ = load_checkpoint(self.snapshot_path, bandit=policy)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._dirty = False
+        self._last_snapshot = time.monotonic()
+
+        self._latency: Dict[str, Deque[float]] = {op: deque(maxlen=LATENCY_WINDOW)
+                                                  for op in ("select", "update")}
+        self._requests = {op: 0 for op in ("select", "update")}
+        self._errors = 0
+        self._batches = 0
+        self._batched = 0
+        self._max_batch_seen = 0
+
+    # ------------------------------------------------------------------ #
+    # lifecycle
+    # ------------------------------------------------------------------ #
+    async def start(self, address: Union[str, Path]) -> None:
+        """Start listening on *address* (Unix socket path or "host:port")."""
+        self._queue = asyncio.Queue()
+        self._stop = asyncio.Event()
+        self._worker = asyncio.ensure_future(self._run_worker())
+        kind, where = parse_address(address)
+        if kind == "tcp":
+            self._server = await asyncio.start_server(self._handle, *where)
+        else:
+            if os.path.exists(where):
+                os.unlink(where)          # stale socket from a previous run
+            self._server = await asyncio.start_unix_server(self._handle, path=where)
+
+    def stop(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+
+    async def close(self) -> None:
+        """Stop accepting, finish queued requests, write a final snapshot."""
+        if self._server is not None:
+            self._server.close()
+            # hang up on connected clients; their handlers see EOF and finish
+            for writer in list(self._connections.values()):
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+        if self._worker is not None:
+            await self._queue.join()
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+        if self._dirty:
+            self.snapshot()
+
+    async def serve(self, address: Union[str, Path]) -> None:
+        """start() and run until stop(), SIGINT or SIGTERM; then close()."""
+        await self.start(address)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):   # not on this platform / thread
+                pass
+        try:
+            await self._stop.wait()
+        finally:
+            await self.close()
+
+    # ------------------------------------------------------------------ #
+    # connections
+    # ------------------------------------------------------------------ #
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # requests are queued as soon as they are read; replies go out in the same order
+        replies: asyncio.Queue = asyncio.Queue()
+
+        async def send() -> None:
+            while True:
+                fut = await replies.get()
+                if fut is None:
+                    return
+                writer.write((json.dumps(await fut) + "\n").encode())
+                await writer.drain()
+
+        sender = asyncio.ensure_future(send())
+        me = asyncio.current_task()
+        self._connections[me] = writer
+        try:
+            async for line in reader:
+                if line.strip():
+                    replies.put_nowait(self._submit(line))
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            replies.put_nowait(None)
+            await asyncio.gather(sender, return_exceptions=True)
+            writer.close()
+            self._connections.pop(me, None)
+
+    def _submit(self, line: bytes) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            req = json.loads(line)
+            op = req.get("op")
+            if op == "metrics":
+                fut.set_result(self.metrics())
+            elif op == "select":
+                self._queue.put_nowait((op, self._ctx(req["ctx"]), fut, time.perf_counter()))
+            elif op == "update":
+                # reject bad input here – one NaN update would poison the shared policy
+                arm = req["arm"]
+                # 1e999 parses as inf and 1.5 would truncate – only whole numbers are arms
+                if isinstance(arm, bool) or not isinstance(arm, (int, float)) \
+                        or (isinstance(arm, float) and not arm.is_integer()):
+                    raise ValueError(f"arm must be an integer, got {arm!r}")
+                arm = int(arm)
+                if not 0 <= arm < self.n_arms:
+                    raise ValueError(f"arm must be in [0, {self.n_arms}), got {arm}")
+                reward = float(req["reward"])
+                if not math.isfinite(reward):
+                    raise ValueError(f"reward must be finite, got {reward}")
+                item = (arm, reward, self._ctx(req["ctx"]))
+                self._queue.put_nowait((op, item, fut, time.perf_counter()))
+            elif op == "snapshot":
+                self._queue.put_nowait((op, None, fut, time.perf_counter()))
+            else:
+                raise ValueError(f"unknown op {op!r}; expected one of {OPS}")
+        except (KeyError, TypeError, ValueError, AttributeError, OverflowError) as exc:
+            self._errors += 1
+            fut.set_result({"error": f"bad request: {exc}"})
+        return fut
+
+    def _ctx(self, ctx) -> np.ndarray:
+        x = np.asarray(ctx, dtype=float).reshape(-1)
+        if self.dim is not None and x.shape[0] != self.dim:
+            raise ValueError(f"ctx has {x.shape[0]} features, policy expects {self.dim}")
+        if not np.isfinite(x).all():
+            raise ValueError("ctx must be finite")
+        return x
+
+    # ------------------------------------------------------------------ #
+    # the single worker – every policy access happens here
+    # ------------------------------------------------------------------ #
+    async def _run_worker(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            if self.batch_wait:
+                await asyncio.sleep(self.batch_wait)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            self._batches += 1
+            self._batched += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            try:
+                self._apply(batch)
+                if (self.snapshot_every and self._dirty
+                        and time.monotonic() - self._last_snapshot >= self.snapshot_every):
+                    self.snapshot()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _apply(self, batch: List[tuple]) -> None:
+        """Apply *batch* in arrival order: consecutive selects as one vectorised call."""
+        for op, run in itertools.groupby(batch, key=lambda item: item[0]):
+            run = list(run)
+            if op == "select":
+                try:
+                    arms = self._select(np.stack([payload for _, payload, _, _ in run]))
+                    replies = [{"arm": int(a)} for a in arms]
+                except Exception as exc:
+                    replies = [{"error": f"select failed: {exc}"}] * len(run)
+                self._reply(op, run, replies)
+            elif op == "update":
+                replies = []
+                for _, (arm, reward, x), _, _ in run:
+                    try:
+                        self.policy.update(arm, reward, x)
+                        self.n_updates += 1
+                        self._dirty = True
+                        replies.append({"ok": True})
+                    except Exception as exc:
+                        replies.append({"error": f"update failed: {exc}"})
+                self._reply(op, run, replies)
+            else:  # snapshot
+                try:
+                    path = self.snapshot()
+                    reply = {"ok": True, "path": str(path) if path else None}
+                except OSError as exc:
+                    reply = {"error": f"snapshot failed: {exc}"}
+                self._reply(op, run, [reply] * len(run))
+
+    def _select(self, X: np.ndarray) -> np.ndarray:
+        select_arms = getattr(self.policy, "select_arms", None)
+        if select_arms is not None:
+            return select_arms(X)
+        return np.array([self.policy.select_arm(x) for x in X])
+
+    def _reply(self, op: str, run: List[tuple], replies: List[Dict]) -> None:
+        now = time.perf_counter()
+        for (_, _, fut, t0), reply in zip(run, replies):
+            if "error" in reply:
+                self._errors += 1
+            elif op in self._latency:
+                self._requests[op] += 1
+                self._latency[op].append(now - t0)
+            if not fut.done():      # client may have gone away
+                fut.set_result(reply)
+
+    # ------------------------------------------------------------------ #
+    # snapshots / metrics
+    # ------------------------------------------------------------------ #
+    def snapshot(self) -> Optional[Path]:
+        """Write the policy to *snapshot_path* now (no-op without one)."""
+        if self.snapshot_path is None:
+            return None
+        save_checkpoint(self.snapshot_path, bandit=self.policy, episode=self.n_updates,
+                        playlist=[], prompt_rng_state=None)
+        self._dirty = False
+        self._last_snapshot = time.monotonic()
+        return self.snapshot_path
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        {select: {requests, p50_ms, p95_ms, p99_ms}, update: {...}, updates_applied,
+         errors, queue_depth, batches, mean_batch, max_batch}
+        Latency is server-side: from the request being read to its reply being ready.
+        """
+        out: Dict[str, Any] = {}
+        for op, lat in self._latency.items():
+            p50, p95, p99 = np.percentile(np.fromiter(lat, float), [50, 95, 99]) * 1e3 if lat else (0.0,) * 3
+            out[op] = {"requests": self._requests[op], "p50_ms": float(p50),
+                       "p95_ms": float(p95), "p99_ms": float(p99)}
+        out.update({
+            "updates_applied": self.n_updates,
+            "errors": self._errors,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self._batches,
+            "mean_batch": self._batched / self._batches if self._batches else 0.0,
+            "max_batch": self._max_batch_seen,
+        })
+        return out
+
+
+# ---------------------------------------------------------------------------
+#  client
+# ---------------------------------------------------------------------------
+class BanditClient:
+    """
+    Blocking client with the policy interface (select_arm / select_arms /
+    update).  Thread-safe; one connection per client.
+    """
+
+    def __init__(self, address: Union[str, Path], timeout: Optional[float] = 30.0):
+        kind, where = parse_address(address)
+        family = socket.AF_INET if kind == "tcp" else socket.AF_UNIX
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(where)
+        if kind == "tcp":
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._rfile = self._sock.makefile("rb")
+        self._lock = threading.Lock()
+
+    def _call(self, requests: List[Dict]) -> List[Dict]:
+        """Send *requests* pipelined on one write; return their replies in order."""
+        payload = "".join(json.dumps(r) + "\n" for r in requests).encode()
+        with self._lock:
+            self._sock.sendall(payload)
+            lines = [self._rfile.readline() for _ in requests]
+        if not all(lines):
+            raise ConnectionError("Bandit service closed the connection.")
+        replies = [json.loads(line) for line in lines]
+        for reply in replies:
+            if "error" in reply:
+                raise BanditServiceError(reply["error"])
+        return replies
+
+    def select_arm(self, ctx: Any) -> int:
+        return self._call([{"op": "select", "ctx": _as_list(ctx)}])[0]["arm"]
+
+    def select_arms(self, X: Any) -> np.ndarray:
+        """One request per row, pipelined – the server scores them as one batch."""
+        return np.array([r["arm"] for r in self._call([{"op": "select", "ctx": _as_list(x)} for x in X])])
+
+    def update(self, arm_idx: int, reward: float, ctx: Any) -> None:
+        self._call([{"op": "update", "arm": int(arm_idx), "reward": float(reward), "ctx": _as_list(ctx)}])
+
+    def snapshot(self) -> Optional[str]:
+        return self._call([{"op": "snapshot"}])[0]["path"]
+
+    def metrics(self) -> Dict[str, Any]:
+        return self._call([{"op": "metrics"}])[0]
+
+    def close(self) -> None:
+        self._rfile.close()
+        self._sock.close()
+
+    def __enter__(self) -> "BanditClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _as_list(ctx: Any) -> List[float]:
+    return np.asarray(ctx, dtype=float).reshape(-1).tolist()
+
+
+# ---------------------------------------------------------------------------
+#  CLI
+# ---------------------------------------------------------------------------
+def parse_args() -> argparse.Namespace:
+    from .sweep import POLICIES
+    p = argparse.ArgumentParser("Shared bandit decision service")
+    where = p.add_mutually_exclusive_group(required=True)
+    where.add_argument("--socket", type=Path, help="Unix socket path to listen on")
+    where.add_argument("--port", type=int, help="TCP port on --host to listen on")
+    p.add_argument("--host", type=str, default="127.0.0.1", help="TCP host (default 127.0.0.1)")
+    p.add_argument("--policy", type=str, default="linucb", choices=POLICIES)
+    p.add_argument("--alpha", type=float, default=1.0,
+                   help="LinUCB α / LinTS posterior scale v (default 1.0)")
+    p.add_argument("--seed", type=int, default=0, help="Tie-break / sampling seed (default 0)")
+    p.add_argument("--snapshot", type=Path, default=None, help="Snapshot file (.npz, checkpoint format)")
+    p.add_argument("--snapshot-every", type=float, default=30.0,
+                   help="Seconds between snapshots while learning (default 30, 0 = only at shutdown)")
+    p.add_argument("--resume", action="store_true", help="Start from --snapshot if it exists")
+    p.add_argument("--max-batch", type=int, default=256, help="Most requests per worker step (default 256)")
+    p.add_argument("--batch-wait-ms", type=float, default=0.0,
+                   help="Wait this long for more requests before each step (default 0)")
+    return p.parse_args()
+
+
+def main() -> None:
+    from .sweep import make_policy
+    args = parse_args()
+    server = BanditServer(
+        make_policy(args.policy, args.alpha, args.seed),
+        snapshot_path  = args.snapshot,
+        snapshot_every = args.snapshot_every,
+        max_batch      = args.max_batch,
+        batch_wait     = args.batch_wait_ms / 1e3,
+        resume         = args.resume,
+    )
+    address = args.socket if args.socket else f"{args.host}:{args.port}"
+    print(f"Serving {args.policy} on {address} (resumed at {server.n_updates} updates)")
+    asyncio.run(server.serve(address))
+    print(f"Metrics: {server.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,323 @@
 # batch
 import csv
-import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 from src.feedback import FeedbackArm, generate_feedback
-from src.grading import RUBRIC, score_essay
+from src.grading import RUBRIC, ConsistentScore, score_essay_consistent, score_essays
 from src.writing import write_essay, rewrite_essay
 from src.utils import ask_gpt
+from src import tracing
+from src.task_graph import TaskGraph
+from src.text_store import (BATCH_TEXT_FIELDS, TextStore, compact_fields, compact_row,
+                            default_store_path, text_hash)
 
 # ---------------------------------------------------------------------------
 #  quick grading wrapper
 # ---------------------------------------------------------------------------
 
-def _grade(*, essay: str, ask_fn: Callable, rubric: str, model: str, temperature: float) -> int:
-    score, _ = score_essay(
+def _grade(*, essay: str, ask_fn: Callable, rubric: str, model: str, temperature: float,
+           grade_samples: int = 1) -> ConsistentScore:
+    # grade_samples=1 is a single score_essay call
+    return score_essay_consistent(
         essay=essay,
         rubric=rubric,
         ask_fn=ask_fn,
         model=model,
         temperature=temperature,
+        max_samples=grade_samples,
     )
-    return score
+
+
+def _grade_drafts(
+    *,
+    essays: List[str],
+    batch_grading: bool,
+    ask_fn: Callable,
+    rubric: str,
+    model: str,
+    temperature: float,
+    grade_samples: int = 1,
+) -> List[ConsistentScore]:
+    """
+    Grade *essays* one request each (or up to *grade_samples* each, by
+    self-consistency), or all in one request under a single rubric copy
+    (one sample per essay).
+    """
+    if batch_grading:
+        return [
+            ConsistentScore(score, 0.0, 1.0, [score], [reply])
+            for score, reply in score_essays(
+                essays, rubric=rubric, ask_fn=ask_fn, model=model, temperature=temperature
+            )
+        ]
+    return [
+        _grade(essay=essay, ask_fn=ask_fn, rubric=rubric, model=model, temperature=temperature,
+               grade_samples=grade_samples)
+        for essay in essays
+    ]
+
+
+# ---------------------------------------------------------------------------
+#  one (persona, arm, run) cell → one CSV row
+# ---------------------------------------------------------------------------
+
+def _run_cell(
+    *,
+    persona: str,
+    arm: FeedbackArm,
+    run_idx: int,
+    runs: int,
+    grade_level: str,
+    prompts: List[str],
+    gpt_model: str,
+    temperature_writing: float,
+    temperature_score: float,
+    temperature_feedback: float,
+    ask_fn: Callable,
+    rubric: str,
+    batch_grading: bool,
+    parallel_tasks: bool,
+    verbose: bool,
+    grade_samples: int = 1,
+) -> Dict:
+    tag = f"[{persona} | {arm.value}] Run {run_idx}/{runs}"
+
+    def say(msg: str) -> None:
+        if verbose:
+            print(f"{tag}: {msg}")
+
+    # -------- the run as a DAG of LLM calls ----------------
+    # draft1 → fb1 → draft2 → fb2 → draft3 → draft4 is a chain, but grading
+    # draft N only needs draft N, so it overlaps with the feedback/rewrite on it
+    def _draft1():
+        say("drafting essay 1 …")
+        return write_essay(
+            persona=persona,
+            essay_prompt=prompts[0],
+            use_history=False,
+            history=[],
+            ask_fn=ask_fn,
+            model=gpt_model,
+            temperature=temperature_writing,
+        )
+
+    def _feedback(n):
+        def node(essay):
+            say(f"feedback {n} …")
+            return generate_feedback(
+                essay=essay,
+                arm=arm,
+                grade_level=grade_level,
+                writing_prompt=prompts[0],
+                ask_fn=ask_fn,
+                model=gpt_model,
+                temperature=temperature_feedback,
+            )
+        return node
+
+    def _rewrite(n):
+        def node(essay, fb):
+            say(f"rewriting → draft {n} …")
+            return rewrite_essay(
+                essay=essay,
+                feedback=fb,
+                persona=persona,
+                ask_fn=ask_fn,
+                model=gpt_model,
+                temperature=temperature_writing,
+            )
+        return node
+
+    def _draft4(draft3, fb2):
+        # -------- Draft 4 (prompt 2, history‑aware) -------------
+        say("drafting essay 2 (with history) …")
+        return write_essay(
+            persona=persona,
+            essay_prompt=prompts[1],
+            use_history=True,
+            history=[{"prompt": prompts[0], "essay": draft3, "feedback": fb2}],
+            ask_fn=ask_fn,
+            model=gpt_model,
+            temperature=temperature_writing,
+        )
+
+    def _grades(*essays):
+        return _grade_drafts(
+            essays=list(essays),
+            batch_grading=batch_grading,
+            ask_fn=ask_fn,
+            rubric=rubric,
+            model=gpt_model,
+            temperature=temperature_score,
+            grade_samples=grade_samples,
+        )
+
+    drafts = ["draft1", "draft2", "draft3", "draft4"]
+    graph = TaskGraph()
+    graph.add("draft1", _draft1)
+    graph.add("fb1", _feedback(1), deps=["draft1"])
+    graph.add("draft2", _rewrite(2), deps=["draft1", "fb1"])
+    graph.add("fb2", _feedback(2), deps=["draft2"])
+    graph.add("draft3", _rewrite(3), deps=["draft2", "fb2"])
+    graph.add("draft4", _draft4, deps=["draft3", "fb2"])
+    if batch_grading:
+        # one request for all four drafts – has to wait for the last one
+        graph.add("scores", _grades, deps=drafts)
+    else:
+        for d in drafts:
+            graph.add(f"score_{d}", lambda essay: _grades(essay)[0], deps=[d])
+
+    # insertion order above is the old serial call order
+    with tracing.tags(persona=persona, arm=arm.value, run=run_idx):
+        out = graph.run(max_workers=None if parallel_tasks else 1)
+    draft1, draft2, draft3, draft4 = (out[d] for d in drafts)
+    fb1, fb2 = out["fb1"], out["fb2"]
+    if batch_grading:
+        grades = out["scores"]
+    else:
+        grades = [out[f"score_{d}"] for d in drafts]
+
+    # -------- Log row --------------------------------------
+    row = {
+        "run": run_idx,
+        "persona": persona,
+        "arm": arm.value,
+        "grade_level": grade_level,
+        "gpt_model": gpt_model,
+        "temperature_writing": temperature_writing,
+        "temperature_feedback": temperature_feedback,
+        "temperature_score": temperature_score,
+        "prompt_1": prompts[0],
+        "prompt_1_draft_1": draft1,
+        "prompt_1_draft_1_score": grades[0].score,
+        "prompt_1_draft_1_score_dispersion": grades[0].dispersion,
+        "prompt_1_draft_1_score_samples": len(grades[0].samples),
+        "prompt_1_draft_1_feedback": fb1,
+        "prompt_1_revised_draft_2": draft2,
+        "prompt_1_revised_draft_2_score": grades[1].score,
+        "prompt_1_revised_draft_2_score_dispersion": grades[1].dispersion,
+        "prompt_1_revised_draft_2_score_samples": len(grades[1].samples),
+        "prompt_1_revised_draft_2_feedback": fb2,
+        "prompt_1_revised_draft_3": draft3,
+        "prompt_1_revised_draft_3_score": grades[2].score,
+        "prompt_1_revised_draft_3_score_dispersion": grades[2].dispersion,
+        "prompt_1_revised_draft_3_score_samples": len(grades[2].samples),
+        "prompt_2": prompts[1],
+        "prompt_2_draft_1": draft4,
+        "prompt_2_draft_1_score": grades[3].score,
+        "prompt_2_draft_1_score_dispersion": grades[3].dispersion,
+        "prompt_2_draft_1_score_samples": len(grades[3].samples),
+    }
+    return row
+
+
+def _run_cell_with_retries(*, max_retries: int, **cell_kw) -> Tuple[Optional[Dict], List[str]]:
+    """
+    Run one cell, retrying up to *max_retries* extra times.
+    Returns (row, errors); row is None if every attempt failed.
+    """
+    errors: List[str] = []
+    for _ in range(max_retries + 1):
+        try:
+            return _run_cell(**cell_kw), errors
+        except Exception:
+            errors.append(traceback.format_exc(limit=3))
+    return None, errors
+
+
+# ---------------------------------------------------------------------------
+#  streaming / resumable CSV helpers
+# ---------------------------------------------------------------------------
+
+# column order of the output CSV (keys of the row built in _run_cell)
+FIELDS: List[str] = [
+    "run",
+    "persona",
+    "arm",
+    "grade_level",
+    "gpt_model",
+    "temperature_writing",
+    "temperature_feedback",
+    "temperature_score",
+    "prompt_1",
+    "prompt_1_draft_1",
+    "prompt_1_draft_1_score",
+    "prompt_1_draft_1_score_dispersion",  # std of the sampled scores (0.0 = one sample / all agreed)
+    "prompt_1_draft_1_score_samples",     # grading samples drawn
+    "prompt_1_draft_1_feedback",
+    "prompt_1_revised_draft_2",
+    "prompt_1_revised_draft_2_score",
+    "prompt_1_revised_draft_2_score_dispersion",
+    "prompt_1_revised_draft_2_score_samples",
+    "prompt_1_revised_draft_2_feedback",
+    "prompt_1_revised_draft_3",
+    "prompt_1_revised_draft_3_score",
+    "prompt_1_revised_draft_3_score_dispersion",
+    "prompt_1_revised_draft_3_score_samples",
+    "prompt_2",
+    "prompt_2_draft_1",
+    "prompt_2_draft_1_score",
+    "prompt_2_draft_1_score_dispersion",
+    "prompt_2_draft_1_score_samples",
+]
+
+
+def _load_done_cells(csv_out: Path, fields: List[str] = FIELDS) -> Set[Tuple[str, str, int]]:
+    """
+    Return the (persona, arm, run) cells already present in a partial CSV
+    (persona is the `persona_ref` hash for a compact log).
+    A row cut short by a crash is dropped, and the file is rewritten with only
+    the complete rows so new rows can be appended after it safely.
+    """
+    if not csv_out.exists() or csv_out.stat().st_size == 0:
+        return set()
+
+    with csv_out.open(newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames != fields:
+            raise ValueError(f"Cannot resume: {csv_out} does not have the expected columns.")
+        complete = [r for r in reader if None not in r.values() and None not in r]
+
+    tmp = csv_out.with_suffix(csv_out.suffix + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(complete)
+    tmp.replace(csv_out)
+
+    persona_col = "persona" if "persona" in fields else "persona_ref"
+    return {(r[persona_col], r["arm"], int(r["run"])) for r in complete}
+
+
+def _sort_rows(csv_out: Path, fields: List[str], order: Dict[Tuple[str, str, int], int]) -> None:
+    """
+    Rewrite *csv_out* with its rows in grid order (*order* maps a
+    (persona, arm, run) cell to its position); rows outside the grid keep
+    their relative order at the end.
+    """
+    persona_col = "persona" if "persona" in fields else "persona_ref"
+    with csv_out.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    rows.sort(key=lambda r: order.get((r[persona_col], r["arm"], int(r["run"])), len(order)))
+
+    tmp = csv_out.with_suffix(csv_out.suffix + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    tmp.replace(csv_out)
+
+
+def _append_failure(err_out: Path, failure: Dict) -> None:
+    new_file = not err_out.exists()
+    with err_out.open("a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(failure))
+        if new_file:
+            writer.writeheader()
+        writer.writerow(failure)
 
 
 # ---------------------------------------------------------------------------
@@ -43,8 +339,46 @@ def batch_sim_three_two_revisions(
     rubric: str = RUBRIC,
     csv_out: str,
     verbose: bool = True,
+    max_workers: int = 1,
+    max_retries: int = 2,
+    batch_grading: bool = False,
+    grade_samples: int = 1,
+    parallel_tasks: bool = True,
+    resume: bool = False,
+    compact_texts: bool = False,
+    trace_out: Optional[Path] = None,
 ) -> Path:
-    """Run *runs* simulations for every (persona, arm) pair and write CSV."""
+    """Run *runs* simulations for every (persona, arm) pair and write CSV.
+
+    Every (persona, arm, run) cell is independent.  With ``max_workers > 1``
+    cells are fanned out to a thread pool.  A cell that raises is retried up
+    to *max_retries* times; if it still fails it is left out of the CSV and
+    logged to ``<csv_out stem>_errors.csv`` instead of aborting the batch.
+
+    Rows are appended and flushed as cells complete, so a crash loses at most
+    the cells in flight; once every cell is done the file is rewritten in
+    persona → arm → run order, so the CSV does not depend on *max_workers*.
+    ``resume=True`` keeps the rows already in *csv_out* and runs only the
+    (persona, arm, run) cells that are missing (including cells that
+    previously failed).
+
+    ``batch_grading=True`` grades the four drafts of a run in one request
+    (see grading.score_essays) instead of four.  ``grade_samples > 1``
+    grades each draft by self-consistency instead (grading.score_essay_consistent:
+    up to that many samples, stopping as soon as two agree) for less noisy
+    score deltas; it cannot be combined with batch_grading.
+
+    Within a run, calls that only depend on the same draft (grading it and
+    giving feedback on it) are issued together (task_graph.TaskGraph);
+    ``parallel_tasks=False`` makes every call of a run strictly sequential.
+
+    ``compact_texts=True`` stores every persona / prompt / draft / feedback
+    once in a blob store next to the CSV and writes only their hashes to
+    it (text_store.py); text_store.load_log_rows restores the full rows.
+
+    *trace_out* records one span per LLM call (tracing.py) to that JSONL
+    file; a per-stage latency / token summary is printed at the end.
+    """
 
     if len(prompts) != 2:
         raise ValueError("`prompts` must contain exactly two strings.")
@@ -52,159 +386,124 @@ def batch_sim_three_two_revisions(
         raise ValueError("`personas` list must contain at least one persona.")
     if not arms:
         raise ValueError("`arms` list must contain at least one FeedbackArm.")
+    if max_workers < 1:
+        raise ValueError("`max_workers` must be at least 1.")
+    if grade_samples < 1:
+        raise ValueError("`grade_samples` must be at least 1.")
+    if batch_grading and grade_samples > 1:
+        raise ValueError("`batch_grading` and `grade_samples > 1` cannot be combined.")
 
-    rows: List[Dict] = []
-
-    for persona in personas:
-        for arm in arms:
-            if verbose:
-                print(f"\n>>> Persona: {persona} | Arm: {arm.value}\n" + "-" * (22 + len(persona) + len(arm.value)))
-
-            for run_idx in range(1, runs + 1):
-                tag = f"[{persona} | {arm.value}] Run {run_idx}/{runs}"
-
-                # -------- Draft 1 ----------------------------------------
-                if verbose:
-                    print(f"{tag}: drafting essay 1 …")
-                draft1 = write_essay(
-                    persona=persona,
-                    essay_prompt=prompts[0],
-                    use_history=False,
-                    history=[],
-                    ask_fn=ask_fn,
-                    model=gpt_model,
-                    temperature=temperature_writing,
-                )
-                score1 = _grade(
-                    essay=draft1,
-                    ask_fn=ask_fn,
-                    rubric=rubric,
-                    model=gpt_model,
-                    temperature=temperature_score,
-                )
-
-                # -------- Feedback 1 → Draft 2 --------------------------
-                if verbose:
-                    print(f"{tag}: feedback 1 …")
-                fb1 = generate_feedback(
-                    essay=draft1,
-                    arm=arm,
-                    grade_level=grade_level,
-                    writing_prompt=prompts[0],
-                    ask_fn=ask_fn,
-                    model=gpt_model,
-                    temperature=temperature_feedback,
-                )
-                if verbose:
-                    print(f"{tag}: rewriting → draft 2 …")
-                draft2 = rewrite_essay(
-                    essay=draft1,
-                    feedback=fb1,
-                    persona=persona,
-                    ask_fn=ask_fn,
-                    model=gpt_model,
-                    temperature=temperature_writing,
-                )
-                score2 = _grade(
-                    essay=draft2,
-                    ask_fn=ask_fn,
-                    rubric=rubric,
-                    model=gpt_model,
-                    temperature=temperature_score,
-                )
-
-                # -------- Feedback 2 → Draft 3 --------------------------
-                if verbose:
-                    print(f"{tag}: feedback 2 …")
-                fb2 = generate_feedback(
-                    essay=draft2,
-                    arm=arm,
-                    grade_level=grade_level,
-                    writing_prompt=prompts[0],
-                    ask_fn=ask_fn,
-                    model=gpt_model,
-                    temperature=temperature_feedback,
-                )
-                if verbose:
-                    print(f"{tag}: rewriting → draft 3 …")
-                draft3 = rewrite_essay(
-                    essay=draft2,
-                    feedback=fb2,
-                    persona=persona,
-                    ask_fn=ask_fn,
-                    model=gpt_model,
-                    temperature=temperature_writing,
-                )
-                score3 = _grade(
-                    essay=draft3,
-                    ask_fn=ask_fn,
-                    rubric=rubric,
-                    model=gpt_model,
-                    temperature=temperature_score,
-                )
-
-                # -------- Draft 4 (prompt 2, history‑aware) -------------
-                history = [{"prompt": prompts[0], "essay": draft3, "feedback": fb2}]
-                if verbose:
-                    print(f"{tag}: drafting essay 2 (with history) …")
-                draft4 = write_essay(
-                    persona=persona,
-                    essay_prompt=prompts[1],
-                    use_history=True,
-                    history=history,
-                    ask_fn=ask_fn,
-                    model=gpt_model,
-                    temperature=temperature_writing,
-                )
-                score4 = _grade(
-                    essay=draft4,
-                    ask_fn=ask_fn,
-                    rubric=rubric,
-                    model=gpt_model,
-                    temperature=temperature_score,
-                )
-
-                # -------- Log row --------------------------------------
-                rows.append(
-                    {
-                        "run": run_idx,
-                        "persona": persona,
-                        "arm": arm.value,
-                        "grade_level": grade_level,
-                        "gpt_model": gpt_model,
-                        "temperature_writing": temperature_writing,
-                        "temperature_feedback": temperature_feedback,
-                        "temperature_score": temperature_score,
-                        "prompt_1": prompts[0],
-                        "prompt_1_draft_1": draft1,
-                        "prompt_1_draft_1_score": score1,
-                        "prompt_1_draft_1_feedback": fb1,
-                        "prompt_1_revised_draft_2": draft2,
-                        "prompt_1_revised_draft_2_score": score2,
-                        "prompt_1_revised_draft_2_feedback": fb2,
-                        "prompt_1_revised_draft_3": draft3,
-                        "prompt_1_revised_draft_3_score": score3,
-                        "prompt_2": prompts[1],
-                        "prompt_2_draft_1": draft4,
-                        "prompt_2_draft_1_score": score4,
-                    }
-                )
-                time.sleep(0.2)
-
-    # -------- Write CSV ------------------------------------------------------
-    if not rows:
-        raise RuntimeError("No rows were generated—check your inputs.")
+    cells = [
+        (persona, arm, run_idx)
+        for persona in personas
+        for arm in arms
+        for run_idx in range(1, runs + 1)
+    ]
+    shared = dict(
+        runs=runs,
+        grade_level=grade_level,
+        prompts=prompts,
+        gpt_model=gpt_model,
+        temperature_writing=temperature_writing,
+        temperature_score=temperature_score,
+        temperature_feedback=temperature_feedback,
+        ask_fn=ask_fn,
+        rubric=rubric,
+        batch_grading=batch_grading,
+        grade_samples=grade_samples,
+        parallel_tasks=parallel_tasks,
+        # per-step chatter from parallel cells would interleave – keep it for serial runs only
+        verbose=verbose and max_workers == 1,
+        max_retries=max_retries,
+    )
 
-    header = list(rows[0])
+    # -------- Output files ---------------------------------------------------
     csv_out = Path(csv_out)
     csv_out.parent.mkdir(parents=True, exist_ok=True)
-    with csv_out.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=header)
-        writer.writeheader()
-        writer.writerows(rows)
+    err_out = csv_out.with_name(f"{csv_out.stem}_errors.csv")
+
+    fields = compact_fields(FIELDS, BATCH_TEXT_FIELDS) if compact_texts else FIELDS
+    store = TextStore(default_store_path(csv_out)) if compact_texts else None
+    persona_id = text_hash if compact_texts else (lambda persona: persona)
+
+    done_cells = _load_done_cells(csv_out, fields) if resume else set()
+    todo = [
+        (persona, arm, run_idx)
+        for persona, arm, run_idx in cells
+        if (persona_id(persona), arm.value, run_idx) not in done_cells
+    ]
+    if verbose and resume:
+        print(f"Resuming: {len(cells) - len(todo)}/{len(cells)} cell(s) already in {csv_out}")
+
+    n_written = len(done_cells)
+    n_failed = 0
+    n_finished = 0
+
+    with tracing.traced_run(trace_out, verbose), \
+            csv_out.open("a" if done_cells else "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        if not done_cells:
+            writer.writeheader()
+            f.flush()
+
+        # each row is written and flushed the moment its cell finishes (crash
+        # safety); the grid order is restored by _sort_rows below
+        def _collect(pos, row, errors) -> None:
+            nonlocal n_written, n_failed, n_finished
+            persona, arm, run_idx = todo[pos]
+            n_finished += 1
+            if row is None:
+                n_failed += 1
+                _append_failure(err_out, {
+                    "run": run_idx,
+                    "persona": persona,
+                    "arm": arm.value,
+                    "attempts": len(errors),
+                    "error": errors[-1],
+                })
+            if verbose:
+                status = "ok" if row is not None else f"FAILED after {len(errors)} attempt(s)"
+                print(f"[{n_finished}/{len(todo)}] {persona} | {arm.value} | run {run_idx}: {status}")
+
+            if row is not None:
+                if store is not None:
+                    row = compact_row(row, BATCH_TEXT_FIELDS, store)
+                    store.flush()
+                writer.writerow(row)
+                n_written += 1
+                f.flush()
+
+        if max_workers == 1:
+            for pos, (persona, arm, run_idx) in enumerate(todo):
+                if verbose and run_idx == 1:
+                    print(f"\n>>> Persona: {persona} | Arm: {arm.value}\n" + "-" * (22 + len(persona) + len(arm.value)))
+                _collect(pos, *_run_cell_with_retries(persona=persona, arm=arm, run_idx=run_idx, **shared))
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {
+                    pool.submit(_run_cell_with_retries, persona=persona, arm=arm, run_idx=run_idx, **shared): pos
+                    for pos, (persona, arm, run_idx) in enumerate(todo)
+                }
+                for fut in as_completed(futures):
+                    _collect(futures[fut], *fut.result())
+
+    if store is not None:
+        store.close()
+
+    if max_workers > 1 or done_cells:
+        _sort_rows(csv_out, fields, {
+            (persona_id(persona), arm.value, run_idx): pos
+            for pos, (persona, arm, run_idx) in enumerate(cells)
+        })
+
+    if verbose and n_failed:
+        print(f"\n{n_failed} cell(s) failed – details in {err_out.resolve()}")
+
+    if not n_written:
+        raise RuntimeError("No rows were generated—check your inputs.")
 
     if verbose:
         print(
-            f"\nSaved {len(rows)} rows (across {len(personas)} persona(s) × {len(arms)} arm(s)) to {csv_out.resolve()}"
+            f"\nSaved {n_written} rows (across {len(personas)} persona(s) × {len(arms)} arm(s)) to {csv_out.resolve()}"
         )
     return csv_out
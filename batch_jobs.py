@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+"""
+batch_jobs.py  –  staged (bulk-job) mode for batch_sim_three_two_revisions
+--------------------------------------------------------------------------
+Instead of walking every (persona, arm, run) cell through its calls one
+interactive request at a time, every run advances through the same stages
+in lock-step and each stage is shipped as ONE JSONL job file:
+
+    draft1     → feedback1 → rewrite1 → feedback2 → rewrite2 → transfer → grading
+    (essay 1)    (draft 1)   (draft 2)  (draft 2)   (draft 3)  (essay 2)  (4 drafts)
+
+Stages: draft1, feedback, rewrite, transfer, grading (feedback/rewrite run twice).
+
+    export  – write every pending request as a job line in the OpenAI Batch
+              format  {"custom_id", "method", "url", "body"}.  custom_ids are
+              stable ("p2-socratic_low-r7/rewrite1:draft2"), so a request that fails
+              is simply exported again – under the same id – next round.
+    ingest  – read a results JSONL (Batch output format) and move every run
+              whose current stage is complete on to the next one.
+    process – local stand-in for the batch endpoint: answers a job file with
+              any ask_fn (fake_llm by default) and writes the results file.
+
+State (all drafts / feedback / scores so far) lives in <workdir>/state.json,
+so export and ingest can be hours apart.  When every run is done, `csv`
+writes the same columns as batch.py.
+
+    python -m src.batch_jobs init    --workdir jobs/run1 --runs 50
+    python -m src.batch_jobs export  --workdir jobs/run1      # → jobs/run1/round_001.jsonl
+    ... submit the file, download its output ...
+    python -m src.batch_jobs ingest  --workdir jobs/run1 --results out.jsonl
+    python -m src.batch_jobs csv     --workdir jobs/run1 --outfile sim.csv
+
+    python -m src.batch_jobs run-local --workdir jobs/dry --runs 2 --backend fake
+"""
+
+from __future__ import annotations
+import argparse
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.batch import FIELDS
+from src.feedback import FeedbackArm, _feedback_prompts
+from src.grading import RUBRIC, _parse_score, _score_prompts
+from src.writing import _rewrite_prompts, _write_prompts
+
+STAGES = ("draft1", "feedback", "rewrite", "transfer", "grading")
+
+# the steps of one run, in order; each is (step name, stage)
+_STEPS = [
+    ("draft1", "draft1"),
+    ("feedback1", "feedback"),
+    ("rewrite1", "rewrite"),
+    ("feedback2", "feedback"),
+    ("rewrite2", "rewrite"),
+    ("transfer", "transfer"),
+    ("grading", "grading"),
+]
+_DONE = len(_STEPS)
+
+# slot names filled by each step (grading fills one slot per draft)
+_GRADED = ("draft1", "draft2", "draft3", "draft4")
+_SLOTS = {
+    "draft1": ["draft1"],
+    "feedback1": ["fb1"],
+    "rewrite1": ["draft2"],
+    "feedback2": ["fb2"],
+    "rewrite2": ["draft3"],
+    "transfer": ["draft4"],
+    "grading": [f"score_{d}" for d in _GRADED],
+}
+
+STATE_FILE = "state.json"
+
+
+class StagedBatch:
+    """
+    On-disk state of a staged run.  One entry per (persona, arm, run) cell:
+        {"persona": i, "arm": "socratic_low", "run": 3, "step": 2,
+         "out": {"draft1": "...", "fb1": "...", ...}}
+    """
+
+    def __init__(self, workdir: Path, config: Dict, runs: List[Dict], round_no: int = 0):
+        self.workdir = Path(workdir)
+        self.config = config
+        self.runs = runs
+        self.round_no = round_no
+
+    # ------------------------------------------------------------------ #
+    # creation / persistence
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def create(
+        cls,
+        workdir: Path,
+        *,
+        runs: int,
+        personas: List[str],
+        grade_level: str,
+        prompts: List[str],
+        arms: List[FeedbackArm],
+        gpt_model: str = "gpt-4o",
+        temperature_writing: float = 1.0,
+        temperature_score: float = 0.5,
+        temperature_feedback: float = 0.5,
+        rubric: str = RUBRIC,
+    ) -> "StagedBatch":
+        if len(prompts) != 2:
+            raise ValueError("`prompts` must contain exactly two strings.")
+        if not personas or not arms:
+            raise ValueError("Need at least one persona and one FeedbackArm.")
+        workdir = Path(workdir)
+        if (workdir / STATE_FILE).exists():
+            raise FileExistsError(f"{workdir / STATE_FILE} already exists; open it instead.")
+
+        config = dict(
+            personas=list(personas),
+            grade_level=grade_level,
+            prompts=list(prompts),
+            gpt_model=gpt_model,
+            temperature_writing=temperature_writing,
+            temperature_score=temperature_score,
+            temperature_feedback=temperature_feedback,
+            rubric=rubric,
+            n_runs=runs,
+        )
+        cells = [
+            {"persona": p, "arm": arm.value, "run": r, "step": 0, "out": {}}
+            for p in range(len(personas))
+            for arm in arms
+            for r in range(1, runs + 1)
+        ]
+        batch = cls(workdir, config, cells)
+        batch.save()
+        return batch
+
+    @classmethod
+    def open(cls, workdir: Path) -> "StagedBatch":
+        state = json.loads((Path(workdir) / STATE_FILE).read_text(encoding="utf-8"))
+        return cls(workdir, state["config"], state["runs"], state["round"])
+
+    def save(self) -> None:
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        tmp = self.workdir / (STATE_FILE + ".tmp")
+        tmp.write_text(json.dumps({"config": self.config, "runs": self.runs, "round": self.round_no}),
+                       encoding="utf-8")
+        tmp.replace(self.workdir / STATE_FILE)
+
+    # ------------------------------------------------------------------ #
+    # requests
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _cell_id(cell: Dict) -> str:
+        return f"p{cell['persona']}-{cell['arm']}-r{cell['run']}"
+
+    def _prompts_for(self, cell: Dict, step: str) -> Dict[str, tuple]:
+        """Return {slot: (system, user, temperature)} for the requests of *step*."""
+        cfg, out = self.config, cell["out"]
+        persona = cfg["personas"][cell["persona"]]
+        arm = FeedbackArm(cell["arm"])
+        p1, p2 = cfg["prompts"]
+
+        if step == "draft1":
+            return {"draft1": (*_write_prompts(persona, p1, False, [], 4), cfg["temperature_writing"])}
+        if step in ("feedback1", "feedback2"):
+            essay = out["draft1"] if step == "feedback1" else out["draft2"]
+            slot = "fb1" if step == "feedback1" else "fb2"
+            return {slot: (*_feedback_prompts(essay, arm, cfg["grade_level"], p1), cfg["temperature_feedback"])}
+        if step in ("rewrite1", "rewrite2"):
+            essay, fb, slot = (out["draft1"], out["fb1"], "draft2") if step == "rewrite1" \
+                else (out["draft2"], out["fb2"], "draft3")
+            return {slot: (*_rewrite_prompts(essay, fb, persona), cfg["temperature_writing"])}
+        if step == "transfer":
+            history = [{"prompt": p1, "essay": out["draft3"], "feedback": out["fb2"]}]
+            return {"draft4": (*_write_prompts(persona, p2, True, history, 4), cfg["temperature_writing"])}
+        # grading
+        return {
+            f"score_{d}": (*_score_prompts(out[d], cfg["rubric"]), cfg["temperature_score"])
+            for d in _GRADED
+        }
+
+    def pending_requests(self) -> List[Dict]:
+        """Job lines for every slot of every run's current step that is not filled yet."""
+        jobs = []
+        for cell in self.runs:
+            if cell["step"] == _DONE:
+                continue
+            step = _STEPS[cell["step"]][0]
+            for slot, (system, user, temperature) in self._prompts_for(cell, step).items():
+                if slot in cell["out"]:
+                    continue
+                jobs.append({
+                    "custom_id": f"{self._cell_id(cell)}/{step}:{slot}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.config["gpt_model"],
+                        "messages": [
+                            {"role": "system", "content": system},
+                            {"role": "user", "content": user},
+                        ],
+                        "temperature": temperature,
+                    },
+                })
+        return jobs
+
+    def export(self, path: Optional[Path] = None) -> Optional[Path]:
+        """Write the pending requests to a job file; returns None if nothing is pending."""
+        jobs = self.pending_requests()
+        if not jobs:
+            return None
+        self.round_no += 1
+        path = Path(path) if path else self.workdir / f"round_{self.round_no:03d}.jsonl"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            for job in jobs:
+                f.write(json.dumps(job) + "\n")
+        self.save()
+        return path
+
+    # ------------------------------------------------------------------ #
+    # results
+    # ------------------------------------------------------------------ #
+    def ingest(self, results_path: Path) -> Dict[str, int]:
+        """
+        Store every successful result whose custom_id matches a run's current
+        step, then advance runs whose step is complete.  Failed, unparsable
+        or stale lines are counted and otherwise ignored (they are exported
+        again next round).
+        """
+        by_id = {self._cell_id(c): c for c in self.runs}
+        counts = {"ok": 0, "failed": 0, "stale": 0, "advanced": 0}
+
+        with Path(results_path).open(encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                res = json.loads(line)
+                cell_id, _, rest = res["custom_id"].partition("/")
+                step, _, slot = rest.partition(":")
+                cell = by_id.get(cell_id)
+                if cell is None or cell["step"] == _DONE or _STEPS[cell["step"]][0] != step \
+                        or slot not in _SLOTS[step] or slot in cell["out"]:
+                    counts["stale"] += 1
+                    continue
+
+                response = res.get("response") or {}
+                if res.get("error") or response.get("status_code") != 200:
+                    counts["failed"] += 1
+                    continue
+                content = response["body"]["choices"][0]["message"]["content"].strip()
+                if slot.startswith("score_"):
+                    try:
+                        content = _parse_score(content)
+                    except ValueError:
+                        counts["failed"] += 1
+                        continue
+                cell["out"][slot] = content
+                counts["ok"] += 1
+
+        for cell in self.runs:
+            if cell["step"] != _DONE and all(s in cell["out"] for s in _SLOTS[_STEPS[cell["step"]][0]]):
+                cell["step"] += 1
+                counts["advanced"] += 1
+        self.save()
+        return counts
+
+    # ------------------------------------------------------------------ #
+    # progress / output
+    # ------------------------------------------------------------------ #
+    @property
+    def done(self) -> bool:
+        return all(cell["step"] == _DONE for cell in self.runs)
+
+    def status(self) -> Dict[str, int]:
+        """Number of runs waiting on each step (plus "done")."""
+        counts = {name: 0 for name, _ in _STEPS}
+        counts["done"] = 0
+        for cell in self.runs:
+            counts[_STEPS[cell["step"]][0] if cell["step"] != _DONE else "done"] += 1
+        return counts
+
+    def write_csv(self, csv_out: Path) -> Path:
+        """Write finished runs with batch.py's columns (persona → arm → run order)."""
+        cfg = self.config
+        csv_out = Path(csv_out)
+        csv_out.parent.mkdir(parents=True, exist_ok=True)
+        with csv_out.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            for cell in self.runs:
+                if cell["step"] != _DONE:
+                    continue
+                out = cell["out"]
+                writer.writerow({
+                    "run": cell["run"],
+                    "persona": cfg["personas"][cell["persona"]],
+                    "arm": cell["arm"],
+                    "grade_level": cfg["grade_level"],
+                    "gpt_model": cfg["gpt_model"],
+                    "temperature_writing": cfg["temperature_writing"],
+                    "temperature_feedback": cfg["temperature_feedback"],
+                    "temperature_score": cfg["temperature_score"],
+                    "prompt_1": cfg["prompts"][0],
+                    "prompt_1_draft_1": out["draft1"],
+                    "prompt_1_draft_1_score": out["score_draft1"],
+                    "prompt_1_draft_1_score_dispersion": 0.0,
+                    "prompt_1_draft_1_score_samples": 1,
+                    "prompt_1_draft_1_feedback": out["fb1"],
+                    "prompt_1_revised_draft_2": out["draft2"],
+                    "prompt_1_revised_draft_2_score": out["score_draft2"],
+                    "prompt_1_revised_draft_2_score_dispersion": 0.0,
+                    "prompt_1_revised_draft_2_score_samples": 1,
+                    "prompt_1_revised_draft_2_feedback": out["fb2"],
+                    "prompt_1_revised_draft_3": out["draft3"],
+                    "prompt_1_revised_draft_3_score": out["score_draft3"],
+                    "prompt_1_revised_draft_3_score_dispersion": 0.0,
+                    "prompt_1_revised_draft_3_score_samples": 1,
+                    "prompt_2": cfg["prompts"][1],
+                    "prompt_2_draft_1": out["draft4"],
+                    "prompt_2_draft_1_score": out["score_draft4"],
+                    "prompt_2_draft_1_score_dispersion": 0.0,
+                    "prompt_2_draft_1_score_samples": 1,
+                })
+        return csv_out
+
+
+# ---------------------------------------------------------------------------
+#  local stand-in for the batch endpoint
+# ---------------------------------------------------------------------------
+def process_jobs(jobs_path: Path, results_path: Path, *, ask_fn: Callable, max_workers: int = 8) -> Path:
+    """Answer every line of a job file with *ask_fn*; write a results file in Batch output format."""
+    with Path(jobs_path).open(encoding="utf-8") as f:
+        jobs = [json.loads(line) for line in f if line.strip()]
+
+    def _answer(job: Dict) -> Dict:
+        body = job["body"]
+        messages = {m["role"]: m["content"] for m in body["messages"]}
+        try:
+            content = ask_fn(system=messages["system"], user=messages["user"],
+                             model=body["model"], temperature=body["temperature"])
+        except Exception as exc:
+            return {"custom_id": job["custom_id"], "response": None,
+                    "error": {"code": type(exc).__name__, "message": str(exc)}}
+        return {
+            "custom_id": job["custom_id"],
+            "response": {"status_code": 200, "body": {
+                "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+            }},
+            "error": None,
+        }
+
+    # like the real endpoint, results are not guaranteed to come back in job order
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(_answer, jobs))
+
+    results_path = Path(results_path)
+    with results_path.open("w", encoding="utf-8") as f:
+        for res in results:
+            f.write(json.dumps(res) + "\n")
+    return results_path
+
+
+def run_local(batch: StagedBatch, *, ask_fn: Callable, max_workers: int = 8,
+              max_rounds: int = 50, verbose: bool = True) -> StagedBatch:
+    """export → process → ingest until every run is done (or *max_rounds* is hit)."""
+    for _ in range(max_rounds):
+        jobs = batch.export()
+        if jobs is None:
+            break
+        results = process_jobs(jobs, jobs.with_name(jobs.stem + "_results.jsonl"),
+                               ask_fn=ask_fn, max_workers=max_workers)
+        counts = batch.ingest(results)
+        if verbose:
+            print(f"round {batch.round_no}: {counts} | {batch.status()}")
+    return batch
+
+
+# -------- CLI --------------------------------------------------------------
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser("Staged batch-job runner for the revision simulation")
+    p.add_argument("command", choices=["init", "export", "ingest", "process", "status", "csv", "run-local"])
+    p.add_argument("--workdir", type=Path, required=True, help="Directory holding state.json and job files")
+    p.add_argument("--runs", type=int, default=50, help="Runs per (persona, arm) – init / run-local")
+    p.add_argument("--model", type=str, default="gpt-4o")
+    p.add_argument("--jobs", type=Path, default=None, help="Job file for `process` (default: latest round)")
+    p.add_argument("--results", type=Path, default=None, help="Results JSONL for `ingest` / `process`")
+    p.add_argument("--outfile", type=Path, default=None, help="CSV for `csv` / `run-local`")
+    p.add_argument("--backend", type=str, default="fake", choices=["openai", "fake"],
+                   help="Who answers jobs in `process` / `run-local` (default fake)")
+    p.add_argument("--workers", type=int, default=8)
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    def _new_batch() -> StagedBatch:
+        from src.simulate import PERSONAS, PROMPTS
+        return StagedBatch.create(args.workdir, runs=args.runs, personas=PERSONAS,
+                                  grade_level="10th-grade", prompts=PROMPTS,
+                                  arms=list(FeedbackArm), gpt_model=args.model)
+
+    def _ask_fn() -> Callable:
+        from src.utils import ask_gpt, set_backend
+        set_backend(args.backend)
+        return ask_gpt
+
+    if args.command == "init":
+        batch = _new_batch()
+        print(f"{len(batch.runs)} run(s) initialised in {args.workdir}")
+    elif args.command == "run-local":
+        batch = StagedBatch.open(args.workdir) if (args.workdir / STATE_FILE).exists() else _new_batch()
+        run_local(batch, ask_fn=_ask_fn(), max_workers=args.workers)
+        if batch.done and args.outfile:
+            print(f"Saved {batch.write_csv(args.outfile).resolve()}")
+    else:
+        batch = StagedBatch.open(args.workdir)
+        if args.command == "export":
+            path = batch.export()
+            print(f"Wrote {path}" if path else "Nothing pending – every run is done.")
+        elif args.command == "ingest":
+            print(batch.ingest(args.results))
+        elif args.command == "process":
+            jobs = args.jobs or args.workdir / f"round_{batch.round_no:03d}.jsonl"
+            out = process_jobs(jobs, args.results or jobs.with_name(jobs.stem + "_results.jsonl"),
+                               ask_fn=_ask_fn(), max_workers=args.workers)
+            print(f"Wrote {out}")
+        elif args.command == "csv":
+            if not batch.done:
+                print(f"Warning: only finished runs are written – {batch.status()}")
+            print(f"Saved {batch.write_csv(args.outfile or args.workdir / 'sim.csv').resolve()}")
+        print(batch.status())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""
+bench.py  –  reproducible micro / end-to-end benchmarks
+-------------------------------------------------------
+  • linucb/select_arm, linucb/update   – latency as K (arms) and d (dim) grow
+  • ucb1/select_arm                    – latency with many arms
+  • features/build_x                   – cost per essay (a new draft every call)
+  • features/build_x/warm              – the same drafts again (memo cache hits)
+  • e2e/run_episode                    – episodes per second  (fake_llm, no latency)
+  • e2e/batch_cell                     – cells per second     (fake_llm, no latency;
+                                         unpaced – no scheduler in the loop)
+  • startup/import_cli_online          – import time of the CLI entry point in a
+                                         fresh interpreter (bare start-up subtracted)
+
+Results are written as JSON ({name: {median_s, p95_s, per_s, n}}).  With
+--baseline the run is compared against a saved result file and the exit
+code is 1 if any benchmark's median got slower than the tolerance allows.
+The startup suite also has an absolute budget (--import-budget): importing
+cli_online must stay under it and must not pull in openai or textstat.
+
+    python -m src.bench --out bench.json                     # measure
+    python -m src.bench --out new.json --baseline bench.json # compare
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+SEED = 1234
+# the import itself takes ~0.23 s; 0.3 s left no headroom on a busy machine
+# (306 ms seen).  Eager imports of LAZY_MODULES are flagged separately – the
+# budget is for gross regressions (openai alone adds ~0.7 s), not ms drift
+IMPORT_BUDGET_S = 0.5
+# modules that must only be imported on first real use
+LAZY_MODULES = ("openai", "textstat")
+
+
+def _measure(fn: Callable[[], object], *, repeat: int, warmup: int = 3) -> Dict[str, float]:
+    """Time *fn* `repeat` times (after `warmup` untimed calls)."""
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - t0
+    median = float(np.median(samples))
+    return {
+        "median_s": median,
+        "p95_s": float(np.percentile(samples, 95)),
+        "per_s": 1.0 / median if median > 0 else float("inf"),
+        "n": repeat,
+    }
+
+
+# ---------------------------------------------------------------------------
+#  bandit hot paths
+# ---------------------------------------------------------------------------
+def bench_linucb(results: Dict, repeat: int) -> None:
+    from .linucb_policy import LinUCBPolicy
+
+    rng = np.random.default_rng(SEED)
+    for n_arms in (4, 16, 64):
+        for dim in (7, 32, 128):
+            policy = LinUCBPolicy(n_arms=n_arms, dim=dim, alpha=1.0)
+            policy.rng = np.random.default_rng(SEED)
+            X = rng.normal(size=(64, dim))
+            # warm the model so A_inv is not the identity
+            for t in range(200):
+                policy.update(t % n_arms, float(rng.normal()), X[t % 64])
+
+            it = iter(range(10**9))
+            results[f"linucb/select_arm/K={n_arms}/d={dim}"] = _measure(
+                lambda: policy.select_arm(X[next(it) % 64]), repeat=repeat)
+            results[f"linucb/update/K={n_arms}/d={dim}"] = _measure(
+                lambda: policy.update(next(it) % n_arms, 0.5, X[next(it) % 64]), repeat=repeat)
+
+
+def bench_ucb1(results: Dict, repeat: int) -> None:
+    from .noncontextual_ucb import NonContextualUCB
+
+    rng = np.random.default_rng(SEED)
+    for n_arms in (4, 100, 1000):
+        ucb = NonContextualUCB(n_arms=n_arms, seed=SEED)
+        for i in range(n_arms * 2):                 # every arm played → scoring path
+            ucb.update(i % n_arms, float(rng.random()))
+        t = n_arms * 2
+        results[f"ucb1/select_arm/K={n_arms}"] = _measure(lambda: ucb.select_arm(t), repeat=repeat)
+
+
+def bench_build_x(results: Dict, repeat: int) -> None:
+    from .bandit_features import build_x
+    from .fake_llm import FakeLLM
+
+    fake = FakeLLM(seed=SEED)
+    levels = ("A1", "B1", "C1")
+    # a fresh draft per call: essay_features (and textstat underneath) memoize,
+    # so cycling over a few essays would time cache hits
+    essays = [fake.essay(levels[i % 3]) for i in range(repeat + 3)]
+    it = iter(range(10**9))
+    results["features/build_x"] = _measure(
+        lambda: build_x(essays[next(it)], "int_imp", 3.0), repeat=repeat)
+
+    # the same draft featurized again (e.g. as the next round's context) is a cache hit
+    warm = essays[:30]
+    results["features/build_x/warm"] = _measure(
+        lambda: build_x(warm[next(it) % len(warm)], "int_imp", 3.0), repeat=repeat)
+
+
+# ---------------------------------------------------------------------------
+#  end-to-end throughput against a stubbed ask_fn
+# ---------------------------------------------------------------------------
+def bench_e2e(results: Dict, repeat: int) -> None:
+    from .bandit_features import CTX_DIM
+    from .batch import _run_cell
+    from .cli_online import PERSONA_POOL, PROMPT1_POOL
+    from .fake_llm import FakeLLM
+    from .feedback import FeedbackArm
+    from .grading import RUBRIC
+    from .linucb_policy import LinUCBPolicy
+    from .online_sim import run_episode
+
+    fake = FakeLLM(seed=SEED)
+    bandit = LinUCBPolicy(n_arms=4, dim=CTX_DIM, alpha=1.0)
+    bandit.rng = np.random.default_rng(SEED)
+    personas = list(PERSONA_POOL.items())
+    it = iter(range(10**9))
+
+    def episode():
+        key, text = personas[next(it) % len(personas)]
+        run_episode(bandit=bandit, persona_key=key, persona_text=text,
+                    prompt1=PROMPT1_POOL[0], ask_fn=fake)
+
+    results["e2e/run_episode"] = _measure(episode, repeat=repeat, warmup=1)
+
+    def cell():
+        _run_cell(persona=personas[0][1], arm=FeedbackArm.SOC_LOW, run_idx=1, runs=1,
+                  grade_level="10th-grade", prompts=PROMPT1_POOL, gpt_model="fake",
+                  temperature_writing=1.0, temperature_score=0.5, temperature_feedback=0.5,
+                  ask_fn=fake, rubric=RUBRIC, batch_grading=False, parallel_tasks=True,
+                  verbose=False)
+
+    results["e2e/batch_cell"] = _measure(cell, repeat=max(3, repeat // 10), warmup=1)
+
+
+# ---------------------------------------------------------------------------
+#  CLI start-up
+# ---------------------------------------------------------------------------
+def _python(code: str) -> str:
+    # same working directory as this run, so `import <package>` resolves the same way
+    return subprocess.run([sys.executable, "-c", code], check=True,
+                          capture_output=True, text=True).stdout
+
+
+def bench_startup(results: Dict, repeat: int) -> None:
+    repeat = max(5, repeat // 20)
+    bare = _measure(lambda: _python("pass"), repeat=repeat, warmup=1)
+    cli = _measure(lambda: _python(f"import {__package__}.cli_online"), repeat=repeat, warmup=1)
+    net = max(cli["median_s"] - bare["median_s"], 0.0)
+    loaded = _python(
+        f"import sys, {__package__}.cli_online; "
+        f"print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    ).split()
+    results["startup/import_cli_online"] = {
+        "median_s": net,
+        "p95_s": max(cli["p95_s"] - bare["median_s"], 0.0),
+        "per_s": 1.0 / net if net > 0 else float("inf"),
+        "n": repeat,
+        "eager_modules": loaded,
+    }
+
+
+SUITES = {
+    "linucb": bench_linucb,
+    "ucb1": bench_ucb1,
+    "build_x": bench_build_x,
+    "e2e": bench_e2e,
+    "startup": bench_startup,
+}
+
+
+# ---------------------------------------------------------------------------
+#  baseline comparison
+# ---------------------------------------------------------------------------
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a list of regression messages (median slower than baseline × (1 + tolerance))."""
+    regressions = []
+    for name, res in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = res["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        flag = "REGRESSION" if ratio > 1.0 + tolerance else ""
+        print(f"{name:<40} {base['median_s'] * 1e6:12.1f} µs -> {res['median_s'] * 1e6:12.1f} µs  "
+              f"x{ratio:5.2f} {flag}")
+        if flag:
+            regressions.append(f"{name}: {ratio:.2f}x slower")
+    return regressions
+
+
+def check_startup(results: Dict, budget: float) -> List[str]:
+    """Absolute start-up budget, independent of any baseline."""
+    res = results.get("startup/import_cli_online")
+    if res is None:
+        return []
+    problems = []
+    if res["median_s"] > budget:
+        problems.append(f"import cli_online: {res['median_s'] * 1e3:.0f} ms > budget {budget * 1e3:.0f} ms")
+    if res["eager_modules"]:
+        problems.append(f"import cli_online loads {res['eager_modules']} eagerly")
+    return problems
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser("Bandit / pipeline benchmarks")
+    p.add_argument("--suites", nargs="+", default=list(SUITES), choices=list(SUITES))
+    p.add_argument("--repeat", type=int, default=200, help="Timed repetitions per benchmark")
+    p.add_argument("--out", type=Path, default=Path("bench.json"), help="Where to write results")
+    p.add_argument("--baseline", type=Path, default=None, help="Saved results to compare against")
+    p.add_argument("--tolerance", type=float, default=0.5,
+                   help="Allowed slowdown before flagging a regression (default 0.5 = 50%%)")
+    p.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_S,
+                   help=f"Max seconds to import cli_online (default {IMPORT_BUDGET_S})")
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name in args.suites:
+        SUITES[name](results, args.repeat)
+
+    payload = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(payload, indent=2))
+    print(f"Saved {len(results)} benchmark(s) to {args.out.resolve()}")
+
+    regressions = check_startup(results, args.import_budget)
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions += compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n" + "\n".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
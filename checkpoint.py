@@ -0,0 +1,105 @@
+"""
+checkpoint.py
+-------------
+Compact binary snapshots of a running simulate_online_bandit() so an
+interrupted run can continue exactly where it stopped.
+
+A checkpoint is a single .npz file:
+  • every ndarray in bandit.get_state()  → stored as "policy/<name>"
+  • everything else (version, policy class, episode counter, playlist,
+    RNG states, scalar policy fields)    → one JSON string under "meta"
+
+Works with any policy that implements get_state() / set_state()
+(LinUCBPolicy, UCBPolicyAdapter, NonContextualUCB).
+"""
+
+from __future__ import annotations
+import json
+import os
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(
+    path: Path,
+    *,
+    bandit: Any,
+    episode: int,
+    playlist: List[str],
+    prompt_rng_state: Optional[tuple],
+) -> Path:
+    """
+    Write a snapshot of *bandit* after *episode* finished episodes.
+
+    playlist          : persona keys in shuffled episode order (to verify on resume)
+    prompt_rng_state  : random.getstate() of the RNG that draws prompt1
+                        (None for policy-only snapshots, e.g. bandit_service.py)
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    arrays: Dict[str, np.ndarray] = {}
+    policy_meta: Dict[str, Any] = {}
+    for key, value in bandit.get_state().items():
+        if isinstance(value, np.ndarray):
+            arrays[f"policy/{key}"] = value
+        else:
+            policy_meta[key] = value
+
+    meta = {
+        "version": CHECKPOINT_VERSION,
+        "policy_class": type(bandit).__name__,
+        "episode": episode,
+        "playlist": playlist,
+        "prompt_rng_state": prompt_rng_state,
+        "policy": policy_meta,
+    }
+
+    # write to a temp file first so a crash mid-write never leaves a broken checkpoint
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.savez_compressed(f, meta=np.array(json.dumps(meta, default=_to_json)), **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def load_checkpoint(path: Path, *, bandit: Any) -> Tuple[int, List[str], Optional[tuple]]:
+    """
+    Restore *bandit* in place from *path*.
+    Returns (episode, playlist, prompt_rng_state) for the runner to continue from.
+    """
+    with np.load(Path(path), allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        arrays = {k[len("policy/"):]: data[k] for k in data.files if k.startswith("policy/")}
+
+    if meta["version"] != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {meta['version']} (expected {CHECKPOINT_VERSION}).")
+    if meta["policy_class"] != type(bandit).__name__:
+        raise ValueError(
+            f"Checkpoint was written by {meta['policy_class']}, cannot restore into {type(bandit).__name__}."
+        )
+
+    bandit.set_state({**meta["policy"], **arrays})
+    rng_state = meta["prompt_rng_state"]
+    return meta["episode"], meta["playlist"], _random_state(rng_state) if rng_state is not None else None
+
+
+def _random_state(state) -> tuple:
+    """JSON turns random.getstate()'s tuples into lists – turn them back."""
+    version, internal, gauss_next = state
+    return version, tuple(internal), gauss_next
+
+
+def _to_json(obj):
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Cannot serialise {type(obj).__name__} in checkpoint metadata")
@@ -4,12 +4,16 @@ cli_online.py – balanced per-persona runner
 """
 from __future__ import annotations
 import argparse
+import asyncio
 from pathlib import Path
 
 from .linucb_policy   import LinUCBPolicy
+from .lints_policy    import LinTSPolicy
 from .bandit_features import CTX_DIM
-from .online_sim      import simulate_online_bandit
+from .online_sim      import simulate_online_bandit, simulate_online_bandit_async
 from .bandit_adapter import UCBPolicyAdapter
+from .llm_cache      import ResponseCache, MODES as CACHE_MODES
+from .utils          import ask_gpt, ask_gpt_async, set_backend, scheduler
 from .simulate        import (   # existing persona descriptions
     beg_imp, beg_notimp, int_imp, int_notimp, adv_imp, adv_notimp,
 )
@@ -44,30 +48,119 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--alpha", type=float, default=1.0,
                    help="LinUCB exploration parameter α (default 1.0)")
     p.add_argument("--policy", type=str, default="linucb",
-                   choices=["linucb", "ucb1"],
-                   help="Which policy to run: 'linucb' or 'ucb1' (default linucb).")
+                   choices=["linucb", "lints", "ucb1"],
+                   help="Which policy to run: 'linucb', 'lints' (linear Thompson sampling) "
+                        "or 'ucb1' (default linucb).")
+    p.add_argument("--ts-v", type=float, default=1.0,
+                   help="LinTS posterior scale v (default 1.0)")
     p.add_argument("--outfile", type=Path, default=Path("data/linucb_online_ep50.csv"),
                    help="CSV output path")
+    p.add_argument("--concurrency", type=int, default=1,
+                   help="Episodes kept in flight at once (default 1 = sequential runner)")
+    p.add_argument("--backend", type=str, default="openai", choices=["openai", "fake"],
+                   help="LLM backend: the real API or the local fake_llm stand-in (default openai)")
+    p.add_argument("--fake-latency", type=float, default=0.0,
+                   help="Median seconds per call for --backend fake (default 0)")
+    p.add_argument("--cache", type=Path, default=None,
+                   help="SQLite response cache (default: no cache)")
+    p.add_argument("--cache-mode", type=str, default="record", choices=CACHE_MODES,
+                   help="record | replay (fail on miss) | bypass (default record)")
+    p.add_argument("--checkpoint", type=Path, default=None,
+                   help="Bandit checkpoint file (default: <outfile>.ckpt.npz; sequential runner only)")
+    p.add_argument("--checkpoint-every", type=int, default=None,
+                   help="Snapshot the bandit every N episodes (default 10; sequential runner only)")
+    p.add_argument("--resume", action="store_true",
+                   help="Continue an interrupted run from its checkpoint")
+    p.add_argument("--compact-texts", action="store_true",
+                   help="Store texts once in <outfile stem>.texts.sqlite; the CSV keeps hashes only")
+    p.add_argument("--trace", type=Path, default=None,
+                   help="Write one JSON span per LLM call here and print a per-stage summary")
+    p.add_argument("--rpm", type=float, default=None,
+                   help="Requests-per-minute budget (default: $MAB_RPM or unlimited)")
+    p.add_argument("--tpm", type=float, default=None,
+                   help="Tokens-per-minute budget (default: $MAB_TPM or unlimited)")
+    p.add_argument("--t-score", type=float, default=0.0,
+                   help="Grading temperature (default 0.0)")
+    p.add_argument("--grade-samples", type=int, default=1,
+                   help="Grade by self-consistency: up to N samples per draft, stopping once two "
+                        "agree (default 1 = single sample; use with --t-score > 0)")
+    p.add_argument("--service", type=str, default=None,
+                   help="Use the shared policy of a running bandit_service (socket path or "
+                        "host:port) instead of a local one; --policy/--alpha are then ignored")
     return p.parse_args()
 
 def main() -> None:
     args = parse_args()
+    if args.grade_samples > 1 and args.t_score <= 0:
+        raise SystemExit("--grade-samples > 1 needs --t-score > 0 (at temperature 0 every sample repeats the first).")
 
-    # Choose the bandit object based on --policy
-    if args.policy == "linucb":
+    # Choose the bandit object based on --service / --policy
+    if args.service:
+        if args.resume:
+            raise SystemExit("--resume cannot be combined with --service (the service keeps its own snapshots).")
+        from .bandit_service import BanditClient
+        bandit = BanditClient(args.service)
+    elif args.policy == "linucb":
         bandit = LinUCBPolicy(n_arms=4, dim=CTX_DIM, alpha=args.alpha)
+    elif args.policy == "lints":
+        bandit = LinTSPolicy(n_arms=4, dim=CTX_DIM, v=args.ts_v)
     else:  # args.policy == "ucb1"
         # seed can be fixed or random; here we use 0 for reproducibility
         bandit = UCBPolicyAdapter(n_arms=4, seed=0)
 
-    simulate_online_bandit(
-        episodes_per_persona = args.episodes,
-        bandit               = bandit,
-        persona_pool         = PERSONA_POOL,
-        prompt1_pool         = PROMPT1_POOL,
-        csv_out              = args.outfile,
-        verbose              = True,
-    )
+    if args.backend == "fake":
+        from .fake_llm import FakeLLM
+        set_backend(FakeLLM(latency=args.fake_latency, jitter=0.5 if args.fake_latency else 0.0))
+
+    if args.rpm or args.tpm:
+        scheduler.configure(rpm=args.rpm, tpm=args.tpm)
+
+    cache = ResponseCache(args.cache, mode=args.cache_mode) if args.cache else None
+
+    # a service-side policy is snapshotted by the service itself
+    checkpoint = None if args.service else args.checkpoint or args.outfile.with_suffix(".ckpt.npz")
+
+    if args.concurrency > 1:
+        if args.resume:
+            raise SystemExit("--resume is only supported by the sequential runner (--concurrency 1).")
+        if args.checkpoint or args.checkpoint_every is not None:
+            raise SystemExit("--checkpoint/--checkpoint-every are only supported by the sequential runner "
+                             "(--concurrency 1).")
+        asyncio.run(simulate_online_bandit_async(
+            episodes_per_persona = args.episodes,
+            bandit               = bandit,
+            persona_pool         = PERSONA_POOL,
+            prompt1_pool         = PROMPT1_POOL,
+            csv_out              = args.outfile,
+            concurrency          = args.concurrency,
+            ask_fn               = cache.wrap_async(ask_gpt_async) if cache is not None else ask_gpt_async,
+            compact_texts        = args.compact_texts,
+            trace_out            = args.trace,
+            t_score              = args.t_score,
+            grade_samples        = args.grade_samples,
+            verbose              = True,
+        ))
+    else:
+        simulate_online_bandit(
+            episodes_per_persona = args.episodes,
+            bandit               = bandit,
+            persona_pool         = PERSONA_POOL,
+            prompt1_pool         = PROMPT1_POOL,
+            csv_out              = args.outfile,
+            ask_fn               = cache.wrap(ask_gpt) if cache is not None else ask_gpt,
+            checkpoint_path      = checkpoint,
+            checkpoint_every     = 10 if args.checkpoint_every is None else args.checkpoint_every,
+            resume               = args.resume,
+            compact_texts        = args.compact_texts,
+            trace_out            = args.trace,
+            t_score              = args.t_score,
+            grade_samples        = args.grade_samples,
+            verbose              = True,
+        )
+
+    if cache is not None:
+        print(f"LLM cache: {cache.stats()}")
+    print(f"Scheduler: {scheduler.metrics()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,185 @@
+"""
+fake_llm.py
+-----------
+Local, offline stand-in for the chat model behind ask_gpt.
+
+It recognises which helper is calling (write / rewrite / feedback / score /
+batched score) from the prompts and returns something plausible:
+
+  • essays whose vocabulary size and length follow the persona's CEFR level,
+    and rewrites that improve a little more for "actively tries to improve"
+    personas;
+  • two socratic questions or two direct commands as feedback;
+  • a 1-6 holistic score driven by the essay's length and lexical variety
+    (so better personas really do score higher), plus noise.
+
+Latency, random errors and 429-style rate-limit errors are configurable, so
+the concurrency / retry machinery can be exercised on a laptop:
+
+    from src.utils import set_backend
+    set_backend("fake")                               # defaults
+    set_backend(FakeLLM(latency=0.3, jitter=0.5, error_rate=0.02, rate_limit_rate=0.05))
+
+or set MAB_LLM_BACKEND=fake in the environment.
+"""
+
+from __future__ import annotations
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+
+class FakeLLMError(RuntimeError):
+    """Injected transient server error (behaves like a 500)."""
+    status_code = 500
+
+
+class FakeRateLimitError(FakeLLMError):
+    """Injected rate-limit error (behaves like a 429)."""
+    status_code = 429
+
+
+# word pools by proficiency – the fake grader rewards variety and length
+_BASIC = ("school home student good bad time like think because people very many make "
+          "go learn class work day friend help want need can will is are".split())
+_MID = ("however therefore important benefit flexible schedule environment opportunity "
+        "responsibility technology distraction example reason support focus improve".split())
+_ADV = ("consequently nevertheless substantive autonomy pedagogical equitable nuanced "
+        "ramification deliberate articulate compelling mitigate cultivate scrutiny paradigm".split())
+
+_LEVELS = {  # CEFR tag in persona text → (pools, target words, error rate)
+    "A1": ((_BASIC,), 220, 0.10),
+    "B1": ((_BASIC, _MID), 420, 0.04),
+    "C1": ((_BASIC, _MID, _ADV), 650, 0.01),
+}
+
+
+class FakeLLM:
+    """
+    Callable with the ask_gpt signature, plus an awaitable `acall`.
+
+    latency          : median seconds per call
+    jitter           : log-normal sigma of the latency (0 → constant)
+    error_rate       : probability of raising FakeLLMError
+    rate_limit_rate  : probability of raising FakeRateLimitError
+    seed             : RNG seed (None → nondeterministic)
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()   # random.Random is not safe to share across threads
+        self.calls = 0
+
+    # ------------------------------------------------------------------ #
+    # ask_fn interfaces
+    # ------------------------------------------------------------------ #
+    def __call__(self, system, user, model, temperature):
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._respond(system, user, temperature)
+
+    async def acall(self, system, user, model, temperature):
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._respond(system, user, temperature)
+
+    def essay(self, persona_text: str, n_words: Optional[int] = None) -> str:
+        """An essay at the CEFR level tagged in *persona_text*, without a prompt (benchmarks, tests)."""
+        with self._lock:
+            return self._essay(persona_text, n_words)
+
+    # ------------------------------------------------------------------ #
+    # internals
+    # ------------------------------------------------------------------ #
+    def _delay(self) -> float:
+        if not self.latency:
+            return 0.0
+        with self._lock:
+            return self.latency * math.exp(self.rng.gauss(0.0, self.jitter)) if self.jitter else self.latency
+
+    def _respond(self, system: str, user: str, temperature: float) -> str:
+        with self._lock:
+            self.calls += 1
+            roll = self.rng.random()
+            if roll < self.rate_limit_rate:
+                raise FakeRateLimitError("429: rate limit reached (injected by FakeLLM)")
+            if roll < self.rate_limit_rate + self.error_rate:
+                raise FakeLLMError("500: server error (injected by FakeLLM)")
+
+            if "`ESSAY <n>: <score>`" in system:
+                essays = re.split(r"----- ESSAY \d+ -----", user)[1:]
+                return "\n".join(f"ESSAY {i}: {self._score(e, temperature)}" for i, e in enumerate(essays, 1))
+            if "rubric" in system.lower():
+                return str(self._score(user.split("----- ESSAY -----")[-1], temperature))
+            if system.startswith("You are an academic writing tutor"):
+                return self._feedback(user)
+            if system.startswith("You are revising your own essay"):
+                return self._rewrite(system, user)
+            return self._essay(system, n_words=None)
+
+    @staticmethod
+    def _level(persona_text: str):
+        for tag, spec in _LEVELS.items():
+            if tag in persona_text:
+                return spec
+        return _LEVELS["B1"]
+
+    def _essay(self, persona_text: str, n_words: Optional[int], boost: float = 0.0) -> str:
+        pools, target, err = self._level(persona_text)
+        n = n_words or max(80, int(self.rng.gauss(target, target * 0.15)))
+        words = []
+        for _ in range(n):
+            # `boost` shifts choices toward the richest pool available
+            pool = pools[-1] if self.rng.random() < boost else self.rng.choice(pools)
+            w = self.rng.choice(pool)
+            if self.rng.random() < err:
+                w = w[::-1]                       # "spelling mistake"
+            words.append(w)
+        sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+        return "\n\n".join(" ".join(sentences[i:i + 6]) for i in range(0, len(sentences), 6))
+
+    def _rewrite(self, system: str, user: str) -> str:
+        original = user.split("----- ORIGINAL ESSAY -----")[-1].split("----- FEEDBACK")[0]
+        n_words = len(original.split())
+        improves = "Actively tries to improve" in system
+        boost = 0.25 if improves else 0.05
+        return self._essay(system, n_words=int(n_words * (1.08 if improves else 1.0)), boost=boost)
+
+    def _feedback(self, user: str) -> str:
+        socratic = "socratic" in user
+        sentence_level = "sentence" in user.split("focus strictly on")[-1][:40]
+        topic = "word choice and grammar" if sentence_level else "the order of your ideas"
+        if socratic:
+            return (f"1. How might you revise your wording to make {topic} clearer?\n"
+                    f"2. Which part of your essay could be strengthened by rethinking {topic}?")
+        return (f"1. Revise {topic} in your second paragraph.\n"
+                f"2. Rewrite your conclusion with attention to {topic}.")
+
+    def _score(self, essay: str, temperature: float) -> int:
+        words = essay.lower().split()
+        if not words:
+            return 1
+        variety = len(set(words)) / len(words)          # lexical diversity
+        length = min(len(words) / 700.0, 1.0)
+        rich = sum(w.strip(".,") in _ADV for w in words) / len(words)
+        raw = 1.0 + 2.0 * length + 4.0 * variety + 25.0 * rich
+        raw += self.rng.gauss(0.0, 0.3 + 0.7 * temperature)
+        return int(min(6, max(1, round(raw))))
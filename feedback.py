@@ -1,8 +1,10 @@
 #feedback.py
 from enum import Enum
-from typing import Dict, Callable
+from typing import Dict, Callable, Tuple
 
-from src.utils import ask_gpt
+from src import tracing
+from src.prompt_layout import assemble
+from src.utils import ask_gpt, ask_gpt_async
 
 class FeedbackArm(str, Enum):
     """Four feedback styles used in the simulation."""
@@ -19,29 +21,39 @@ SYSTEM_PROMPT = (
 )
 
 # ---- user‑prompt templates keyed by feedback arm ---------------------------
+# static instruction body first, per-call details last (see prompt_layout.py)
 _USER_TEMPLATE: Dict[FeedbackArm, str] = {
     FeedbackArm.SOC_LOW: (
-        "You are an academic writing tutor for {grade_level} students writing "
-        "on the following essay prompt: {writing_prompt}. You will provide 2 socratic feedback (feedback entirely in the form of guiding questions) and focus strictly on sentence‑level clarity, word choice, and grammar. "
+        "You are an academic writing tutor. You will provide 2 socratic feedback (feedback entirely in the form of guiding questions) and focus strictly on sentence‑level clarity, word choice, and grammar. "
         "Do not comment on structure, argument, or organization, and do not give any direct commands or suggestions."
     ),
     FeedbackArm.SOC_HIGH: (
-        "You are an academic writing tutor for {grade_level} students writing "
-        "on the following essay prompt: {writing_prompt}. You will provide 2 socratic feedback (feedback entirely in the form of guiding questions) and focus strictly on high‑level organization, logical flow, and how ideas are sequenced. "
+        "You are an academic writing tutor. You will provide 2 socratic feedback (feedback entirely in the form of guiding questions) and focus strictly on high‑level organization, logical flow, and how ideas are sequenced. "
         "Do not comment on grammar, word choice, or any sentence‑level issues, and do not give any direct commands or suggestions."
     ),
     FeedbackArm.DIR_LOW: (
-        "You are an academic writing tutor for {grade_level} students writing "
-        "on the following essay prompt: {writing_prompt}. You will provide 2 direct commands and suggestions and focus strictly on sentence‑level clarity, word choice, and grammar. "
+        "You are an academic writing tutor. You will provide 2 direct commands and suggestions and focus strictly on sentence‑level clarity, word choice, and grammar. "
         "Do not comment on structure, argument, or organization. Do not ask students guiding questions—just give the commands."
     ),
     FeedbackArm.DIR_HIGH: (
-        "You are an academic writing tutor for {grade_level} students writing "
-        "on the following essay prompt: {writing_prompt}. You will provide 2 direct commands and suggestions and focus strictly on high‑level organization, logical flow, and how ideas are sequenced. "
+        "You are an academic writing tutor. You will provide 2 direct commands and suggestions and focus strictly on high‑level organization, logical flow, and how ideas are sequenced. "
         "Do not comment on grammar, word choice, or any sentence‑level issues. Do not ask students guiding questions—just give the commands."
     ),
 }
 
+_CONTEXT_TEMPLATE = (
+    "Your students are {grade_level} students writing on the following essay prompt: {writing_prompt}"
+)
+
+
+def _feedback_prompts(essay: str, arm: FeedbackArm, grade_level: str, writing_prompt: str) -> Tuple[str, str]:
+    """Return the (system, user) prompts for one round of *arm*-style feedback."""
+    user_prompt = assemble(
+        [_USER_TEMPLATE[arm]],
+        [_CONTEXT_TEMPLATE.format(grade_level=grade_level, writing_prompt=writing_prompt)],
+    )
+    return SYSTEM_PROMPT, user_prompt
+
 
 def generate_feedback(
     *,
@@ -60,15 +72,35 @@ def generate_feedback(
     str
         The feedback text (no metadata).
     """
-    user_prompt = _USER_TEMPLATE[arm].format(
-        grade_level=grade_level,
-        writing_prompt=writing_prompt,
-        essay=essay,
-    )
+    system_prompt, user_prompt = _feedback_prompts(essay, arm, grade_level, writing_prompt)
+
+    with tracing.tags(stage="feedback"):
+        return ask_fn(
+            system=system_prompt,
+            user=user_prompt,
+            model=model,
+            temperature=temperature,
+        )
+
+
+async def generate_feedback_async(
+    *,
+    essay: str,
+    arm: FeedbackArm,
+    grade_level: str,
+    writing_prompt: str,
+    ask_fn: Callable = ask_gpt_async,
+    model: str = "gpt-4o",
+    temperature: float = 0.5,
+) -> str:
+    """Awaitable generate_feedback; *ask_fn* must be a coroutine function."""
+    system_prompt, user_prompt = _feedback_prompts(essay, arm, grade_level, writing_prompt)
+
+    with tracing.tags(stage="feedback"):
+        return await ask_fn(
+            system=system_prompt,
+            user=user_prompt,
+            model=model,
+            temperature=temperature,
+        )
 
-    return ask_fn(
-        system=SYSTEM_PROMPT,
-        user=user_prompt,
-        model=model,
-        temperature=temperature,
-    )
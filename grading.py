@@ -1,8 +1,14 @@
 # grading
+import asyncio
 import re
-from typing import Callable, Tuple
+import statistics
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Tuple
 
-from src.utils import ask_gpt
+from src import tracing
+from src.prompt_layout import assemble
+from src.task_graph import TaskGraph
+from src.utils import ask_gpt, ask_gpt_async
 
 _GRADER_SYSTEM = (
     "You are an expert writing instructor. "
@@ -148,25 +154,250 @@ def score_essay(
     raw_reply : str
         Full assistant message (useful if you later want explanations).
     """
-    user_prompt = (
-        "Below is a holistic rubric with levels 1-6, followed by a student essay.\n\n"
-        "----- RUBRIC -----\n"
-        f"{rubric}\n\n"
-        "----- ESSAY -----\n"
-        f"{essay}\n\n"
-        "Please evaluate the essay strictly according to the rubric and output "
-        "only the final integer score (1-6). Do not include any other text."
-    )
+    system_prompt, user_prompt = _score_prompts(essay, rubric)
+
+    with tracing.tags(stage="score"):
+        raw_reply = ask_fn(
+            user=user_prompt,
+            system=system_prompt,
+            model=model,
+            temperature=temperature
+        )
+    return _parse_score(raw_reply), raw_reply
+
 
-    raw_reply = ask_fn(
-        user=user_prompt,
-        system=_GRADER_SYSTEM,
-        model=model,
-        temperature=temperature
+async def score_essay_async(
+        essay: str,
+        rubric: str = RUBRIC,
+        ask_fn = ask_gpt_async,
+        model: str = "gpt-4o",
+        temperature: float = 0.5,
+) -> Tuple[int, str]:
+    """Awaitable score_essay; *ask_fn* must be a coroutine function."""
+    system_prompt, user_prompt = _score_prompts(essay, rubric)
+
+    with tracing.tags(stage="score"):
+        raw_reply = await ask_fn(
+            user=user_prompt,
+            system=system_prompt,
+            model=model,
+            temperature=temperature
+        )
+    return _parse_score(raw_reply), raw_reply
+
+
+def _rubric_block(rubric: str) -> str:
+    return "Below is a holistic rubric with levels 1-6.\n\n----- RUBRIC -----\n" + rubric
+
+
+def _score_prompts(essay: str, rubric: str) -> Tuple[str, str]:
+    """(system, user) for one essay; the rubric is in the static system prefix."""
+    system_prompt = assemble([_GRADER_SYSTEM, _rubric_block(rubric)])
+    user_prompt = assemble(
+        ["Please evaluate the student essay below strictly according to the rubric and output "
+         "only the final integer score (1-6). Do not include any other text."],
+        ["----- ESSAY -----\n" + essay],
     )
+    return system_prompt, user_prompt
+
 
+def _parse_score(raw_reply: str) -> int:
     # Extract the first integer 1-6
     match = re.search(r"\b([1-6])\b", raw_reply)
     if not match:
         raise ValueError(f"No 1-6 score found in GPT reply:\n{raw_reply}")
-    return int(match.group(1)), raw_reply
\ No newline at end of file
+    return int(match.group(1))
+
+
+# ---------------------------------------------------------------------------
+#  batched grading: several essays under one copy of the rubric
+# ---------------------------------------------------------------------------
+
+_BATCH_GRADER_SYSTEM = (
+    "You are an expert writing instructor. "
+    "Follow the given rubric exactly to grade each essay independently and return ONLY "
+    "one line per essay in the form `ESSAY <n>: <score>`, nothing else."
+)
+
+_BATCH_LINE = re.compile(r"ESSAY\s*#?\s*(\d+)\s*[:=\-–]\s*([1-6])\b", re.IGNORECASE)
+
+
+def _score_batch_prompts(essays: List[str], rubric: str) -> Tuple[str, str]:
+    """(system, user) for several essays; same static rubric prefix as _score_prompts."""
+    system_prompt = assemble([_BATCH_GRADER_SYSTEM, _rubric_block(rubric)])
+    parts = [f"----- ESSAY {i} -----\n{essay}" for i, essay in enumerate(essays, 1)]
+    parts.append(
+        f"Output exactly {len(essays)} lines, `ESSAY 1: <score>` through "
+        f"`ESSAY {len(essays)}: <score>`, each score an integer 1-6. Do not include any other text."
+    )
+    user_prompt = assemble(
+        ["Please evaluate each student essay below on its own, strictly according to the rubric."],
+        parts,
+    )
+    return system_prompt, user_prompt
+
+
+def _parse_batch_scores(raw_reply: str, n: int) -> Dict[int, int]:
+    """Return {essay index (0-based): score} for every unambiguous line in the reply."""
+    found: Dict[int, List[int]] = {}
+    for m in _BATCH_LINE.finditer(raw_reply):
+        idx = int(m.group(1)) - 1
+        if 0 <= idx < n:
+            found.setdefault(idx, []).append(int(m.group(2)))
+    # an essay listed twice with different scores is treated as unparsed
+    return {idx: v[0] for idx, v in found.items() if len(set(v)) == 1}
+
+
+def score_essays(
+        essays: List[str],
+        rubric: str = RUBRIC,
+        ask_fn = ask_gpt,
+        model: str = "gpt-4o",
+        temperature: float = 0.5,
+) -> List[Tuple[int, str]]:
+    """
+    Grade several essays in ONE request that carries a single copy of `rubric`.
+
+    Returns one (score, raw_reply) pair per essay, in input order – the same
+    shape score_essay returns for one essay.  Any essay whose score cannot be
+    read from the batched reply is re-graded on its own with score_essay.
+    """
+    if not essays:
+        return []
+    if len(essays) == 1:
+        return [score_essay(essays[0], rubric=rubric, ask_fn=ask_fn, model=model, temperature=temperature)]
+
+    with tracing.tags(stage="score"):
+        system_prompt, user_prompt = _score_batch_prompts(essays, rubric)
+        raw_reply = ask_fn(
+            user=user_prompt,
+            system=system_prompt,
+            model=model,
+            temperature=temperature
+        )
+    parsed = _parse_batch_scores(raw_reply, len(essays))
+
+    results: List[Tuple[int, str]] = []
+    for i, essay in enumerate(essays):
+        if i in parsed:
+            results.append((parsed[i], raw_reply))
+        else:
+            # fallback: single-essay grading for anything we couldn't parse
+            results.append(score_essay(essay, rubric=rubric, ask_fn=ask_fn, model=model, temperature=temperature))
+    return results
+
+
+# ---------------------------------------------------------------------------
+#  self-consistency grading: sample until the votes agree
+# ---------------------------------------------------------------------------
+
+class ConsistentScore(NamedTuple):
+    score: int              # settled score (index 0, like score_essay's tuple)
+    dispersion: float       # population std of the sampled scores (0.0 = all agreed)
+    agreement: float        # share of samples that gave `score`
+    samples: List[int]
+    raw_replies: List[str]
+
+
+def _lead(samples: List[int]) -> int:
+    """Votes of the leading score minus votes of the runner-up."""
+    counts = sorted(Counter(samples).values(), reverse=True) + [0, 0]
+    return counts[0] - counts[1]
+
+
+def _samples_needed(samples: List[int], margin: int, max_samples: int) -> int:
+    """Fewest further samples that could settle the vote (0 = settled or budget spent)."""
+    if samples and _lead(samples) >= margin:
+        return 0
+    return max(0, min(margin - _lead(samples), max_samples - len(samples)))
+
+
+def _consensus(samples: List[int], raw_replies: List[str]) -> ConsistentScore:
+    counts = Counter(samples)
+    top = max(counts.values())
+    median = statistics.median(samples)
+    # tied modes (only possible when the budget ran out) → the one nearest the median
+    score = min((s for s, c in counts.items() if c == top), key=lambda s: (abs(s - median), s))
+    return ConsistentScore(score, statistics.pstdev(samples), top / len(samples), samples, raw_replies)
+
+
+def _check_sampling(max_samples: int, margin: int) -> None:
+    if max_samples < 1 or margin < 1:
+        raise ValueError(f"max_samples and margin must be >= 1 (got {max_samples}, {margin}).")
+
+
+def score_essay_consistent(
+        essay: str,
+        rubric: str = RUBRIC,
+        ask_fn = ask_gpt,
+        model: str = "gpt-4o",
+        temperature: float = 0.5,
+        *,
+        max_samples: int = 5,
+        margin: int = 2,
+        parallel: bool = True,
+) -> ConsistentScore:
+    """
+    Grade `essay` by drawing several score samples and stopping as soon as
+    the vote is settled: the leading score has `margin` more votes than any
+    other (margin=2 → two agreeing samples are enough), or `max_samples`
+    samples have been drawn.
+
+    Samples come in waves of the fewest that could settle the vote – first
+    `margin` samples, then e.g. two more after a 4/5 split, one more after
+    4/5/4.  With parallel=True the requests of a wave are in flight together;
+    parallel=False draws strictly one at a time.  max_samples=1 is exactly
+    one score_essay call.  Only useful at temperature > 0 (at 0 the first
+    `margin` samples normally agree).  Behind llm_cache.ResponseCache every
+    repeat of the same request is cached as its own sample.
+    """
+    _check_sampling(max_samples, margin)
+    system_prompt, user_prompt = _score_prompts(essay, rubric)
+
+    def sample():
+        return ask_fn(user=user_prompt, system=system_prompt, model=model, temperature=temperature)
+
+    samples: List[int] = []
+    replies: List[str] = []
+    with tracing.tags(stage="score"):
+        while True:
+            k = _samples_needed(samples, margin, max_samples)
+            if not k:
+                break
+            graph = TaskGraph()
+            for i in range(k):
+                graph.add(f"sample{i}", sample)
+            wave = list(graph.run(max_workers=None if parallel and k > 1 else 1).values())
+            samples += [_parse_score(r) for r in wave]
+            replies += wave
+    return _consensus(samples, replies)
+
+
+async def score_essay_consistent_async(
+        essay: str,
+        rubric: str = RUBRIC,
+        ask_fn = ask_gpt_async,
+        model: str = "gpt-4o",
+        temperature: float = 0.5,
+        *,
+        max_samples: int = 5,
+        margin: int = 2,
+) -> ConsistentScore:
+    """Awaitable score_essay_consistent; the samples of a wave are awaited together."""
+    _check_sampling(max_samples, margin)
+    system_prompt, user_prompt = _score_prompts(essay, rubric)
+
+    samples: List[int] = []
+    replies: List[str] = []
+    with tracing.tags(stage="score"):
+        while True:
+            k = _samples_needed(samples, margin, max_samples)
+            if not k:
+                break
+            wave = await asyncio.gather(*(
+                ask_fn(user=user_prompt, system=system_prompt, model=model, temperature=temperature)
+                for _ in range(k)
+            ))
+            samples += [_parse_score(r) for r in wave]
+            replies += wave
+    return _consensus(samples, replies)
@@ -0,0 +1,137 @@
+#lints_policy.py
+
+from __future__ import annotations
+import numpy as np
+from typing import Optional
+
+class LinTSPolicy:
+    """ Disjoint linear Thompson sampling with K independent arms
+
+    Same ridge model per arm as LinUCBPolicy (A_a = D_a.T D_a + I_d,
+    b_a = D_a.T c_a); the posterior of arm a is
+        theta_a ~ N(theta_hat_a, v^2 A_a^-1),   theta_hat_a = A_a^-1 b_a.
+
+    Instead of decomposing the covariance on every draw, each arm keeps a
+    lower-triangular factor C_a with C_a C_a^T = A_a^-1.  Adding x x^T to A_a
+    is a rank-one *downdate* of A_a^-1 (Sherman-Morrison), applied to C_a in
+    O(d^2).  A draw is then  theta_hat + v * C z,  z ~ N(0, I) – one
+    triangular mat-vec, the same order of cost as LinUCB scoring – and all
+    arms are drawn together in one einsum.
+    """
+
+    def __init__ (self, n_arms, dim, v: float = 1.0,
+                  seed: Optional[int] = None,
+                  refresh_every: Optional[int] = None):
+        self.n_arms = n_arms
+        self.dim = dim
+        self.v = v
+
+        self.A = np.tile(np.eye(dim), (n_arms, 1, 1))     # A_a <- I_d
+        self.b = np.zeros((n_arms, dim))                   # b_a <- 0_d
+        self.C = np.tile(np.eye(dim), (n_arms, 1, 1))     # chol(A_a^-1) = I_d
+        self.theta = np.zeros((n_arms, dim))               # posterior mean
+
+        # optionally rebuild C from A every N updates of an arm (numerical hygiene)
+        self.refresh_every = refresh_every
+        self.n_updates = np.zeros(n_arms, dtype=int)
+
+        self.rng = np.random.default_rng(seed)
+
+    # ------------------------------------------------------------------ #
+    # Posterior sampling
+    # ------------------------------------------------------------------ #
+    def sample_thetas(self) -> np.ndarray:
+        """One joint draw of all K arm parameters, shape (K, d)."""
+        z = self.rng.standard_normal((self.n_arms, self.dim))
+        return self.theta + self.v * np.einsum("kij,kj->ki", self.C, z)
+
+    def select_arm(self, x:np.ndarray) -> int:
+        x = np.asarray(x, dtype=float).reshape(-1)
+        p_vals = self.sample_thetas() @ x
+        best = np.argwhere(p_vals == np.max(p_vals)).flatten()
+        return int(self.rng.choice(best))
+
+    def select_arms(self, X:np.ndarray) -> np.ndarray:
+        """
+        Independent posterior draw for every row of an (N, d) batch of
+        contexts; returns the (N,) chosen arms.  No update between rows.
+        """
+        X = np.asarray(X, dtype=float).reshape(-1, self.dim)
+        z = self.rng.standard_normal((len(X), self.n_arms, self.dim))
+        thetas = self.theta + self.v * np.einsum("kij,nkj->nki", self.C, z)
+        return np.einsum("nki,ni->nk", thetas, X).argmax(axis=1)
+
+    # ------------------------------------------------------------------ #
+    # Update
+    # ------------------------------------------------------------------ #
+    def update(self, arm_idx:int, reward: float, x:np.ndarray) -> None:
+        """
+        A_a <- A_a + x x^T,  b_a <- b_a + r x,
+        C_a <- chol(A_a^-1 - u u^T)  with  u = A_a^-1 x / sqrt(1 + x^T A_a^-1 x)
+        """
+        x = np.asarray(x, dtype=float).reshape(-1)
+        self.A[arm_idx] += np.outer(x, x)
+        self.b[arm_idx] += reward * x
+        self.n_updates[arm_idx] += 1
+
+        C = self.C[arm_idx]
+        Ax = C @ (C.T @ x)                                  # A_inv x, O(d^2)
+        u = Ax / np.sqrt(1.0 + x @ Ax)
+
+        if (self.refresh_every and self.n_updates[arm_idx] % self.refresh_every == 0) \
+                or not _chol_downdate(C, u):
+            self.refresh(arm_idx)
+        else:
+            self.theta[arm_idx] = C @ (C.T @ self.b[arm_idx])
+
+    def refresh(self, arm_idx: Optional[int] = None) -> None:
+        """Rebuild C (and theta) from A and b for one arm, or all arms if arm_idx is None."""
+        for k in (range(self.n_arms) if arm_idx is None else [arm_idx]):
+            A_inv = np.linalg.inv(self.A[k])
+            self.C[k] = np.linalg.cholesky((A_inv + A_inv.T) / 2)
+            self.theta[k] = A_inv @ self.b[k]
+
+    # ------------------------------------------------------------------ #
+    # checkpointing
+    # ------------------------------------------------------------------ #
+    def get_state(self) -> dict:
+        return {
+            "v": self.v,
+            "A": self.A,
+            "b": self.b,
+            "C": self.C,
+            "theta": self.theta,
+            "n_updates": self.n_updates,
+            "rng_state": self.rng.bit_generator.state,
+        }
+
+    def set_state(self, state: dict) -> None:
+        if state["A"].shape != self.A.shape:
+            raise ValueError(f"Checkpoint has A of shape {state['A'].shape}, policy expects {self.A.shape}.")
+        self.v = float(state["v"])
+        self.A = np.array(state["A"], dtype=float)
+        self.b = np.array(state["b"], dtype=float)
+        self.C = np.array(state["C"], dtype=float)
+        self.theta = np.array(state["theta"], dtype=float)
+        self.n_updates = np.array(state["n_updates"], dtype=int)
+        self.rng.bit_generator.state = state["rng_state"]
+
+
+def _chol_downdate(L: np.ndarray, u: np.ndarray) -> bool:
+    """
+    In place: turn lower-triangular L (L L^T = M) into the factor of M - u u^T.
+    O(d^2).  Returns False (L left partially updated) if the result would not
+    be positive definite, so the caller can rebuild the factor from scratch.
+    """
+    u = u.copy()
+    for k in range(len(u)):
+        r2 = L[k, k] ** 2 - u[k] ** 2
+        if r2 <= 0.0:
+            return False
+        r = np.sqrt(r2)
+        c = r / L[k, k]
+        s = u[k] / L[k, k]
+        L[k, k] = r
+        L[k + 1:, k] = (L[k + 1:, k] - s * u[k + 1:]) / c
+        u[k + 1:] = c * u[k + 1:] - s * L[k + 1:, k]
+    return True
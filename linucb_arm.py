@@ -1,9 +1,12 @@
 # linucb_arm.py
 from __future__ import annotations
+from typing import Optional
 import numpy as np
 
 class LinUCBDisjointArm:
-    def __init__(self, arm_index, dim, alpha): 
+    def __init__(self, arm_index, dim, alpha,
+                 refresh_every: Optional[int] = None,
+                 drift_tol: float = 1e-8):
         self.arm_index = arm_index
         self.alpha = alpha
 
@@ -14,22 +17,27 @@ class LinUCBDisjointArm:
         # b: (d x 1) corresponding response vector
         # equals to D_a.T * c_a in ridge regression formula
         self.b = np.zeros((dim,1)) # initialize b_a <- 0_dx1
-    
+
+        # A_inv and theta are kept in sync with A and b on every update
+        # (Sherman-Morrison rank-one step), so ucb() never has to invert A.
+        self.A_inv = np.eye(dim)          # inverse of I_d is I_d
+        self.theta = np.zeros((dim,1))    # A_inv @ b = 0
+
+        # optional numerical hygiene for long runs:
+        #   refresh_every : re-invert A from scratch every N updates (None = never)
+        #   drift_tol     : max |A @ A_inv - I| tolerated before a forced re-inversion
+        self.refresh_every = refresh_every
+        self.drift_tol = drift_tol
+        self.n_updates = 0
+
     def ucb(self, x:np.ndarray) -> float:
         # reshape covariates input into (dx1) shape vector
         x = x.reshape(-1,1)
 
-        # find A inverse for ridge regression
-        A_inv = np.linalg.inv(self.A)
-
-        #perform ridge regression to obtain estimate of covariate c
-        # theta is (dx1) dimension vector
-        theta = A_inv @ self.b
-
         #find ucb based on p formulation (mean + std_dev)
-        # p is (1x1) dimension vector
-        mean = float(theta.T @ x)
-        std = self.alpha * np.sqrt(float(x.T @ A_inv @ x))
+        # theta = A_inv @ b is maintained incrementally in update()
+        mean = (self.theta.T @ x).item()
+        std = self.alpha * np.sqrt((x.T @ self.A_inv @ x).item())
         p = mean + std
 
         return p
@@ -38,14 +46,46 @@ class LinUCBDisjointArm:
         """
         update: A_a <- A_a + x @ x.T
         b_a <- b_a + rx
+
+        A_inv is updated with Sherman-Morrison:
+            (A + x x^T)^-1 = A^-1 - (A^-1 x)(A^-1 x)^T / (1 + x^T A^-1 x)
+        which costs O(d^2) instead of the O(d^3) of a full inversion.
         """
         # reshape covariates input into (d x 1) shape vector
         x = x.reshape(-1,1)
 
         # update A which is (dxd) matrix
-        self.A += x @ x.T   
+        self.A += x @ x.T
 
         # update b which is (dx1) vec
         # reward is scalar
         self.b += reward * x
-    
+
+        # rank-one update of A_inv (A_inv is symmetric, so A_inv x == (x^T A_inv)^T)
+        Ax = self.A_inv @ x
+        self.A_inv -= (Ax @ Ax.T) / (1.0 + (x.T @ Ax).item())
+        self.n_updates += 1
+
+        if self.refresh_every and self.n_updates % self.refresh_every == 0:
+            self.refresh()
+        else:
+            self.theta = self.A_inv @ self.b
+
+    # ------------------------------------------------------------------ #
+    # numerical checks
+    # ------------------------------------------------------------------ #
+    def drift(self) -> float:
+        """Return max |A @ A_inv - I|, i.e. how far A_inv has drifted from the true inverse."""
+        return float(np.max(np.abs(self.A @ self.A_inv - np.eye(self.A.shape[0]))))
+
+    def refresh(self) -> None:
+        """Re-invert A from scratch and recompute theta."""
+        self.A_inv = np.linalg.inv(self.A)
+        self.theta = self.A_inv @ self.b
+
+    def check_drift(self) -> bool:
+        """Re-invert A if the drift exceeds `drift_tol`. Returns True if a refresh happened."""
+        if self.drift() > self.drift_tol:
+            self.refresh()
+            return True
+        return False
@@ -2,25 +2,140 @@
 
 from __future__ import annotations
 import numpy as np
-from typing import List
-from src.linucb_arm import LinUCBDisjointArm
+from typing import Optional
 
 class LinUCBPolicy:
-    """ DIsjoint LinUCB with K independent arms"""
+    """ DIsjoint LinUCB with K independent arms
+
+    All arm state lives in stacked arrays so every arm is scored in one einsum:
+        A     : (K, d, d)   A_a = D_a.T D_a + I_d
+        b     : (K, d)      b_a = D_a.T c_a
+        A_inv : (K, d, d)   kept in sync with A via Sherman-Morrison
+        theta : (K, d)      A_inv @ b
+    Arm k is the same model as LinUCBDisjointArm(k, dim, alpha).
+    """
+
+    def __init__ (self, n_arms, dim, alpha,
+                  refresh_every: Optional[int] = None,
+                  drift_tol: float = 1e-8):
+        self.n_arms = n_arms
+        self.dim = dim
+        self.alpha = alpha
+
+        self.A = np.tile(np.eye(dim), (n_arms, 1, 1))     # A_a <- I_d
+        self.b = np.zeros((n_arms, dim))                   # b_a <- 0_d
+        self.A_inv = np.tile(np.eye(dim), (n_arms, 1, 1))
+        self.theta = np.zeros((n_arms, dim))
+
+        # same numerical hygiene knobs as LinUCBDisjointArm (counted per arm)
+        self.refresh_every = refresh_every
+        self.drift_tol = drift_tol
+        self.n_updates = np.zeros(n_arms, dtype=int)
 
-    def __init__ (self, n_arms, dim, alpha):
-        self.arms: List[LinUCBDisjointArm] = [
-            LinUCBDisjointArm(i, dim, alpha) for i in range(n_arms)
-        ]
         self.rng = np.random.default_rng() #for tie breaker: select randomly
 
+    # ------------------------------------------------------------------ #
+    # Scoring
+    # ------------------------------------------------------------------ #
+    def ucb(self, x:np.ndarray) -> np.ndarray:
+        """Return the (K,) vector of UCB scores p_a = theta_a.x + alpha*sqrt(x.A_inv_a.x)."""
+        x = np.asarray(x, dtype=float).reshape(-1)
+        mean = self.theta @ x
+        var = np.einsum("i,kij,j->k", x, self.A_inv, x)
+        return mean + self.alpha * np.sqrt(var)
+
+    def ucb_batch(self, X:np.ndarray) -> np.ndarray:
+        """Return the (N, K) matrix of UCB scores for a batch of (N, d) contexts."""
+        X = np.asarray(X, dtype=float).reshape(-1, self.dim)
+        mean = X @ self.theta.T
+        var = np.einsum("ni,kij,nj->nk", X, self.A_inv, X)
+        return mean + self.alpha * np.sqrt(var)
+
     # ------------------------------------------------------------------ #
     # Arm selection with random tie-break
     # ------------------------------------------------------------------ #
     def select_arm(self, x:np.ndarray) -> int:
-        p_vals = [arm.ucb(x) for arm in self.arms]
+        p_vals = self.ucb(x)
         best = np.argwhere(p_vals == np.max(p_vals)).flatten()
         return int(self.rng.choice(best))
-    
+
+    def select_arms(self, X:np.ndarray) -> np.ndarray:
+        """
+        Score a whole (N, d) batch of contexts against the current state and
+        return the (N,) chosen arm indices (ties broken uniformly at random per row).
+        No update happens between rows.
+        """
+        p_vals = self.ucb_batch(X)
+        is_best = p_vals == p_vals.max(axis=1, keepdims=True)
+        # random tie-break: draw a uniform key per (row, arm) and keep the largest among the tied arms
+        keys = np.where(is_best, self.rng.random(p_vals.shape), -1.0)
+        return keys.argmax(axis=1)
+
+    # ------------------------------------------------------------------ #
+    # Update
+    # ------------------------------------------------------------------ #
     def update(self, arm_idx:int, reward: float, x:np.ndarray) -> None:
-        self.arms[arm_idx].update(reward,x)
\ No newline at end of file
+        """
+        A_a <- A_a + x x^T,  b_a <- b_a + r x,
+        A_inv_a updated with Sherman-Morrison in O(d^2).
+        """
+        x = np.asarray(x, dtype=float).reshape(-1)
+        self.A[arm_idx] += np.outer(x, x)
+        self.b[arm_idx] += reward * x
+
+        A_inv = self.A_inv[arm_idx]
+        Ax = A_inv @ x
+        A_inv -= np.outer(Ax, Ax) / (1.0 + x @ Ax)
+        self.n_updates[arm_idx] += 1
+
+        if self.refresh_every and self.n_updates[arm_idx] % self.refresh_every == 0:
+            self.refresh(arm_idx)
+        else:
+            self.theta[arm_idx] = A_inv @ self.b[arm_idx]
+
+    # ------------------------------------------------------------------ #
+    # numerical checks
+    # ------------------------------------------------------------------ #
+    def drift(self) -> np.ndarray:
+        """Return the (K,) vector of max |A_a @ A_inv_a - I| per arm."""
+        err = self.A @ self.A_inv - np.eye(self.dim)
+        return np.abs(err).max(axis=(1, 2))
+
+    def refresh(self, arm_idx: Optional[int] = None) -> None:
+        """Re-invert A (one arm, or all arms if arm_idx is None) and recompute theta."""
+        idx = slice(None) if arm_idx is None else arm_idx
+        self.A_inv[idx] = np.linalg.inv(self.A[idx])
+        self.theta[idx] = np.einsum("...ij,...j->...i", self.A_inv[idx], self.b[idx])
+
+    def check_drift(self) -> bool:
+        """Re-invert every arm whose drift exceeds `drift_tol`. Returns True if any were refreshed."""
+        bad = np.flatnonzero(self.drift() > self.drift_tol)
+        for k in bad:
+            self.refresh(int(k))
+        return bool(bad.size)
+
+    # ------------------------------------------------------------------ #
+    # checkpointing
+    # ------------------------------------------------------------------ #
+    def get_state(self) -> dict:
+        """Everything needed to continue learning exactly where we stopped."""
+        return {
+            "alpha": self.alpha,
+            "A": self.A,
+            "b": self.b,
+            "A_inv": self.A_inv,
+            "theta": self.theta,
+            "n_updates": self.n_updates,
+            "rng_state": self.rng.bit_generator.state,
+        }
+
+    def set_state(self, state: dict) -> None:
+        if state["A"].shape != self.A.shape:
+            raise ValueError(f"Checkpoint has A of shape {state['A'].shape}, policy expects {self.A.shape}.")
+        self.alpha = float(state["alpha"])
+        self.A = np.array(state["A"], dtype=float)
+        self.b = np.array(state["b"], dtype=float)
+        self.A_inv = np.array(state["A_inv"], dtype=float)
+        self.theta = np.array(state["theta"], dtype=float)
+        self.n_updates = np.array(state["n_updates"], dtype=int)
+        self.rng.bit_generator.state = state["rng_state"]
@@ -0,0 +1,214 @@
+"""
+llm_cache.py
+------------
+Disk-backed, content-addressed cache for ask_fn-style LLM calls.
+
+    cache = ResponseCache("cache/llm.sqlite", mode="record")
+    ask   = cache.wrap(ask_gpt)            # same signature as ask_gpt
+    write_essay(..., ask_fn=ask)
+
+Key = sha256(model, system, user, temperature, sample_idx).
+`sample_idx` counts how many times the *same* request has been made in this
+process, so the 1st, 2nd, 3rd … identical call at temperature > 0 each get
+their own cached sample and a replay reproduces the same sequence.
+
+Modes
+  • "record"  – serve hits from disk, call the model on a miss and store it
+  • "replay"  – serve hits only; a miss raises CacheMiss (offline, deterministic)
+  • "bypass"  – always call the model, never read or write the cache
+
+Entries are evicted least-recently-used once the cache exceeds `max_entries`
+(down to EVICT_TO of it, so the trim runs once per ~max_entries/10 inserts).
+Hits update `last_access` in batches of TOUCH_BATCH, not with a commit each.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Optional
+
+MODES = ("record", "replay", "bypass")
+EVICT_TO = 0.9        # an eviction trims the cache to this share of max_entries
+TOUCH_BATCH = 256     # hits buffered before their last_access is written
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a request is not in the cache."""
+
+
+class ResponseCache:
+    """
+    SQLite-backed response cache; see the module docstring.
+
+    Sample indexes are handed out per request key in call order.  With
+    concurrent callers (batch.py with max_workers > 1, the async episode
+    runner) which of several identical in-flight calls gets index 0, 1, …
+    is nondeterministic, so a replay serves the same set of samples for a
+    key, but not necessarily to the same caller as the recording run.
+    """
+
+    def __init__(self, path, mode: str = "record", max_entries: Optional[int] = 100_000):
+        if mode not in MODES:
+            raise ValueError(f"`mode` must be one of {MODES}, got {mode!r}")
+        self.path = Path(path)
+        self.mode = mode
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self._sample_counter: Counter = Counter()   # request hash -> times seen
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # one connection shared by all threads; every access is under self._lock
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._db.commit()
+        self._count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        self._touched: dict = {}                    # key -> last hit time, not yet written
+
+    # ------------------------------------------------------------------ #
+    # keys
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def request_hash(*, system: str, user: str, model: str, temperature: float) -> str:
+        payload = json.dumps([model, system, user, float(temperature)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _next_key(self, **request) -> str:
+        """Hash of the request plus its per-process sample index."""
+        base = self.request_hash(**request)
+        with self._lock:
+            sample_idx = self._sample_counter[base]
+            self._sample_counter[base] += 1
+        return hashlib.sha256(f"{base}:{sample_idx}".encode()).hexdigest()
+
+    # ------------------------------------------------------------------ #
+    # storage
+    # ------------------------------------------------------------------ #
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._write_touches()
+                self._db.commit()
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        with self._lock:
+            now = time.time()
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO responses (key, response, last_access) VALUES (?, ?, ?)",
+                (key, response, now),
+            )
+            if cur.rowcount:
+                self._count += 1
+            else:
+                self._db.execute("UPDATE responses SET response = ?, last_access = ? WHERE key = ?",
+                                 (response, now, key))
+            self._write_touches()
+            if self.max_entries is not None and self._count > self.max_entries:
+                self._evict()
+            self._db.commit()
+
+    def _write_touches(self) -> None:
+        """Write the buffered hit times (caller holds the lock and commits)."""
+        if self._touched:
+            self._db.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                 [(t, key) for key, t in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self) -> None:
+        """LRU eviction down to EVICT_TO × max_entries (caller holds the lock and commits)."""
+        # another process may share the file – recount before trimming
+        self._count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = self._count - int(self.max_entries * EVICT_TO)
+        if excess > 0 and self._count > self.max_entries:
+            cur = self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+            self._count -= cur.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._write_touches()
+            self._db.commit()
+            self._db.close()
+
+    # ------------------------------------------------------------------ #
+    # ask_fn wrappers
+    # ------------------------------------------------------------------ #
+    def _lookup(self, request: dict):
+        """Return (key, cached_response_or_None) according to the mode."""
+        key = self._next_key(**request)
+        cached = self.get(key)
+        if cached is None and self.mode == "replay":
+            raise CacheMiss(
+                f"replay-only cache miss for model={request['model']!r}, "
+                f"temperature={request['temperature']} (system starts {request['system'][:60]!r})"
+            )
+        return key, cached
+
+    def wrap(self, ask_fn: Callable) -> Callable:
+        """Return a cached version of a synchronous ask_fn."""
+        if self.mode == "bypass":
+            return ask_fn
+
+        def cached_ask(system, user, model, temperature):
+            request = dict(system=system, user=user, model=model, temperature=temperature)
+            key, cached = self._lookup(request)
+            if cached is not None:
+                return cached
+            response = ask_fn(**request)
+            self.put(key, response)
+            return response
+
+        return cached_ask
+
+    def wrap_async(self, ask_fn: Callable) -> Callable:
+        """Return a cached version of an async ask_fn (e.g. ask_gpt_async)."""
+        if self.mode == "bypass":
+            return ask_fn
+
+        async def cached_ask(system, user, model, temperature):
+            request = dict(system=system, user=user, model=model, temperature=temperature)
+            key, cached = self._lookup(request)
+            if cached is not None:
+                return cached
+            response = await ask_fn(**request)
+            self.put(key, response)
+            return response
+
+        return cached_ask
@@ -17,11 +17,16 @@ At each time step t=1,2,…:
         n_i ← n_i + 1
         sum_i ← sum_i + r
         μ̂_i = sum_i / n_i
+
+counts / sums are NumPy arrays, so scoring all K arms is one vectorised
+expression and the policy scales to thousands of arms (e.g. prompt
+variants).  Unplayed arms are tracked with a forward pointer, so finding
+the next one is amortised O(1) instead of a scan.
 """
 
 import numpy as np
 import random
-from typing import List
+from typing import Sequence
 
 
 class NonContextualUCB:
@@ -29,36 +34,68 @@ class NonContextualUCB:
 
     def __init__(self, n_arms: int, seed: int):
         self.n_arms = n_arms
-        self.counts: List[int] = [0] * n_arms     # n_i = times arm i pulled
-        self.sums:   List[float] = [0.0] * n_arms  # sum of rewards for arm i
+        self.counts = np.zeros(n_arms, dtype=np.int64)   # n_i = times arm i pulled
+        self.sums   = np.zeros(n_arms, dtype=float)      # sum of rewards for arm i
+        # every arm below this index has been pulled at least once
+        self._first_unplayed = 0
         if seed is None:
             self.rng = random.Random()
         else:
             self.rng = random.Random(seed)
 
+    def _advance_unplayed(self) -> int:
+        """Move the pointer past pulled arms; return it (== n_arms when all were pulled)."""
+        i = self._first_unplayed
+        while i < self.n_arms and self.counts[i] > 0:
+            i += 1
+        self._first_unplayed = i
+        return i
+
     def select_arm(self, t: int) -> int:
         """
         Return an arm index in {0,…,n_arms-1} to pull at time t (1-based).
         If any arm i has counts[i]==0, return that arm (initialization).
         Otherwise compute UCB score for each arm and return the argmax.
         """
-        # 1) If any arm hasn't been pulled yet, pull it once
-        for i in range(self.n_arms):
-            if self.counts[i] == 0:
-                return i
-
-        # 2) All arms have been seen at least once → compute UCB scores
-        ucb_values = [0.0] * self.n_arms
-        log_t = np.log(t)
-        for i in range(self.n_arms):
-            mean_i = self.sums[i] / self.counts[i]                  # μ̂_i
-            bonus  = np.sqrt((2 * log_t) / self.counts[i])         # sqrt((2 ln t)/n_i)
-            ucb_values[i] = mean_i + bonus
+        # 1) If any arm hasn't been pulled yet, pull it once (lowest index first)
+        i = self._advance_unplayed()
+        if i < self.n_arms:
+            return i
+
+        # 2) All arms have been seen at least once → UCB scores for every arm at once
+        ucb_values = self.sums / self.counts + np.sqrt((2 * np.log(t)) / self.counts)
 
         # 3) break ties randomly
-        max_val = max(ucb_values)
-        best_arms = [i for i, v in enumerate(ucb_values) if v == max_val]
-        return self.rng.choice(best_arms)
+        best_arms = np.flatnonzero(ucb_values == ucb_values.max())
+        return int(self.rng.choice(best_arms))
+
+    def select_arms(self, t_values: Sequence[int]) -> np.ndarray:
+        """
+        Choose arms for a batch of time steps at once, with no update in between.
+        Unplayed arms are handed out first (lowest index first, one per step);
+        the remaining steps are scored with their own t in one (N, K) expression.
+        """
+        t_values = np.asarray(t_values, dtype=float)
+        chosen = np.empty(len(t_values), dtype=np.int64)
+
+        unplayed = np.flatnonzero(self.counts[self._advance_unplayed():] == 0) + self._first_unplayed
+        played = self.counts > 0
+        n_init = len(t_values) if not played.any() else min(len(unplayed), len(t_values))
+        if n_init:
+            # with nothing played yet, every step must go to an unplayed arm (cycling if needed)
+            chosen[:n_init] = unplayed[np.arange(n_init) % len(unplayed)]
+        if n_init == len(t_values):
+            return chosen
+
+        means = np.where(played, self.sums / np.maximum(self.counts, 1), 0.0)
+        bonus = np.sqrt((2 * np.log(t_values[n_init:, None])) / np.maximum(self.counts, 1))
+        scores = np.where(played, means + bonus, -np.inf)
+
+        is_best = scores == scores.max(axis=1, keepdims=True)
+        chosen[n_init:] = is_best.argmax(axis=1)
+        for row in np.flatnonzero(is_best.sum(axis=1) > 1):   # ties: same random tie-break as select_arm
+            chosen[n_init + row] = self.rng.choice(np.flatnonzero(is_best[row]))
+        return chosen
 
     def update(self, arm_idx: int, reward: float):
         """
@@ -69,5 +106,22 @@ class NonContextualUCB:
 
     def reset(self):
         """Reset the policy to zero pulls (if you want to reuse)."""
-        self.counts = [0] * self.n_arms
-        self.sums   = [0.0] * self.n_arms
\ No newline at end of file
+        self.counts = np.zeros(self.n_arms, dtype=np.int64)
+        self.sums   = np.zeros(self.n_arms, dtype=float)
+        self._first_unplayed = 0
+
+    def get_state(self) -> dict:
+        return {
+            "counts": self.counts.copy(),
+            "sums": self.sums.copy(),
+            "rng_state": self.rng.getstate(),
+        }
+
+    def set_state(self, state: dict) -> None:
+        if len(state["counts"]) != self.n_arms:
+            raise ValueError(f"Checkpoint has {len(state['counts'])} arms, policy has {self.n_arms}.")
+        self.counts = np.array(state["counts"], dtype=np.int64)
+        self.sums = np.array(state["sums"], dtype=float)
+        self._first_unplayed = 0
+        version, internal, gauss_next = state["rng_state"]   # may come back from JSON as lists
+        self.rng.setstate((version, tuple(internal), gauss_next))
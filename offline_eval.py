@@ -0,0 +1,213 @@
+"""
+offline_eval.py  –  off-policy evaluation over logged online_sim runs
+---------------------------------------------------------------------
+Load the LONG-format CSV written by online_sim.simulate_online_bandit and
+estimate how a *different* policy (new alpha, UCB1, …) would have done,
+without calling the LLM again.
+
+• replay_evaluate : Li et al. (2011) replay – walk the log in order, let the
+                    candidate pick an arm; only events where it agrees with
+                    the logged arm are scored (and, if learn=True, fed back
+                    to the candidate).  Unbiased when the logging policy
+                    chose arms uniformly at random.
+• ips_estimate    : inverse-propensity scoring for a fixed policy given its
+                    (N, K) action probabilities; snips_estimate is the
+                    self-normalised variant.  Fully vectorised.
+
+The context of each logged round is rebuilt exactly as run_episode built it:
+build_x(essay_text, persona_key, score_before).
+
+NOTE: online_sim does not log propensities.  Unless a `propensity` column is
+present, the logging policy is assumed uniform (p = 1/K).  For logs produced
+by LinUCB/UCB1 that assumption does not hold, so treat the numbers as
+indicative rather than unbiased.
+"""
+
+from __future__ import annotations
+import copy
+from pathlib import Path
+from typing import Callable, Dict, List, Union
+
+import numpy as np
+
+from .bandit_features import build_X
+from .online_sim      import ARMS
+from .text_store      import load_log_rows
+
+
+class LoggedRounds:
+    """Column arrays for the logged (context, arm, reward) events of one run."""
+
+    def __init__(self, X, arms, rewards, propensity, episode_id, round_):
+        self.X = X                    # (N, d) contexts
+        self.arms = arms              # (N,)  logged arm index
+        self.rewards = rewards        # (N,)  observed reward
+        self.propensity = propensity  # (N,)  P(logged arm | context) under the logging policy
+        self.episode_id = episode_id  # (N,)
+        self.round = round_           # (N,)  "1", "2", "3" (or "transfer")
+        self.n_arms = len(ARMS)
+
+    def __len__(self) -> int:
+        return len(self.arms)
+
+
+def load_log(
+    csv_path: Path,
+    *,
+    include_transfer: bool = False,
+    propensity: Union[float, str, None] = None,
+) -> LoggedRounds:
+    """
+    Read an online_sim CSV (full or compact, see text_store.py) into arrays.
+
+    include_transfer : also keep the "transfer" rows.  Their reward was
+                       credited to the last round's context, which the log
+                       does not store, so they are dropped by default.
+    propensity       : float → constant propensity for every row;
+                       str   → name of a column holding it;
+                       None  → use a `propensity` column if present, else 1/K.
+    """
+    arm_index = {arm.value: i for i, arm in enumerate(ARMS)}
+
+    # compact logs (text_store.py) are expanded back to full text
+    rows = [
+        r for r in load_log_rows(csv_path)
+        if include_transfer or r["round"] != "transfer"
+    ]
+    if not rows:
+        raise ValueError(f"No usable rows in {csv_path}.")
+
+    X = build_X(
+        [r["essay_text"] for r in rows],
+        [r["persona_key"] for r in rows],
+        [float(r["score_before"]) for r in rows],
+    )
+
+    if isinstance(propensity, str):
+        p = np.array([float(r[propensity]) for r in rows])
+    elif propensity is None and "propensity" in rows[0]:
+        p = np.array([float(r["propensity"]) for r in rows])
+    else:
+        p = np.full(len(rows), 1.0 / len(ARMS) if propensity is None else float(propensity))
+
+    return LoggedRounds(
+        X          = X,
+        arms       = np.array([arm_index[r["arm"]] for r in rows]),
+        rewards    = np.array([float(r["reward"]) for r in rows]),
+        propensity = p,
+        episode_id = np.array([int(r["episode_id"]) for r in rows]),
+        round_     = np.array([r["round"] for r in rows]),
+    )
+
+
+# ---------------------------------------------------------------------------
+#  replay method
+# ---------------------------------------------------------------------------
+def replay_evaluate(policy, data: LoggedRounds, *, learn: bool = True) -> Dict[str, float]:
+    """
+    Replay *policy* (select_arm(x) / update(arm, reward, x) interface) over the log.
+
+    learn=True  : the policy is updated on matched events, as it would be online.
+    learn=False : the policy is frozen; all choices are made in one batch when
+                  it offers select_arms(X) (e.g. LinUCBPolicy).
+    """
+    if not learn and hasattr(policy, "select_arms"):
+        chosen = np.asarray(policy.select_arms(data.X))
+    else:
+        chosen = np.empty(len(data), dtype=int)
+        for i in range(len(data)):
+            chosen[i] = policy.select_arm(data.X[i])
+            if learn and chosen[i] == data.arms[i]:
+                policy.update(int(chosen[i]), float(data.rewards[i]), data.X[i])
+
+    matched = chosen == data.arms
+    n_matched = int(matched.sum())
+    return {
+        "value": float(data.rewards[matched].mean()) if n_matched else float("nan"),
+        "n_matched": n_matched,
+        "match_rate": n_matched / len(data),
+        "cum_reward": float(data.rewards[matched].sum()),
+    }
+
+
+# ---------------------------------------------------------------------------
+#  inverse-propensity estimators (fixed policies)
+# ---------------------------------------------------------------------------
+def action_probs(policy, X: np.ndarray) -> np.ndarray:
+    """
+    (N, K) probabilities that a *frozen* policy picks each arm for each context.
+    Greedy policies with ucb_batch(X) (LinUCBPolicy) are handled in one shot,
+    with ties shared uniformly; anything else is sampled once per row, on a
+    copy – select_arm can advance internal state (UCBPolicyAdapter.time, the
+    tie-break / sampling RNG), and *policy* must stay frozen.
+    """
+    X = np.asarray(X, dtype=float)
+    if hasattr(policy, "ucb_batch"):
+        scores = policy.ucb_batch(X)
+        best = scores == scores.max(axis=1, keepdims=True)
+        return best / best.sum(axis=1, keepdims=True)
+
+    frozen = copy.deepcopy(policy)
+    if hasattr(frozen, "select_arms"):
+        # every row scored against the same state, no updates in between
+        arms = frozen.select_arms(X)
+    else:
+        arms = [frozen.select_arm(x) for x in X]
+    probs = np.zeros((len(X), len(ARMS)))
+    probs[np.arange(len(X)), arms] = 1.0
+    return probs
+
+
+def ips_estimate(probs: np.ndarray, data: LoggedRounds) -> Dict[str, float]:
+    """IPS value estimate  mean_i  pi(a_i|x_i) * r_i / p_i  with its standard error."""
+    w = probs[np.arange(len(data)), data.arms] / data.propensity
+    terms = w * data.rewards
+    return {
+        "value": float(terms.mean()),
+        "stderr": float(terms.std(ddof=1) / np.sqrt(len(terms))) if len(terms) > 1 else float("nan"),
+        "ess": float(w.sum() ** 2 / (w ** 2).sum()) if w.any() else 0.0,   # effective sample size
+    }
+
+
+def snips_estimate(probs: np.ndarray, data: LoggedRounds) -> Dict[str, float]:
+    """Self-normalised IPS:  sum(w_i r_i) / sum(w_i)."""
+    w = probs[np.arange(len(data)), data.arms] / data.propensity
+    total = w.sum()
+    return {"value": float((w * data.rewards).sum() / total) if total else float("nan")}
+
+
+# ---------------------------------------------------------------------------
+#  many candidates at once
+# ---------------------------------------------------------------------------
+def evaluate_policies(
+    candidates: Dict[str, Callable[[], object]],
+    data: LoggedRounds,
+    *,
+    learn: bool = True,
+) -> List[Dict[str, object]]:
+    """
+    Evaluate every candidate on the same log.  *candidates* maps a name to a
+    zero-argument factory so each gets a fresh policy, e.g.
+        {f"linucb_a{a}": (lambda a=a: LinUCBPolicy(4, CTX_DIM, a)) for a in (0.5, 1, 3)}
+    Returns one dict per candidate (replay + IPS/SNIPS of the policy frozen
+    after replay).
+    """
+    results: List[Dict[str, object]] = []
+    for name, make in candidates.items():
+        policy = make()
+        rep = replay_evaluate(policy, data, learn=learn)
+        probs = action_probs(policy, data.X)
+        results.append({
+            "policy": name,
+            "replay_value": rep["value"],
+            "replay_matched": rep["n_matched"],
+            "replay_match_rate": rep["match_rate"],
+            "ips_value": ips_estimate(probs, data)["value"],
+            "snips_value": snips_estimate(probs, data)["value"],
+        })
+    return results
+
+
+def logged_value(data: LoggedRounds) -> float:
+    """Average reward the logging policy actually earned (baseline for comparison)."""
+    return float(data.rewards.mean())
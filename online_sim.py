@@ -8,17 +8,22 @@ online_sim.py  –  LONG-format episode simulator
 """
 
 from __future__ import annotations
-import csv, time, random
+import asyncio, csv, random
+from functools import partial
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 
-from .utils           import ask_gpt
-from .writing         import write_essay, rewrite_essay
-from .feedback        import FeedbackArm, generate_feedback
-from .grading         import score_essay
+from .utils           import ask_gpt, ask_gpt_async
+from .writing         import write_essay, rewrite_essay, write_essay_async, rewrite_essay_async
+from .feedback        import FeedbackArm, generate_feedback, generate_feedback_async
+from .grading         import score_essay_consistent, score_essay_consistent_async
 from .linucb_policy   import LinUCBPolicy
-from .bandit_features import build_x, CTX_DIM
-import textstat
+from .bandit_features import build_x, essay_features, CTX_DIM
+from .checkpoint      import save_checkpoint, load_checkpoint
+from .task_graph      import TaskGraph
+from .               import tracing
+from .text_store      import (ONLINE_TEXT_FIELDS, REF_SUFFIX, TextStore, compact_row,
+                              default_store_path)
 
 # ---------------------------------------------------------------------------
 #  fixed feedback arms
@@ -36,10 +41,8 @@ def lexical_score(text: str) -> float:
         unique_word_ratio  =  (# unique words) / (total words)
     You can swap this for textstat.lexical_density or any other metric.
     """
-    words = [w.lower() for w in text.split()]
-    if not words:
-        return 0.0
-    return len(set(words)) / len(words)
+    # shares the single-pass, memoized featurizer with build_x
+    return essay_features(text).lexical_diversity
 
 
 # ---------------------------------------------------------------------------
@@ -62,24 +65,24 @@ def paired_prompt(prompt1: str) -> str:
 # ---------------------------------------------------------------------------
 #  one episode  →  returns *four* log rows
 # ---------------------------------------------------------------------------
-def run_episode(
-    *,
-    bandit: LinUCBPolicy,
-    persona_key: str,
-    persona_text: str,
-    prompt1: str,
-    grade_level: str = "10th-grade",
-    model: str = "gpt-4o",
-    t_write: float = 1.0,
-    t_fb: float = 0.5,
-    t_score: float = 0.0,
-) -> List[dict]:
+def _episode(persona_key: str, prompt1: str):
+    """
+    The episode itself – rows, rewards and the order of bandit calls – as a
+    generator shared by run_episode and run_episode_async.  It yields the
+    I/O it needs as (op, *args) and is sent back the result:
+
+        ("write",)                          → draft-1 text
+        ("grade", essay)                    → ConsistentScore
+        ("select", ctx)                     → arm index
+        ("revise", arm, draft, transfer)    → (feedback, new_draft, ConsistentScore,
+                                               transfer draft or None)
+        ("update", arm_idx, reward, ctx)    → ignored
+    """
     rows: List[dict] = []
 
     # ---- Draft-1 ----------------------------------------------------------
-    draft = write_essay(persona = persona_text, essay_prompt = prompt1, use_history = False,
-                        ask_fn=ask_gpt, model=model, temperature=t_write)
-    score = score_essay(draft, model=model, temperature=t_score)[0]
+    draft = yield ("write",)
+    score = (yield ("grade", draft)).score
 
     last_ctx = None
     last_arm_idx = None
@@ -87,17 +90,15 @@ def run_episode(
     # ---- three feedback rounds -------------------------------------------
     for r in (1, 2, 3):
         ctx     = build_x(draft, persona_key, score)
-        arm_idx = bandit.select_arm(ctx)
+        arm_idx = yield ("select", ctx)
         arm     = ARMS[arm_idx]
 
-        fb = generate_feedback(essay = draft, arm = arm, grade_level = grade_level, writing_prompt = prompt1,
-                               ask_fn=ask_gpt, model=model, temperature=t_fb)
-        new_draft = rewrite_essay(essay = draft, feedback = fb, persona = persona_text,
-                                  ask_fn=ask_gpt, model=model, temperature=t_write)
-        new_score = score_essay(new_draft, model=model, temperature=t_score)[0]
+        # the transfer essay is drafted alongside the round-3 grading
+        fb, new_draft, graded, t_draft = yield ("revise", arm, draft, r == 3)
+        new_score = graded.score
         reward    = new_score - score
 
-        bandit.update(arm_idx, reward, ctx)
+        yield ("update", arm_idx, reward, ctx)
 
         rows.append({
             "round":        r,               # 1,2,3
@@ -106,9 +107,11 @@ def run_episode(
             "essay_text":   draft,           # essay BEFORE this feedback
             "lex_score":    lexical_score(draft),
             "arm":          arm.value,
-            "feedback_text": fb,             
+            "feedback_text": fb,
             "score_before": score,
             "score_after":  new_score,
+            "score_dispersion": graded.dispersion,     # of the score_after grading
+            "score_samples":    len(graded.samples),
             "reward":       reward,
         })
 
@@ -117,30 +120,86 @@ def run_episode(
 
     # ---- transfer step ----------------------------------------------------
     prompt2 = paired_prompt(prompt1)
-    t_draft = write_essay(
-        persona = persona_text, essay_prompt= prompt2, use_history= True,
-        history=[{"prompt": prompt1, "essay": draft, "feedback": fb}],
-        ask_fn=ask_gpt, model=model, temperature=t_write,
-    )
-    t_score  = score_essay(t_draft, model=model, temperature=t_score)[0]
+    t_graded = yield ("grade", t_draft)
+    t_score  = t_graded.score
     t_reward = t_score - rows[0]["score_before"]
 
-    bandit.update(last_arm_idx, t_reward, last_ctx)
+    yield ("update", last_arm_idx, t_reward, last_ctx)
 
     rows.append({
-    "round":        "transfer",
-    "persona_key":  persona_key,
-    "prompt":       prompt2,
-    "essay_text":   draft,           # last revision of prompt-1
-    "lex_score":    lexical_score(draft),
-    "arm":          ARMS[last_arm_idx].value,
-    "feedback_text": "",             # no new feedback in transfer step
-    "score_before": score,
-    "score_after":  t_score,
-    "reward":       t_reward,
-})
+        "round":        "transfer",
+        "persona_key":  persona_key,
+        "prompt":       prompt2,
+        "essay_text":   draft,           # last revision of prompt-1
+        "lex_score":    lexical_score(draft),
+        "arm":          ARMS[last_arm_idx].value,
+        "feedback_text": "",             # no new feedback in transfer step
+        "score_before": score,
+        "score_after":  t_score,
+        "score_dispersion": t_graded.dispersion,
+        "score_samples":    len(t_graded.samples),
+        "reward":       t_reward,
+    })
     return rows
 
+
+def run_episode(
+    *,
+    bandit: LinUCBPolicy,
+    persona_key: str,
+    persona_text: str,
+    prompt1: str,
+    ask_fn: Callable = ask_gpt,
+    grade_level: str = "10th-grade",
+    model: str = "gpt-4o",
+    t_write: float = 1.0,
+    t_fb: float = 0.5,
+    t_score: float = 0.0,
+    parallel_tasks: bool = True,
+    grade_samples: int = 1,
+) -> List[dict]:
+    """
+    *grade_samples* > 1 grades every draft by self-consistency
+    (grading.score_essay_consistent: up to that many samples, stopping once
+    two agree) – less reward noise, but only meaningful with t_score > 0.
+    """
+    grade = partial(score_essay_consistent, ask_fn=ask_fn, model=model, temperature=t_score,
+                    max_samples=grade_samples, parallel=parallel_tasks)
+
+    def write():
+        return write_essay(persona = persona_text, essay_prompt = prompt1, use_history = False,
+                           ask_fn=ask_fn, model=model, temperature=t_write)
+
+    def revise(arm, draft, transfer):
+        with tracing.tags(arm=arm.value):
+            fb = generate_feedback(essay = draft, arm = arm, grade_level = grade_level, writing_prompt = prompt1,
+                                   ask_fn=ask_fn, model=model, temperature=t_fb)
+            new_draft = rewrite_essay(essay = draft, feedback = fb, persona = persona_text,
+                                      ask_fn=ask_fn, model=model, temperature=t_write)
+
+            # grading the new draft and drafting the transfer essay both need
+            # only new_draft → run them side by side
+            graph = TaskGraph()
+            graph.add("score", lambda: grade(new_draft))
+            if transfer:
+                graph.add("transfer", lambda: write_essay(
+                    persona = persona_text, essay_prompt= paired_prompt(prompt1), use_history= True,
+                    history=[{"prompt": prompt1, "essay": new_draft, "feedback": fb}],
+                    ask_fn=ask_fn, model=model, temperature=t_write,
+                ))
+            out = graph.run(max_workers=None if parallel_tasks else 1)
+        return fb, new_draft, out["score"], out.get("transfer")
+
+    ops = {"write": write, "grade": grade, "select": bandit.select_arm,
+           "revise": revise, "update": bandit.update}
+    steps, result = _episode(persona_key, prompt1), None
+    try:
+        while True:
+            op, *args = steps.send(result)
+            result = ops[op](*args)
+    except StopIteration as done:
+        return done.value
+
 # ---------------------------------------------------------------------------
 #  run many episodes – balanced per persona – LONG format (shuffled)
 # ---------------------------------------------------------------------------
@@ -151,8 +210,42 @@ def simulate_online_bandit(
     persona_pool: Dict[str, str],
     prompt1_pool: List[str],
     csv_out: Path,
+    ask_fn: Callable = ask_gpt,
+    checkpoint_path: Optional[Path] = None,
+    checkpoint_every: int = 10,
+    resume: bool = False,
+    compact_texts: bool = False,
+    trace_out: Optional[Path] = None,
+    t_score: float = 0.0,
+    grade_samples: int = 1,
     verbose: bool = True,
 ) -> Path:
+    """
+    Run the balanced, shuffled playlist of episodes and stream rows to *csv_out*.
+
+    With *checkpoint_path* set, the bandit state, episode counter and prompt
+    RNG state are snapshotted every *checkpoint_every* episodes (and at the
+    end).  ``resume=True`` restores the snapshot (it must exist), drops any CSV rows written
+    after it, and continues with the next episode of the same playlist.
+
+    ``compact_texts=True`` writes prompt / essay / feedback once each to a
+    blob store next to the CSV (text_store.py) and only their hashes to the
+    CSV; read it back with text_store.load_log_rows.
+
+    *trace_out* records one span per LLM call (tracing.py) to that JSONL
+    file; a per-stage latency / token summary is printed at the end.
+
+    *t_score* is the grading temperature; ``grade_samples > 1`` grades by
+    self-consistency (see run_episode).
+    """
+
+    if checkpoint_every < 1:
+        raise ValueError("`checkpoint_every` must be at least 1.")
+    if resume and (checkpoint_path is None or not Path(checkpoint_path).exists()):
+        # starting over would truncate the log we were asked to continue
+        raise FileNotFoundError(
+            f"Cannot resume: no checkpoint at {checkpoint_path}. Run without resume to start over."
+        )
 
     # Make sure the output folder exists
     csv_out.parent.mkdir(parents=True, exist_ok=True)
@@ -177,28 +270,53 @@ def simulate_online_bandit(
     #   [("int_imp", "..."), ("beg_notimp", "..."), ("adv_imp", "..."), ("beg_imp", "..."), …]
     # exactly 300 entries, in random order.
 
+    playlist = [persona_key for persona_key, _ in choices]
+
     epi = 0
-    with csv_out.open("w", newline="", encoding="utf-8") as f:
-        writer = None
+    fieldnames = None
+    if resume:
+        epi, saved_playlist, prompt_rng_state = load_checkpoint(checkpoint_path, bandit=bandit)
+        if saved_playlist != playlist:
+            raise ValueError("Checkpoint playlist does not match this run's personas/episodes.")
+        random.setstate(prompt_rng_state)
+        # episodes logged after the snapshot will be re-run – drop their rows
+        fieldnames = _truncate_log(csv_out, epi)
+        if verbose:
+            print(f"Resuming after episode {epi}/{total_students} from {checkpoint_path}")
+        if fieldnames and any(c.endswith(REF_SUFFIX) for c in fieldnames) != compact_texts:
+            raise ValueError(f"Cannot resume: compact_texts={compact_texts} does not match {csv_out}.")
+
+    store = TextStore(default_store_path(csv_out)) if compact_texts else None
+
+    with tracing.traced_run(trace_out, verbose), \
+            csv_out.open("a" if fieldnames else "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames) if fieldnames else None
 
         # 3) Iterate over the shuffled episodes—no nested loops here!
-        for (persona_key, persona_text) in choices:
+        for (persona_key, persona_text) in choices[epi:]:
             epi += 1
 
             # Pick one random prompt1 as before
             prompt1 = random.choice(prompt1_pool)
 
             # Run a single “episode” (4 rows: rounds 1–3 + transfer)
-            rows = run_episode(
-                bandit       = bandit,
-                persona_key  = persona_key,
-                persona_text = persona_text,
-                prompt1      = prompt1,
-            )
+            with tracing.tags(persona=persona_key, episode_id=epi):
+                rows = run_episode(
+                    bandit       = bandit,
+                    persona_key  = persona_key,
+                    persona_text = persona_text,
+                    prompt1      = prompt1,
+                    ask_fn       = ask_fn,
+                    t_score      = t_score,
+                    grade_samples = grade_samples,
+                )
 
             # Tag each of those 4 rows with the same global student ID = epi
             for r in rows:
                 r["episode_id"] = epi
+            if store is not None:
+                rows = [compact_row(r, ONLINE_TEXT_FIELDS, store) for r in rows]
+                store.flush()      # texts are durable before the rows that point at them
 
             # Initialize CSV writer once (on the first episode)
             if writer is None:
@@ -209,10 +327,208 @@ def simulate_online_bandit(
             writer.writerows(rows)
             f.flush()
 
+            # snapshot AFTER the flush, so the CSV is never behind the checkpoint
+            if checkpoint_path is not None and (epi % checkpoint_every == 0 or epi == total_students):
+                save_checkpoint(checkpoint_path, bandit=bandit, episode=epi,
+                                playlist=playlist, prompt_rng_state=random.getstate())
+
             if verbose:
                 print(f"Episode {epi}/{total_students} | persona = {persona_key}")
-            time.sleep(0.05)
 
+    if store is not None:
+        store.close()
+    if verbose:
+        print(f"\nSaved log to {csv_out.resolve()}")
+    return csv_out
+
+
+def _truncate_log(csv_out: Path, last_episode: int) -> Optional[List[str]]:
+    """Keep only rows with episode_id <= last_episode; return the header (None if no log)."""
+    if not csv_out.exists() or csv_out.stat().st_size == 0:
+        return None
+    with csv_out.open(newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        kept = [
+            r for r in reader
+            if None not in r.values() and r["episode_id"] and int(r["episode_id"]) <= last_episode
+        ]
+    with csv_out.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(kept)
+    return fieldnames
+
+
+# ---------------------------------------------------------------------------
+#  async variant – N episodes in flight, one ordered bandit access point
+# ---------------------------------------------------------------------------
+class _BanditGate:
+    """
+    Single, ordered access point to the bandit for concurrent episodes.
+    Every select_arm/update goes through one lock, so the policy sees a
+    well-defined sequence of calls (in arrival order) even though the LLM
+    calls of different episodes overlap.  With k episodes in flight an arm
+    is chosen before the rewards of up to k-1 other episodes are known –
+    the usual delayed-feedback / batched bandit setting.
+    """
+
+    def __init__(self, bandit):
+        self.bandit = bandit
+        self.lock = asyncio.Lock()
+
+    async def select_arm(self, ctx) -> int:
+        async with self.lock:
+            return self.bandit.select_arm(ctx)
+
+    async def update(self, arm_idx: int, reward: float, ctx) -> None:
+        async with self.lock:
+            self.bandit.update(arm_idx, reward, ctx)
+
+
+async def run_episode_async(
+    *,
+    gate: _BanditGate,
+    persona_key: str,
+    persona_text: str,
+    prompt1: str,
+    ask_fn: Callable = ask_gpt_async,
+    grade_level: str = "10th-grade",
+    model: str = "gpt-4o",
+    t_write: float = 1.0,
+    t_fb: float = 0.5,
+    t_score: float = 0.0,
+    grade_samples: int = 1,
+) -> List[dict]:
+    """Same episode as run_episode(), but awaiting *ask_fn* and going through *gate*."""
+    grade = partial(score_essay_consistent_async, ask_fn=ask_fn, model=model, temperature=t_score,
+                    max_samples=grade_samples)
+
+    def write():
+        return write_essay_async(persona = persona_text, essay_prompt = prompt1, use_history = False,
+                                 ask_fn=ask_fn, model=model, temperature=t_write)
+
+    async def revise(arm, draft, transfer):
+        with tracing.tags(arm=arm.value):
+            fb = await generate_feedback_async(essay = draft, arm = arm, grade_level = grade_level,
+                                               writing_prompt = prompt1,
+                                               ask_fn=ask_fn, model=model, temperature=t_fb)
+            new_draft = await rewrite_essay_async(essay = draft, feedback = fb, persona = persona_text,
+                                                  ask_fn=ask_fn, model=model, temperature=t_write)
+
+            graph = TaskGraph()
+            graph.add("score", lambda: grade(new_draft))
+            if transfer:
+                graph.add("transfer", lambda: write_essay_async(
+                    persona = persona_text, essay_prompt= paired_prompt(prompt1), use_history= True,
+                    history=[{"prompt": prompt1, "essay": new_draft, "feedback": fb}],
+                    ask_fn=ask_fn, model=model, temperature=t_write,
+                ))
+            out = await graph.run_async()
+        return fb, new_draft, out["score"], out.get("transfer")
+
+    ops = {"write": write, "grade": grade, "select": gate.select_arm,
+           "revise": revise, "update": gate.update}
+    steps, result = _episode(persona_key, prompt1), None
+    try:
+        while True:
+            op, *args = steps.send(result)
+            result = await ops[op](*args)
+    except StopIteration as done:
+        return done.value
+
+
+async def simulate_online_bandit_async(
+    *,
+    episodes_per_persona: int,
+    bandit: LinUCBPolicy,
+    persona_pool: Dict[str, str],
+    prompt1_pool: List[str],
+    csv_out: Path,
+    concurrency: int = 8,
+    ask_fn: Callable = ask_gpt_async,
+    compact_texts: bool = False,
+    trace_out: Optional[Path] = None,
+    t_score: float = 0.0,
+    grade_samples: int = 1,
+    verbose: bool = True,
+) -> Path:
+    """
+    Async counterpart of simulate_online_bandit().
+    Keeps up to *concurrency* episodes in flight; rows of each episode are
+    written (and flushed) as soon as that episode finishes, so the CSV is in
+    completion order – group/sort by `episode_id` for the playlist order.
+    *compact_texts*, *trace_out*, *t_score* and *grade_samples* as in
+    simulate_online_bandit().  There are no checkpoints: episodes finish out
+    of order, so no episode number marks a state to resume from – use the
+    sequential runner for long, resumable runs.
+    """
+    if concurrency < 1:
+        raise ValueError("`concurrency` must be at least 1.")
+
+    csv_out.parent.mkdir(parents=True, exist_ok=True)
+    total_students = episodes_per_persona * len(persona_pool)
+
+    # same balanced, shuffled playlist as the sync runner
+    choices: list[tuple[str, str]] = []
+    for persona_key, persona_text in persona_pool.items():
+        for _ in range(episodes_per_persona):
+            choices.append((persona_key, persona_text))
+    random_seed = 42
+    rnd = random.Random(random_seed)
+    rnd.shuffle(choices)
+
+    # draw prompt1 up front, in playlist order, so it doesn't depend on completion order
+    queue: asyncio.Queue = asyncio.Queue()
+    for epi, (persona_key, persona_text) in enumerate(choices, 1):
+        queue.put_nowait((epi, persona_key, persona_text, random.choice(prompt1_pool)))
+
+    gate = _BanditGate(bandit)
+    done = 0
+    store = TextStore(default_store_path(csv_out)) if compact_texts else None
+
+    with tracing.traced_run(trace_out, verbose), csv_out.open("w", newline="", encoding="utf-8") as f:
+        writer = None
+
+        async def worker() -> None:
+            nonlocal writer, done
+            while True:
+                try:
+                    epi, persona_key, persona_text, prompt1 = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                with tracing.tags(persona=persona_key, episode_id=epi):
+                    rows = await run_episode_async(
+                        gate         = gate,
+                        persona_key  = persona_key,
+                        persona_text = persona_text,
+                        prompt1      = prompt1,
+                        ask_fn       = ask_fn,
+                        t_score      = t_score,
+                        grade_samples = grade_samples,
+                    )
+                for r in rows:
+                    r["episode_id"] = epi
+                if store is not None:
+                    rows = [compact_row(r, ONLINE_TEXT_FIELDS, store) for r in rows]
+                    store.flush()
+
+                # no await between here and flush → writes never interleave
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+                    writer.writeheader()
+                writer.writerows(rows)
+                f.flush()
+
+                done += 1
+                if verbose:
+                    print(f"Episode {epi} done ({done}/{total_students}) | persona = {persona_key}")
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, total_students))))
+
+    if store is not None:
+        store.close()
     if verbose:
         print(f"\nSaved log to {csv_out.resolve()}")
-    return csv_out
\ No newline at end of file
+    return csv_out
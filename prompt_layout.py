@@ -0,0 +1,32 @@
+"""
+prompt_layout.py
+----------------
+How every prompt builder (grading._score_prompts, feedback._feedback_prompts,
+writing._write_prompts / _rewrite_prompts) lays out a request:
+
+    system = static instructions  [+ long shared context, e.g. the RUBRIC]
+    user   = static template body  +  per-call content (essay, feedback,
+                                      history, assignment, grade level)
+
+Providers cache the longest byte-identical *prefix* of a request (OpenAI:
+automatically, from 1024 tokens).  Keeping everything that never changes in
+front – above all the ~6k-token rubric in the grader's system message – lets
+that prefix be processed once and served from cache on every later grading
+call.  tracing.summary() reports the cached-token ratio per stage to check it.
+"""
+
+from __future__ import annotations
+import os
+from typing import Sequence
+
+SEP = "\n\n"
+
+
+def assemble(static: Sequence[str], variable: Sequence[str] = ()) -> str:
+    """Static parts first, per-call parts last.  Static parts must not vary between calls."""
+    return SEP.join([*static, *variable])
+
+
+def shared_prefix_len(a: str, b: str) -> int:
+    """Length of the common prefix of two prompts (tests/test_prompt_layout.py checks the builders with it)."""
+    return len(os.path.commonprefix([a, b]))
@@ -0,0 +1,198 @@
+"""
+scheduler.py
+------------
+Central pacing for every LLM request.
+
+  • Two token buckets – requests/minute and tokens/minute.  A request
+    reserves 1 request + its *estimated* tokens (prompt length / 4 plus an
+    allowance for the completion) before it is sent, and waits just long
+    enough for the buckets to cover it.  No fixed sleeps: when quota is
+    left, requests go out immediately.
+  • Transient failures (429, 5xx, timeouts, connection errors) are retried
+    with full-jitter exponential backoff.
+  • Metrics: queue depth (callers currently waiting for quota), wait-time
+    percentiles, retries, failures.
+
+utils.ask_gpt / ask_gpt_async send every call through `utils.scheduler`;
+limits come from MAB_RPM / MAB_TPM (unset → unlimited, retries still on):
+
+    from src.utils import scheduler
+    scheduler.configure(rpm=500, tpm=30_000)
+    print(scheduler.metrics())
+"""
+
+from __future__ import annotations
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import numpy as np
+
+from . import tracing
+
+# HTTP statuses and exception class names worth retrying
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+TRANSIENT_NAMES = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+
+
+def is_transient(exc: BaseException) -> bool:
+    if getattr(exc, "status_code", None) in TRANSIENT_STATUS:
+        return True
+    return any(cls.__name__ in TRANSIENT_NAMES for cls in type(exc).__mro__)
+
+
+def estimate_tokens(system: str, user: str, completion_tokens: int = 800) -> int:
+    """Rough size of a chat request: ~4 characters per token + expected completion."""
+    return (len(system) + len(user)) // 4 + completion_tokens
+
+
+class TokenBucket:
+    """Continuous-refill bucket; `reserve` may drive the balance negative (a queue)."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0      # tokens per second
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.last = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take *amount* now and return how many seconds to wait before using it."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate)
+
+
+class RequestScheduler:
+    def __init__(
+        self,
+        *,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        completion_tokens: int = 800,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion_tokens = completion_tokens
+        self._lock = threading.Lock()
+        # own RNG for the jitter: online_sim checkpoints the global one (prompt draws),
+        # so retries must not consume from it
+        self._rng = random.Random()
+        self.configure(rpm=rpm, tpm=tpm)
+
+        self.queue_depth = 0
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self._waits: deque = deque(maxlen=10_000)
+
+    def configure(self, *, rpm: Optional[float] = None, tpm: Optional[float] = None) -> None:
+        """(Re)set the budgets; None disables that limit."""
+        with self._lock:
+            self._rpm = TokenBucket(rpm) if rpm else None
+            self._tpm = TokenBucket(tpm) if tpm else None
+
+    # ------------------------------------------------------------------ #
+    # pacing
+    # ------------------------------------------------------------------ #
+    def _reserve(self, n_tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self._rpm:
+                wait = max(wait, self._rpm.reserve(1, now))
+            if self._tpm:
+                wait = max(wait, self._tpm.reserve(n_tokens, now))
+            self._waits.append(wait)
+            self.requests += 1
+            if wait:
+                self.queue_depth += 1
+            return wait
+
+    def _done_waiting(self, wait: float) -> None:
+        if wait:
+            with self._lock:
+                self.queue_depth -= 1
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter": uniform in [0, min(max_delay, base * 2^attempt)]
+        with self._lock:
+            return self._rng.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _on_error(self, exc: Exception, attempt: int) -> float:
+        """Return the backoff delay, or re-raise if the error is final."""
+        with self._lock:
+            if not is_transient(exc) or attempt >= self.max_retries:
+                self.failures += 1
+                raise exc
+            self.retries += 1
+        tracing.note_retry()
+        return self._backoff(attempt)
+
+    # ------------------------------------------------------------------ #
+    # calling
+    # ------------------------------------------------------------------ #
+    def call(self, fn: Callable, *, system, user, model, temperature):
+        """Run a sync ask_fn under the budgets, retrying transient errors."""
+        n_tokens = estimate_tokens(system, user, self.completion_tokens)
+        attempt = 0
+        while True:
+            wait = self._reserve(n_tokens)
+            if wait:
+                time.sleep(wait)
+            self._done_waiting(wait)
+            try:
+                return fn(system=system, user=user, model=model, temperature=temperature)
+            except Exception as exc:
+                time.sleep(self._on_error(exc, attempt))
+                attempt += 1
+
+    async def acall(self, fn: Callable, *, system, user, model, temperature):
+        """Awaitable counterpart of call() for async ask_fns."""
+        n_tokens = estimate_tokens(system, user, self.completion_tokens)
+        attempt = 0
+        while True:
+            wait = self._reserve(n_tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            self._done_waiting(wait)
+            try:
+                return await fn(system=system, user=user, model=model, temperature=temperature)
+            except Exception as exc:
+                await asyncio.sleep(self._on_error(exc, attempt))
+                attempt += 1
+
+    def wrap(self, ask_fn: Callable) -> Callable:
+        """Return *ask_fn* (sync) routed through this scheduler."""
+        def scheduled_ask(system, user, model, temperature):
+            return self.call(ask_fn, system=system, user=user, model=model, temperature=temperature)
+        return scheduled_ask
+
+    def wrap_async(self, ask_fn: Callable) -> Callable:
+        """Return *ask_fn* (async) routed through this scheduler."""
+        async def scheduled_ask(system, user, model, temperature):
+            return await self.acall(ask_fn, system=system, user=user, model=model, temperature=temperature)
+        return scheduled_ask
+
+    # ------------------------------------------------------------------ #
+    # metrics
+    # ------------------------------------------------------------------ #
+    def metrics(self) -> dict:
+        with self._lock:
+            waits = np.array(self._waits) if self._waits else np.zeros(1)
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "queue_depth": self.queue_depth,
+                "wait_p50_s": float(np.percentile(waits, 50)),
+                "wait_p95_s": float(np.percentile(waits, 95)),
+                "wait_max_s": float(waits.max()),
+            }
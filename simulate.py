@@ -1,5 +1,6 @@
 # simulation
-from src.batch import batch_sim_three_two_revisions as run_sim
+# (personas / prompts are imported by cli_online and batch_jobs – keep this
+#  module light; the batch runner is only imported when run as a script)
 from src.feedback import FeedbackArm
 
 # ---------------------------------------------------------------------------
@@ -65,13 +66,41 @@ PROMPTS = [prompt_dist, prompt_summer]
 # ---------------------------------------------------------------------------
 
 if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+    from src.batch import batch_sim_three_two_revisions as run_sim
+    from src.llm_cache import ResponseCache, MODES as CACHE_MODES
+    from src.utils import ask_gpt
+
+    p = argparse.ArgumentParser("Batch simulation: every persona × arm, N runs each")
+    p.add_argument("--runs", type=int, default=50,
+                   help="Runs per (persona, arm) cell (default 50)")
+    p.add_argument("--outfile", type=Path, default=Path("0527_sim_batch_50rep.csv"),
+                   help="CSV output path")
+    p.add_argument("--max-workers", type=int, default=8,
+                   help="Cells run in parallel (default 8; 1 = sequential)")
+    p.add_argument("--resume", action="store_true",
+                   help="Keep the rows already in --outfile and run only the missing cells")
+    p.add_argument("--cache", type=Path, default=None,
+                   help="SQLite response cache (default: no cache)")
+    p.add_argument("--cache-mode", type=str, default="record", choices=CACHE_MODES,
+                   help="record | replay (fail on miss) | bypass (default record)")
+    args = p.parse_args()
+
+    cache = ResponseCache(args.cache, mode=args.cache_mode) if args.cache else None
+
     csv_path = run_sim(
-        runs=50,
+        runs=args.runs,
         personas=PERSONAS,
         grade_level="10th-grade",
         prompts=PROMPTS,
         arms=[FeedbackArm.SOC_HIGH,FeedbackArm.SOC_LOW, FeedbackArm.DIR_HIGH, FeedbackArm.DIR_LOW],
+        ask_fn=cache.wrap(ask_gpt) if cache is not None else ask_gpt,
         verbose=True,
-        csv_out = "0527_sim_batch_50rep.csv"
+        csv_out=args.outfile,
+        max_workers=args.max_workers,
+        resume=args.resume,
     )
-    print(f"Simulation complete. Check {csv_path} for results.")
\ No newline at end of file
+    print(f"Simulation complete. Check {csv_path} for results.")
+    if cache is not None:
+        print(f"LLM cache: {cache.stats()}")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""
+sweep.py  –  parallel hyper-parameter sweep for LinUCB / LinTS / UCB1
+-------------------------------------------------------------
+Runs every (policy, alpha, seed) configuration of a grid in a process pool
+(for LinTS, alpha is the posterior scale v)
+against a *local* environment – no LLM calls:
+
+  • synthetic : linear reward model over the same context layout as
+                bandit_features.build_x (persona one-hot + token count,
+                Flesch score, base score); true regret is known.
+  • replay    : an online_sim log, evaluated with the replay method
+                (offline_eval.replay_evaluate); regret is not defined.
+
+All curves go to ONE long-format CSV:
+    policy, alpha, seed, env, step, reward, cum_reward, cum_regret
+
+    python -m src.sweep --alphas 0.5 1 3 --policies linucb ucb1 \
+        --seeds 0 1 2 --env synthetic --steps 2000 --outfile data/sweep.csv
+"""
+
+from __future__ import annotations
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .bandit_adapter  import UCBPolicyAdapter
+from .bandit_features import CTX_DIM, PERSONA_DIM, persona2vec
+from .linucb_policy   import LinUCBPolicy
+from .lints_policy    import LinTSPolicy
+
+N_ARMS = 4
+POLICIES = ("linucb", "lints", "ucb1")
+
+
+def make_policy(name: str, alpha: float, seed: int):
+    """Build a fresh policy with a seeded tie-break RNG."""
+    if name == "linucb":
+        policy = LinUCBPolicy(n_arms=N_ARMS, dim=CTX_DIM, alpha=alpha)
+        policy.rng = np.random.default_rng(seed)
+        return policy
+    if name == "lints":
+        # alpha plays the role of the posterior scale v
+        return LinTSPolicy(n_arms=N_ARMS, dim=CTX_DIM, v=alpha, seed=seed)
+    if name == "ucb1":
+        return UCBPolicyAdapter(n_arms=N_ARMS, seed=seed)
+    raise ValueError(f"Unknown policy {name!r}; expected one of {POLICIES}.")
+
+
+# ---------------------------------------------------------------------------
+#  synthetic environment
+# ---------------------------------------------------------------------------
+class SyntheticEnv:
+    """
+    Contexts look like build_x output; the expected reward of arm k is
+        mu_k(x) = theta_k . z(x)
+    where z standardises the live features (token count, Flesch, base score)
+    so that no single raw feature dominates.  Observed reward = mu + N(0, noise^2).
+    """
+
+    LIVE_MEAN = np.array([600.0, 60.0, 3.5])
+    LIVE_STD  = np.array([150.0, 15.0, 1.2])
+
+    def __init__(self, seed: int, noise: float = 1.0):
+        self.rng = np.random.default_rng(seed)
+        self.noise = noise
+        self.personas = np.array(list(persona2vec.values()), dtype=float)
+        self.theta = self.rng.normal(scale=0.5, size=(N_ARMS, CTX_DIM))
+
+    def contexts(self, n: int) -> np.ndarray:
+        persona = self.personas[self.rng.integers(len(self.personas), size=n)]
+        live = self.LIVE_MEAN + self.LIVE_STD * self.rng.normal(size=(n, CTX_DIM - PERSONA_DIM))
+        live[:, 2] = np.clip(np.round(live[:, 2]), 1, 6)    # holistic score is an integer 1-6
+        return np.hstack([persona, live])
+
+    def expected_rewards(self, X: np.ndarray) -> np.ndarray:
+        """(N, K) matrix of mu_k(x)."""
+        Z = X.copy()
+        Z[:, PERSONA_DIM:] = (Z[:, PERSONA_DIM:] - self.LIVE_MEAN) / self.LIVE_STD
+        return Z @ self.theta.T
+
+
+def run_synthetic(policy_name: str, alpha: float, seed: int, steps: int, noise: float) -> Dict[str, np.ndarray]:
+    # the environment depends only on the seed, so every policy/alpha sees the same problem
+    env = SyntheticEnv(seed, noise=noise)
+    X = env.contexts(steps)
+    mu = env.expected_rewards(X)
+    noise_draws = env.rng.normal(scale=noise, size=steps)
+
+    policy = make_policy(policy_name, alpha, seed)
+    rewards = np.empty(steps)
+    regret = np.empty(steps)
+    for t in range(steps):
+        arm = policy.select_arm(X[t])
+        rewards[t] = mu[t, arm] + noise_draws[t]
+        regret[t] = mu[t].max() - mu[t, arm]
+        policy.update(arm, rewards[t], X[t])
+
+    return {"reward": rewards, "cum_reward": np.cumsum(rewards), "cum_regret": np.cumsum(regret)}
+
+
+def run_replay(policy_name: str, alpha: float, seed: int, data) -> Dict[str, np.ndarray]:
+    """Replay curve: reward is counted only on events where the policy matches the log."""
+    policy = make_policy(policy_name, alpha, seed)
+    rewards = np.zeros(len(data))
+    for i in range(len(data)):
+        arm = policy.select_arm(data.X[i])
+        if arm == data.arms[i]:
+            rewards[i] = data.rewards[i]
+            policy.update(arm, float(data.rewards[i]), data.X[i])
+    return {"reward": rewards, "cum_reward": np.cumsum(rewards), "cum_regret": np.full(len(data), np.nan)}
+
+
+def _run_config(job: dict) -> dict:
+    """Worker entry point (must be top-level to be picklable)."""
+    if job["env"] == "synthetic":
+        curves = run_synthetic(job["policy"], job["alpha"], job["seed"], job["steps"], job["noise"])
+    else:
+        curves = run_replay(job["policy"], job["alpha"], job["seed"], job["data"])
+    return {**{k: job[k] for k in ("policy", "alpha", "seed", "env")}, **curves}
+
+
+# ---------------------------------------------------------------------------
+#  sweep driver
+# ---------------------------------------------------------------------------
+def run_sweep(
+    *,
+    alphas: List[float],
+    policies: List[str],
+    seeds: List[int],
+    env: str = "synthetic",
+    steps: int = 1000,
+    noise: float = 1.0,
+    log_csv: Optional[Path] = None,
+    workers: Optional[int] = None,
+    csv_out: Path,
+    verbose: bool = True,
+) -> Path:
+    """Run the whole grid in a process pool and write one consolidated CSV."""
+    if env not in ("synthetic", "replay"):
+        raise ValueError("`env` must be 'synthetic' or 'replay'.")
+    if env == "replay" and log_csv is None:
+        raise ValueError("`log_csv` is required for the replay environment.")
+
+    data = None
+    if env == "replay":
+        from .offline_eval import load_log
+        data = load_log(log_csv)
+
+    jobs = []
+    for policy_name, seed in product(policies, seeds):
+        # UCB1 has no alpha – run it once per seed
+        for alpha in (alphas if policy_name != "ucb1" else [float("nan")]):
+            jobs.append(dict(policy=policy_name, alpha=alpha, seed=seed, env=env,
+                             steps=steps, noise=noise, data=data))
+
+    csv_out = Path(csv_out)
+    csv_out.parent.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool, \
+            csv_out.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["policy", "alpha", "seed", "env", "step", "reward", "cum_reward", "cum_regret"])
+        # pool.map keeps grid order, so the table is deterministic
+        for res in pool.map(_run_config, jobs):
+            n = len(res["reward"])
+            writer.writerows(zip(
+                [res["policy"]] * n, [res["alpha"]] * n, [res["seed"]] * n, [res["env"]] * n,
+                range(1, n + 1), res["reward"], res["cum_reward"], res["cum_regret"],
+            ))
+            if verbose:
+                print(f"{res['policy']:>7} alpha={res['alpha']:<5} seed={res['seed']:<3} "
+                      f"cum_reward={res['cum_reward'][-1]:9.2f}  cum_regret={res['cum_regret'][-1]:9.2f}")
+
+    if verbose:
+        print(f"\nSaved {len(jobs)} curve(s) to {csv_out.resolve()}")
+    return csv_out
+
+
+# -------- CLI --------------------------------------------------------------
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser("LinUCB / UCB1 hyper-parameter sweep")
+    p.add_argument("--alphas", type=float, nargs="+", default=[0.5, 1.0, 3.0],
+                   help="LinUCB α / LinTS posterior scale v values to try")
+    p.add_argument("--policies", type=str, nargs="+", default=list(POLICIES), choices=POLICIES)
+    p.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    p.add_argument("--env", type=str, default="synthetic", choices=["synthetic", "replay"])
+    p.add_argument("--log", type=Path, default=None,
+                   help="online_sim CSV to replay (required for --env replay)")
+    p.add_argument("--steps", type=int, default=1000, help="Rounds per synthetic run")
+    p.add_argument("--noise", type=float, default=1.0, help="Reward noise std for synthetic runs")
+    p.add_argument("--workers", type=int, default=None, help="Processes (default: all cores)")
+    p.add_argument("--outfile", type=Path, default=Path("data/sweep.csv"))
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    run_sweep(
+        alphas   = args.alphas,
+        policies = args.policies,
+        seeds    = args.seeds,
+        env      = args.env,
+        steps    = args.steps,
+        noise    = args.noise,
+        log_csv  = args.log,
+        workers  = args.workers,
+        csv_out  = args.outfile,
+    )
+
+
+if __name__ == "__main__":
+    main()
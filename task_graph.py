@@ -0,0 +1,97 @@
+"""
+task_graph.py
+-------------
+A tiny DAG executor for the LLM calls of one run.
+
+Each node is a callable that receives the results of its dependencies
+(positionally, in the order they were listed).  Nodes whose dependencies are
+all done run at the same time – in a thread pool for blocking ask_fns, or as
+asyncio tasks for awaitable ones – so only the critical path is paid for:
+
+    graph = TaskGraph()
+    graph.add("draft", lambda: write_essay(...))
+    graph.add("grade", lambda d: score_essay(d, ...), deps=["draft"])
+    graph.add("fb",    lambda d: generate_feedback(essay=d, ...), deps=["draft"])
+    out = graph.run()            # grade and fb are in flight together
+    out["grade"], out["fb"]
+
+A dependency must be added before the node that uses it, so every graph is
+acyclic by construction and insertion order is a valid topological order.
+`run(max_workers=1)` executes the nodes one by one in that order.
+"""
+
+from __future__ import annotations
+import asyncio
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+class TaskGraph:
+    def __init__(self):
+        self._nodes: Dict[str, Tuple[Callable, Tuple[str, ...]]] = {}
+
+    def add(self, name: str, fn: Callable, deps: Iterable[str] = ()) -> None:
+        deps = tuple(deps)
+        if name in self._nodes:
+            raise ValueError(f"Task {name!r} is already in the graph.")
+        missing = [d for d in deps if d not in self._nodes]
+        if missing:
+            raise ValueError(f"Task {name!r} depends on unknown task(s) {missing}; add them first.")
+        self._nodes[name] = (fn, deps)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    # ------------------------------------------------------------------ #
+    # blocking callables
+    # ------------------------------------------------------------------ #
+    def run(self, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run every node; return {name: result}.  The first exception is
+        re-raised once the nodes already in flight have finished; nodes that
+        had not started yet are skipped.
+        """
+        results: Dict[str, Any] = {}
+        if max_workers == 1:
+            for name, (fn, deps) in self._nodes.items():
+                results[name] = fn(*[results[d] for d in deps])
+            return results
+
+        pending = dict(self._nodes)
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers or len(self._nodes) or 1) as pool:
+            while pending or running:
+                ready = [n for n, (_, deps) in pending.items() if all(d in results for d in deps)]
+                for name in ready:
+                    fn, deps = pending.pop(name)
+                    # each node runs in a copy of the caller's context (keeps tracing tags)
+                    ctx = contextvars.copy_context()
+                    running[pool.submit(ctx.run, fn, *[results[d] for d in deps])] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    results[running.pop(fut)] = fut.result()
+        return results
+
+    # ------------------------------------------------------------------ #
+    # coroutine functions
+    # ------------------------------------------------------------------ #
+    async def run_async(self) -> Dict[str, Any]:
+        """Awaitable run(): every node is a coroutine function, scheduled as a task."""
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def _node(fn, deps):
+            args = [await tasks[d] for d in deps]
+            return await fn(*args)
+
+        for name, (fn, deps) in self._nodes.items():
+            tasks[name] = asyncio.ensure_future(_node(fn, deps))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            # let the cancelled tasks finish so no exception goes unretrieved
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in tasks.items()}
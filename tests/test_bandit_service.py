@@ -0,0 +1,60 @@
+"""
+bandit_service.py answers every request – malformed ones with {"error": ...} –
+in request order, and keeps the connection open.
+"""
+
+import asyncio
+import json
+
+import numpy as np
+
+from src.bandit_service import BanditServer
+from src.linucb_policy import LinUCBPolicy
+
+K, D = 4, 3
+CTX = [0.5, -1.0, 2.0]
+
+BAD_REQUESTS = [
+    b'{"op": "update", "arm": 1e999, "reward": 1.0, "ctx": [0.5, -1.0, 2.0]}',
+    b'{"op": "update", "arm": 1.5, "reward": 1.0, "ctx": [0.5, -1.0, 2.0]}',
+    b'{"op": "update", "arm": "1", "reward": 1.0, "ctx": [0.5, -1.0, 2.0]}',
+    b'{"op": "update", "arm": 4, "reward": 1.0, "ctx": [0.5, -1.0, 2.0]}',
+    b'{"op": "update", "arm": -1, "reward": 1.0, "ctx": [0.5, -1.0, 2.0]}',
+    b'{"op": "update", "arm": 1, "reward": NaN, "ctx": [0.5, -1.0, 2.0]}',
+    b'{"op": "update", "arm": 1, "reward": 1.0, "ctx": [0.5, -1.0, Infinity]}',
+    b'{"op": "update", "arm": 1, "reward": 1.0, "ctx": [0.5, -1.0, 1' + b"0" * 400 + b"]}",
+    b'{"op": "select", "ctx": [0.5, -1.0]}',
+    b'{"op": "select"}',
+    b'{"op": "train"}',
+    b'[1, 2, 3]',
+    b'{not json',
+]
+
+
+async def _exchange(address, lines):
+    server = BanditServer(LinUCBPolicy(K, D, alpha=1.0), snapshot_every=0)
+    await server.start(address)
+    try:
+        reader, writer = await asyncio.open_unix_connection(address)
+        writer.write(b"".join(line + b"\n" for line in lines))      # pipelined
+        await writer.drain()
+        replies = [json.loads(await asyncio.wait_for(reader.readline(), 5)) for _ in lines]
+        writer.close()
+        return server, replies
+    finally:
+        await server.close()
+
+
+def test_malformed_requests_get_error_replies_in_order(tmp_path):
+    good = [
+        json.dumps({"op": "update", "arm": 1, "reward": 1.0, "ctx": CTX}).encode(),
+        json.dumps({"op": "select", "ctx": CTX}).encode(),
+    ]
+    server, replies = asyncio.run(_exchange(str(tmp_path / "s.sock"), BAD_REQUESTS + good))
+
+    assert all("error" in r for r in replies[:len(BAD_REQUESTS)]), replies
+    assert replies[-2] == {"ok": True}
+    assert 0 <= replies[-1]["arm"] < K
+    # only the one valid update reached the policy
+    assert server.n_updates == 1
+    np.testing.assert_allclose(server.policy.b.sum(axis=1), [0.0, sum(CTX), 0.0, 0.0])
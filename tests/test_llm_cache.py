@@ -0,0 +1,36 @@
+"""
+llm_cache.ResponseCache: LRU eviction with batched last_access updates.
+"""
+
+import sqlite3
+
+from src.llm_cache import EVICT_TO, ResponseCache
+
+
+def test_recent_hits_survive_eviction(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite", max_entries=10)
+    for i in range(10):
+        cache.put(f"k{i}", f"v{i}")
+    # hit the oldest entries – their touches are only buffered at this point
+    assert cache.get("k0") == "v0" and cache.get("k1") == "v1"
+
+    cache.put("k10", "v10")                       # over the cap → trim to EVICT_TO
+    assert len(cache) == int(10 * EVICT_TO)
+    assert cache.get("k0") == "v0" and cache.get("k1") == "v1"
+    assert cache.get("k2") is None and cache.get("k3") is None
+    cache.close()
+
+
+def test_touches_are_written_on_close(tmp_path):
+    path = tmp_path / "c.sqlite"
+    cache = ResponseCache(path)
+    cache.put("k", "v")
+    before = sqlite3.connect(str(path)).execute("SELECT last_access FROM responses").fetchone()[0]
+    cache.get("k")
+    cache.close()
+
+    after = sqlite3.connect(str(path)).execute("SELECT last_access FROM responses").fetchone()[0]
+    assert after > before
+    reopened = ResponseCache(path, mode="replay")
+    assert len(reopened) == 1 and reopened.get("k") == "v"
+    reopened.close()
@@ -0,0 +1,68 @@
+"""
+Numerical checks for the stacked linear policies.
+
+Run from the directory that contains the package:  python -m pytest src/tests
+"""
+
+import numpy as np
+import pytest
+
+from src.lints_policy import LinTSPolicy, _chol_downdate
+from src.linucb_policy import LinUCBPolicy
+
+K, D = 4, 6
+
+
+def _feed(policy, n=200, seed=1):
+    """Apply *n* random (arm, reward, context) updates."""
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        policy.update(int(rng.integers(K)), float(rng.normal()), rng.normal(size=D))
+    return policy
+
+
+# ---------------------------------------------------------------------------
+#  incremental inverses stay in sync with A
+# ---------------------------------------------------------------------------
+def test_chol_downdate_matches_direct_factor():
+    rng = np.random.default_rng(0)
+    B = rng.normal(size=(D, D))
+    M = B @ B.T + D * np.eye(D)
+    u = rng.normal(size=D)
+    L = np.linalg.cholesky(M)
+    assert _chol_downdate(L, u)
+    np.testing.assert_allclose(L @ L.T, M - np.outer(u, u), atol=1e-10)
+
+
+def test_chol_downdate_refuses_indefinite_result():
+    L = np.eye(D)
+    assert not _chol_downdate(L, np.full(D, 2.0))
+
+
+def test_lints_factor_tracks_inverse():
+    policy = _feed(LinTSPolicy(K, D, seed=0))
+    for k in range(K):
+        C = policy.C[k]
+        np.testing.assert_allclose(C @ C.T, np.linalg.inv(policy.A[k]), atol=1e-8)
+        np.testing.assert_allclose(policy.theta[k], np.linalg.solve(policy.A[k], policy.b[k]), atol=1e-8)
+
+
+def test_linucb_sherman_morrison_tracks_inverse():
+    policy = _feed(LinUCBPolicy(K, D, alpha=1.0))
+    for k in range(K):
+        np.testing.assert_allclose(policy.A_inv[k], np.linalg.inv(policy.A[k]), atol=1e-8)
+    assert policy.drift().max() < 1e-8
+
+
+# ---------------------------------------------------------------------------
+#  batch selection == row-by-row selection
+# ---------------------------------------------------------------------------
+@pytest.mark.parametrize("make", [
+    lambda: LinUCBPolicy(K, D, alpha=0.5),
+    lambda: LinTSPolicy(K, D, v=0.5, seed=7),
+], ids=["linucb", "lints"])
+def test_select_arms_matches_select_arm(make):
+    X = np.random.default_rng(2).normal(size=(50, D))
+    batch = _feed(make()).select_arms(X)
+    single = _feed(make())
+    np.testing.assert_array_equal(batch, [single.select_arm(x) for x in X])
@@ -0,0 +1,36 @@
+"""
+Prompt builders keep their static text in front (prompt_layout.py), so the
+provider can serve it from its prefix cache on every later call.
+"""
+
+from src.feedback import _USER_TEMPLATE, FeedbackArm, _feedback_prompts
+from src.grading import RUBRIC, _rubric_block, _score_batch_prompts, _score_prompts
+from src.prompt_layout import shared_prefix_len
+from src.writing import _rewrite_prompts
+
+ESSAYS = ["Distance learning lets students learn at home.", "Students should design summer projects."]
+
+
+def test_grader_system_prompt_is_identical_across_essays():
+    (s1, u1), (s2, u2) = (_score_prompts(e, RUBRIC) for e in ESSAYS)
+    assert s1 == s2
+    assert RUBRIC in s1
+    # everything up to the essay itself is shared as well
+    assert shared_prefix_len(s1 + u1, s2 + u2) == len(s1 + u1) - len(ESSAYS[0])
+
+
+def test_batch_grader_shares_the_rubric_prefix():
+    s1, _ = _score_batch_prompts(ESSAYS, RUBRIC)
+    s2, _ = _score_batch_prompts(ESSAYS[::-1], RUBRIC)
+    assert s1 == s2
+    assert s1.endswith(_rubric_block(RUBRIC))
+
+
+def test_feedback_and_rewrite_put_static_text_first():
+    (s1, u1), (s2, u2) = (_feedback_prompts(e, FeedbackArm.SOC_LOW, "10th-grade", e) for e in ESSAYS)
+    assert s1 == s2
+    assert shared_prefix_len(u1, u2) >= len(_USER_TEMPLATE[FeedbackArm.SOC_LOW])
+
+    (s1, u1), (s2, u2) = (_rewrite_prompts(e, "Add an example.", "a student") for e in ESSAYS)
+    assert s1 == s2
+    assert shared_prefix_len(u1, u2) >= u1.index("----- ORIGINAL ESSAY -----")
@@ -0,0 +1,160 @@
+"""
+text_store.py
+-------------
+Compact simulation logs: every distinct text (essay, feedback, prompt,
+persona) is stored ONCE, zlib-compressed, in a content-addressed SQLite blob
+store next to the CSV; the CSV keeps only a sha256 reference per text
+column (`essay_text` → `essay_text_ref`) plus the numeric fields.
+
+    store = TextStore(default_store_path(csv_out))
+    writer = csv.DictWriter(f, fieldnames=compact_fields(fields, ONLINE_TEXT_FIELDS))
+    writer.writerow(compact_row(row, ONLINE_TEXT_FIELDS, store))
+    store.flush()                               # blobs before the rows that use them
+
+    rows = load_log_rows(csv_out)               # full-text view, compact or not
+
+A draft that is the "new draft" of one round and the input of the next, the
+prompt repeated on every row, the persona repeated on every batch row – each
+costs one blob.
+"""
+
+from __future__ import annotations
+import csv
+import hashlib
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+REF_SUFFIX = "_ref"
+
+# text columns of the two log formats
+ONLINE_TEXT_FIELDS = ("prompt", "essay_text", "feedback_text")
+BATCH_TEXT_FIELDS = (
+    "persona",
+    "prompt_1",
+    "prompt_1_draft_1",
+    "prompt_1_draft_1_feedback",
+    "prompt_1_revised_draft_2",
+    "prompt_1_revised_draft_2_feedback",
+    "prompt_1_revised_draft_3",
+    "prompt_2",
+    "prompt_2_draft_1",
+)
+
+
+def default_store_path(csv_path: Path) -> Path:
+    """data/run.csv → data/run.texts.sqlite"""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + ".texts.sqlite")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TextStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._known: set = set()              # hashes already stored (this process)
+        self._cache: Dict[str, str] = {}      # hash -> text, for reads
+        # one connection shared by all threads; every access is under self._lock
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " hash TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " raw_bytes INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+    def put(self, text: str) -> str:
+        """Store *text* (if new) and return its hash.  Call flush() to make it durable."""
+        h = text_hash(text)
+        with self._lock:
+            if h not in self._known:
+                raw = text.encode("utf-8")
+                self._db.execute(
+                    "INSERT OR IGNORE INTO blobs (hash, data, raw_bytes) VALUES (?, ?, ?)",
+                    (h, zlib.compress(raw, 6), len(raw)),
+                )
+                self._known.add(h)
+        return h
+
+    def get(self, h: str) -> str:
+        with self._lock:
+            text = self._cache.get(h)
+            if text is None:
+                row = self._db.execute("SELECT data FROM blobs WHERE hash = ?", (h,)).fetchone()
+                if row is None:
+                    raise KeyError(f"Text {h} is not in {self.path}.")
+                text = self._cache[h] = zlib.decompress(row[0]).decode("utf-8")
+        return text
+
+    def flush(self) -> None:
+        with self._lock:
+            self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            n, raw, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+            ).fetchone()
+        return {"texts": n, "raw_bytes": raw, "stored_bytes": stored}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+# ---------------------------------------------------------------------------
+#  row helpers
+# ---------------------------------------------------------------------------
+def compact_fields(fields: Iterable[str], text_fields: Sequence[str]) -> List[str]:
+    """Column list of the compact table: text columns become <name>_ref."""
+    return [f + REF_SUFFIX if f in text_fields else f for f in fields]
+
+
+def compact_row(row: Dict, text_fields: Sequence[str], store: TextStore) -> Dict:
+    return {
+        (k + REF_SUFFIX if k in text_fields else k): (store.put(str(v)) if k in text_fields else v)
+        for k, v in row.items()
+    }
+
+
+def expand_row(row: Dict, store: TextStore) -> Dict:
+    """Inverse of compact_row (column order preserved)."""
+    return {
+        (k[:-len(REF_SUFFIX)] if k.endswith(REF_SUFFIX) else k): (store.get(v) if k.endswith(REF_SUFFIX) else v)
+        for k, v in row.items()
+    }
+
+
+def load_log_rows(csv_path: Path, *, store: Optional[TextStore] = None, expand: bool = True) -> List[Dict]:
+    """
+    Read a log CSV as a list of dicts.  A compact log (any *_ref column) is
+    expanded to full text via *store* (default: the store next to the CSV);
+    expand=False returns the compact rows as they are.
+    """
+    with Path(csv_path).open(newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        fields = reader.fieldnames or []
+    if not expand or not any(f.endswith(REF_SUFFIX) for f in fields):
+        return rows
+
+    own_store = store is None
+    if own_store:
+        path = default_store_path(csv_path)
+        if not path.exists():
+            raise FileNotFoundError(f"{csv_path} is a compact log but its text store {path} is missing.")
+        store = TextStore(path)
+    try:
+        return [expand_row(r, store) for r in rows]
+    finally:
+        if own_store:
+            store.close()
@@ -0,0 +1,231 @@
+"""
+tracing.py
+----------
+Per-call spans for every LLM request made through utils.ask_gpt / ask_gpt_async.
+
+A span records wall latency (scheduler waits and retries included), prompt /
+completion tokens (from the response's usage when the backend reports it,
+otherwise a chars/4 estimate flagged `tokens_estimated`), prompt tokens the
+provider served from its prompt cache, retries, and the
+tags in effect at the call site:
+
+    stage       write | rewrite | feedback | score | transfer  (set by writing /
+                feedback / grading themselves)
+    persona, arm, episode_id, run   (set by batch.py / online_sim.py)
+
+Tags live in a ContextVar, so they follow asyncio tasks and TaskGraph nodes.
+
+    tracing.enable("data/trace.jsonl")      # one JSON line per span
+    ...                                     # run batch / online_sim
+    tracing.print_summary()                 # per-stage p50/p95/p99 + tokens
+    tracing.disable()
+
+When tracing is off, ask_gpt skips all of this and tags() is a bare
+ContextVar set/reset.
+"""
+
+from __future__ import annotations
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_tags: ContextVar[Dict] = ContextVar("trace_tags", default={})
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+_tracer: Optional["Tracer"] = None
+
+
+class Span:
+    __slots__ = ("tags", "model", "start", "retries", "prompt_tokens", "completion_tokens",
+                 "cached_tokens", "tokens_estimated", "prompt_chars", "output")
+
+    def __init__(self, tags: Dict, model: str, prompt_chars: int):
+        self.tags = tags
+        self.model = model
+        self.prompt_chars = prompt_chars
+        self.start = time.time()
+        self.retries = 0
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.cached_tokens = 0
+        self.tokens_estimated = False
+        self.output: Optional[str] = None
+
+
+class Tracer:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._rows: List[Dict] = []
+        self._f = None
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._f = self.path.open("a", encoding="utf-8")
+
+    def record(self, span: Span, error: Optional[BaseException]) -> None:
+        if span.prompt_tokens is None:
+            # backend gave no usage (fake / custom) – estimate like the scheduler does
+            span.prompt_tokens = (span.prompt_chars + 3) // 4
+            span.completion_tokens = (len(span.output or "") + 3) // 4
+            span.tokens_estimated = True
+        row = {
+            "ts": span.start,
+            "stage": span.tags.get("stage"),
+            "persona": span.tags.get("persona"),
+            "arm": span.tags.get("arm"),
+            "episode_id": span.tags.get("episode_id"),
+            "run": span.tags.get("run"),
+            "model": span.model,
+            "latency_s": time.time() - span.start,
+            "prompt_tokens": span.prompt_tokens,
+            "completion_tokens": span.completion_tokens,
+            "cached_tokens": span.cached_tokens,
+            "tokens_estimated": span.tokens_estimated,
+            "retries": span.retries,
+            "error": type(error).__name__ if error else None,
+        }
+        with self._lock:
+            self._rows.append(row)
+            if self._f:
+                self._f.write(json.dumps(row) + "\n")
+                self._f.flush()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        {stage: {calls, p50_s, p95_s, p99_s, prompt_tokens, cached_tokens,
+                 cached_ratio, completion_tokens, retries, errors}}
+        """
+        with self._lock:
+            rows = list(self._rows)
+        out: Dict[str, Dict[str, float]] = {}
+        for stage in sorted({r["stage"] or "-" for r in rows}):
+            sel = [r for r in rows if (r["stage"] or "-") == stage]
+            lat = np.array([r["latency_s"] for r in sel])
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+            prompt_tokens = sum(r["prompt_tokens"] for r in sel)
+            cached_tokens = sum(r["cached_tokens"] for r in sel)
+            out[stage] = {
+                "calls": len(sel),
+                "p50_s": float(p50),
+                "p95_s": float(p95),
+                "p99_s": float(p99),
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "cached_ratio": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+                "completion_tokens": sum(r["completion_tokens"] for r in sel),
+                "retries": sum(r["retries"] for r in sel),
+                "errors": sum(r["error"] is not None for r in sel),
+            }
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            if self._f:
+                self._f.close()
+                self._f = None
+
+
+# ---------------------------------------------------------------------------
+#  module-level switch
+# ---------------------------------------------------------------------------
+def enable(path: Optional[Path] = None) -> Tracer:
+    """Start recording spans (to *path* as JSONL if given; always in memory for the summary)."""
+    global _tracer
+    disable()
+    _tracer = Tracer(path)
+    return _tracer
+
+
+def disable() -> None:
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = None
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+@contextmanager
+def tags(**kw):
+    """Add tags (stage=, persona=, arm=, episode_id=, run=) for calls made inside the block."""
+    token = _tags.set({**_tags.get(), **kw})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+@contextmanager
+def span(*, model: str, system: str, user: str):
+    """Used by utils.ask_gpt: time one request and record it on exit."""
+    sp = Span(_tags.get(), model, len(system) + len(user))
+    token = _current.set(sp)
+    error = None
+    try:
+        yield sp
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        _current.reset(token)
+        tracer = _tracer
+        if tracer is not None:
+            tracer.record(sp, error)
+
+
+@contextmanager
+def traced_run(path: Optional[Path], verbose: bool = True):
+    """
+    Wrap one batch / online_sim run: trace to *path* (if given) for its
+    duration and print the per-stage summary at the end.
+    """
+    own = path is not None
+    if own:
+        enable(path)
+    try:
+        yield
+    finally:
+        if verbose:
+            print_summary()
+        if own:
+            disable()
+
+
+def note_retry() -> None:
+    """Called by the scheduler before retrying a request."""
+    sp = _current.get()
+    if sp is not None:
+        sp.retries += 1
+
+
+def record_usage(usage) -> None:
+    """Attach an OpenAI `usage` object to the active span (if any)."""
+    sp = _current.get()
+    if sp is not None and usage is not None:
+        sp.prompt_tokens = usage.prompt_tokens
+        sp.completion_tokens = usage.completion_tokens
+        # prompt-cache hits (see prompt_layout.py); absent on older models / SDKs
+        details = getattr(usage, "prompt_tokens_details", None)
+        sp.cached_tokens = getattr(details, "cached_tokens", None) or 0
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    return _tracer.summary() if _tracer is not None else {}
+
+
+def print_summary() -> None:
+    stats = summary()
+    if not stats:
+        return
+    print(f"\n{'stage':<10} {'calls':>6} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} "
+          f"{'prompt tok':>11} {'cached':>7} {'compl. tok':>11} {'retries':>8}")
+    for stage, s in stats.items():
+        print(f"{stage:<10} {s['calls']:>6} {s['p50_s']:>8.2f} {s['p95_s']:>8.2f} {s['p99_s']:>8.2f} "
+              f"{s['prompt_tokens']:>11} {s['cached_ratio']:>7.1%} {s['completion_tokens']:>11} {s['retries']:>8}")
@@ -1,12 +1,70 @@
 # ask_gpt
+import os
 from pathlib import Path
 
 api_key = 'API_KEYS_BLANK'
-from openai import OpenAI
-client = OpenAI(api_key = api_key)
+from src import tracing
+from src.scheduler import RequestScheduler
 
-def ask_gpt(system, user, model, temperature):
-    response = client.chat.completions.create(
+# the openai package is slow to import and the clients need a key – both are
+# only touched on the first real API call (fake / cached runs never pay for it)
+_client = None
+_async_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        # retries are owned by the scheduler below, not the SDK
+        _client = OpenAI(api_key = api_key, max_retries = 0)
+    return _client
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        from openai import AsyncOpenAI
+        _async_client = AsyncOpenAI(api_key = api_key, max_retries = 0)
+    return _async_client
+
+# every call is paced (RPM / TPM token buckets) and retried with backoff here;
+# limits from MAB_RPM / MAB_TPM, or scheduler.configure(rpm=..., tpm=...)
+scheduler = RequestScheduler(
+    rpm = float(os.environ["MAB_RPM"]) if os.environ.get("MAB_RPM") else None,
+    tpm = float(os.environ["MAB_TPM"]) if os.environ.get("MAB_TPM") else None,
+)
+
+# ---------------------------------------------------------------------------
+#  pluggable backend
+#  None → the real OpenAI client; otherwise a callable with the ask_gpt
+#  signature (and, for async, an awaitable one).  See set_backend().
+# ---------------------------------------------------------------------------
+_backend = None
+_async_backend = None
+
+def set_backend(backend="openai"):
+    """
+    Route every ask_gpt / ask_gpt_async call through *backend*:
+      "openai"        – the real API (default)
+      "fake"          – fake_llm.FakeLLM() with default settings
+      FakeLLM(...)    – a configured fake (uses its .acall for async)
+      any callable    – sync backend with the ask_gpt signature
+    """
+    global _backend, _async_backend
+    if backend == "openai":
+        _backend = _async_backend = None
+        return
+    if backend == "fake":
+        from src.fake_llm import FakeLLM
+        backend = FakeLLM()
+    elif isinstance(backend, str):
+        raise ValueError(f"Unknown backend {backend!r}; expected 'openai', 'fake' or a callable.")
+    elif not callable(backend):
+        raise TypeError(f"backend must be 'openai', 'fake' or a callable, not {type(backend).__name__}.")
+    _backend = backend
+    _async_backend = getattr(backend, "acall", None)
+
+def _ask_openai(system, user, model, temperature):
+    response = get_client().chat.completions.create(
         model=model,
         messages=[
             {"role": "system", "content": system},
@@ -14,4 +72,43 @@ def ask_gpt(system, user, model, temperature):
         ],
         temperature = temperature,
     )
-    return response.choices[0].message.content.strip()
\ No newline at end of file
+    tracing.record_usage(response.usage)
+    return response.choices[0].message.content.strip()
+
+async def _ask_openai_async(system, user, model, temperature):
+    response = await get_async_client().chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ],
+        temperature = temperature,
+    )
+    tracing.record_usage(response.usage)
+    return response.choices[0].message.content.strip()
+
+def ask_gpt(system, user, model, temperature):
+    fn = _backend if _backend is not None else _ask_openai
+    if not tracing.enabled():
+        return scheduler.call(fn, system=system, user=user, model=model, temperature=temperature)
+    with tracing.span(model=model, system=system, user=user) as sp:
+        sp.output = scheduler.call(fn, system=system, user=user, model=model, temperature=temperature)
+    return sp.output
+
+async def ask_gpt_async(system, user, model, temperature):
+    """Same contract as ask_gpt, but awaitable so many calls can be in flight at once."""
+    if _async_backend is not None:
+        fn = _async_backend
+    elif _backend is not None:
+        raise RuntimeError("The configured backend has no async interface (.acall).")
+    else:
+        fn = _ask_openai_async
+    if not tracing.enabled():
+        return await scheduler.acall(fn, system=system, user=user, model=model, temperature=temperature)
+    with tracing.span(model=model, system=system, user=user) as sp:
+        sp.output = await scheduler.acall(fn, system=system, user=user, model=model, temperature=temperature)
+    return sp.output
+
+# MAB_LLM_BACKEND=fake runs the whole pipeline offline
+if os.environ.get("MAB_LLM_BACKEND", "openai") != "openai":
+    set_backend(os.environ["MAB_LLM_BACKEND"])
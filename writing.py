@@ -2,8 +2,31 @@
 # WRITE/REWRITE HELPERS
 
 from pathlib import Path
-from typing import Callable, Dict, List, Optional
-from src.utils import ask_gpt
+from typing import Callable, Dict, List, Optional, Tuple
+from src import tracing
+from src.prompt_layout import assemble
+from src.utils import ask_gpt, ask_gpt_async
+
+def _rewrite_prompts(essay: str, feedback: str, persona: str) -> Tuple[str, str]:
+    """Return the (system, user) prompts for a rewrite (static text first, see prompt_layout.py)."""
+
+    system_prompt = assemble(
+        ["You are revising your own essay in the role of the student described below.\n"
+         "Your goal is to address the feedback, given that you have that student's writing ability."],
+        [f"STUDENT: {persona}"],
+    )
+
+    user_prompt = assemble(
+        ["Make only the changes needed to satisfy the feedback, writing as the student described above. "
+         "Only address the feedback and do not add new claims or omit major content."],
+        [
+            f"----- ORIGINAL ESSAY -----\n{essay}",
+            f"----- FEEDBACK TO INCORPORATE -----\n{feedback}",
+            "Begin your revised essay below:\n",
+        ],
+    )
+    return system_prompt, user_prompt
+
 
 def rewrite_essay(
     *,
@@ -16,63 +39,68 @@ def rewrite_essay(
 ) -> str:
     """Return a revision of *essay* that addresses *feedback* in *persona* voice."""
 
-    system_prompt = (
-        f"You are revising your own essay in the role of a {persona}.\n"
-        f"Your goal is to address the feedback, given that you have writing ability of a {persona}."
-    )
-
-    user_prompt = (
-        f"You are a {persona}. Make only the changes needed to satisfy the feedback. "
-        f"Only address the feedback and do not add new claims or omit major content.\n\n"
-        "----- ORIGINAL ESSAY -----\n"
-        f"{essay}\n\n"
-        "----- FEEDBACK TO INCORPORATE -----\n"
-        f"{feedback}\n\n"
-        "Begin your revised essay below:\n"
-    )
+    system_prompt, user_prompt = _rewrite_prompts(essay, feedback, persona)
 
-    return ask_fn(
-        system=system_prompt,
-        user=user_prompt,
-        model=model,
-        temperature=temperature,
-    )
+    with tracing.tags(stage="rewrite"):
+        return ask_fn(
+            system=system_prompt,
+            user=user_prompt,
+            model=model,
+            temperature=temperature,
+        )
 
 
-def write_essay(
+async def rewrite_essay_async(
     *,
+    essay: str,
+    feedback: str,
     persona: str,
-    essay_prompt: str,
-    use_history: bool = False,
-    history: Optional[List[Dict[str, str]]] = None,
-    ask_fn: Callable = ask_gpt,
+    ask_fn: Callable = ask_gpt_async,
     model: str = "gpt-4o",
-    temperature: float = 0.5,
-    max_history: int = 4,
+    temperature: float = 1.0,
 ) -> str:
-    """Generate a fresh essay (optionally with history for learning)."""
+    """Awaitable rewrite_essay; *ask_fn* must be a coroutine function."""
 
-    system_prompt = (
-        f"You are writing as **{persona}**.\n"
-        "Maintain that persona's typical vocabulary, tone, and error profile.\n"
-        "Respond ONLY with the full essay—no meta comments."
+    system_prompt, user_prompt = _rewrite_prompts(essay, feedback, persona)
+
+    with tracing.tags(stage="rewrite"):
+        return await ask_fn(
+            system=system_prompt,
+            user=user_prompt,
+            model=model,
+            temperature=temperature,
+        )
+
+
+def _write_prompts(
+    persona: str,
+    essay_prompt: str,
+    use_history: bool,
+    history: Optional[List[Dict[str, str]]],
+    max_history: int,
+) -> Tuple[str, str]:
+    """Return the (system, user) prompts for a fresh essay (static text first, see prompt_layout.py)."""
+
+    system_prompt = assemble(
+        ["You are writing as the student described below.\n"
+         "Maintain that persona's typical vocabulary, tone, and error profile.\n"
+         "Respond ONLY with the full essay—no meta comments."],
+        [f"You are writing as **{persona}**."],
     )
 
-    parts: List[str] = [
-        f"NEW ASSIGNMENT PROMPT:\n{essay_prompt}\n",
-        "Write an essay that addresses the prompt above. Try to write in 500 to 1000 words.",
-    ]
+    static = ["Write an essay that addresses the NEW ASSIGNMENT PROMPT at the end. Try to write in 500 to 1000 words."]
+    variable: List[str] = []
 
     if use_history and history:
         history_to_use = history[-max_history:]
-        parts.append(
-            "\nBelow are your PREVIOUS essays and the feedback you received. "
+        static.append(
+            "Below are your PREVIOUS essays and the feedback you received. "
             "Demonstrate learning from the feedback, show gradual improvement, "
-            f"but do NOT suddenly become perfect. Note that you are {persona}."
+            "but do NOT suddenly become perfect. Stay in the persona described in the system message."
         )
         for i, item in enumerate(history_to_use, 1):
-            parts.extend([
-                f"\n--- Prior Example {i} ---",
+            variable.append("\n".join([
+                f"--- Prior Example {i} ---",
                 f"Prompt  : {item['prompt']}",
                 "",
                 "Essay   :",
@@ -81,14 +109,62 @@ def write_essay(
                 "Feedback:",
                 item["feedback"],
                 f"--- End Example {i} ---",
-            ])
+            ]))
+
+    variable.append(f"NEW ASSIGNMENT PROMPT:\n{essay_prompt}")
+    variable.append("Begin your new essay below:\n")
+    user_prompt = assemble(static, variable)
+    return system_prompt, user_prompt
 
-    parts.append("\nBegin your new essay below:\n")
-    user_prompt = "\n".join(parts)
 
-    return ask_fn(
-        system=system_prompt,
-        user=user_prompt,
-        model=model,
-        temperature=temperature,
+def write_essay(
+    *,
+    persona: str,
+    essay_prompt: str,
+    use_history: bool = False,
+    history: Optional[List[Dict[str, str]]] = None,
+    ask_fn: Callable = ask_gpt,
+    model: str = "gpt-4o",
+    temperature: float = 0.5,
+    max_history: int = 4,
+) -> str:
+    """Generate a fresh essay (optionally with history for learning)."""
+
+    system_prompt, user_prompt = _write_prompts(
+        persona, essay_prompt, use_history, history, max_history
+    )
+
+    with tracing.tags(stage="transfer" if use_history else "write"):
+        return ask_fn(
+            system=system_prompt,
+            user=user_prompt,
+            model=model,
+            temperature=temperature,
+        )
+
+
+async def write_essay_async(
+    *,
+    persona: str,
+    essay_prompt: str,
+    use_history: bool = False,
+    history: Optional[List[Dict[str, str]]] = None,
+    ask_fn: Callable = ask_gpt_async,
+    model: str = "gpt-4o",
+    temperature: float = 0.5,
+    max_history: int = 4,
+) -> str:
+    """Awaitable write_essay; *ask_fn* must be a coroutine function."""
+
+    system_prompt, user_prompt = _write_prompts(
+        persona, essay_prompt, use_history, history, max_history
     )
+
+    with tracing.tags(stage="transfer" if use_history else "write"):
+        return await ask_fn(
+            system=system_prompt,
+            user=user_prompt,
+            model=model,
+            temperature=temperature,
+        )
+